@@ -0,0 +1,86 @@
+from django.urls import reverse
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+class Serializer:
+    """Поля ресурса: имя -> (значение объекта, связи для
+    select_related). Выбранные ?fields= поля определяют и словарь, и
+    присоединяемые таблицы."""
+
+    def __init__(self, **fields):
+        self.fields = fields
+
+    def parse(self, value):
+        """Имена полей из ?fields=; неизвестное имя - ошибка"""
+        if not value:
+            return list(self.fields)
+        names = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise InvalidFields(f'Неизвестные поля: {", ".join(unknown)}')
+        return names
+
+    def prepare(self, queryset, names, prefix=''):
+        related = {
+            prefix + relation
+            for name in names
+            for relation in self.fields[name][1]
+        }
+        return queryset.select_related(*related) if related else queryset
+
+    def __call__(self, obj, names):
+        return {name: self.fields[name][0](obj) for name in names}
+
+
+def _date(value):
+    return value.isoformat()
+
+
+posts = Serializer(
+    id=(lambda post: post.pk, ()),
+    text=(lambda post: post.text, ()),
+    pub_date=(lambda post: _date(post.pub_date), ()),
+    author=(lambda post: post.author.username, ('author',)),
+    group=(
+        lambda post: post.group.slug if post.group_id else None,
+        ('group',),
+    ),
+    image=(lambda post: post.image.url if post.image else None, ()),
+    comments_count=(lambda post: post.comments_count, ()),
+    url=(lambda post: reverse('api:post', args=[post.pk]), ()),
+)
+
+groups = Serializer(
+    id=(lambda group: group.pk, ()),
+    title=(lambda group: group.title, ()),
+    slug=(lambda group: group.slug, ()),
+    description=(lambda group: group.description, ()),
+    posts_count=(lambda group: group.posts_count, ()),
+    url=(lambda group: reverse('api:group', args=[group.slug]), ()),
+)
+
+profiles = Serializer(
+    username=(lambda user: user.username, ()),
+    full_name=(lambda user: user.get_full_name(), ()),
+    posts_count=(lambda user: user.counters.posts_count, ('counters',)),
+    followers_count=(
+        lambda user: user.counters.followers_count, ('counters',)
+    ),
+    following_count=(
+        lambda user: user.counters.following_count, ('counters',)
+    ),
+    url=(lambda user: reverse('api:profile', args=[user.username]), ()),
+)
+
+comments = Serializer(
+    id=(lambda comment: comment.pk, ()),
+    parent=(lambda comment: comment.parent_id, ()),
+    depth=(lambda comment: comment.depth, ()),
+    author=(lambda comment: comment.author.username, ('author',)),
+    text=(lambda comment: comment.text, ()),
+    created=(lambda comment: _date(comment.created), ()),
+    replies_count=(lambda comment: comment.replies_count, ()),
+)
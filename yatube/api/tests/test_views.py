@@ -0,0 +1,124 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Временные файлы необходимые для тестов."""
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='leo', first_name='Лев', last_name='Толстой'
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Тестовый пост'
+        )
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий'
+        )
+
+    def setUp(self):
+        """Авторизация читателя."""
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def get(self, name, *args, **params):
+        return self.client.get(reverse(f'api:{name}', args=args), params)
+
+    def queries(self, name, *args):
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.get(name, *args).status_code, 200)
+        return len(context)
+
+    def test_query_count_does_not_grow_with_page(self):
+        """Число запросов каждой ленты не зависит от числа объектов."""
+        endpoints = [
+            ('posts',),
+            ('group_posts', 'test-slug'),
+            ('profile_posts', 'leo'),
+            ('follow',),
+            ('comments', self.post.pk),
+            ('groups',),
+        ]
+        counts = [self.queries(*endpoint) for endpoint in endpoints]
+        for number in range(9):
+            group = Group.objects.create(
+                title=f'Группа {number}', slug=f'group-{number}',
+                description='Тестовое описание',
+            )
+            author = User.objects.create_user(username=f'author{number}')
+            post = Post.objects.create(author=author, group=group, text='П')
+            Post.objects.create(
+                author=self.author, group=self.group, text='Пост'
+            )
+            Comment.objects.create(post=self.post, author=author, text='К')
+            Comment.objects.create(post=post, author=author, text='К')
+        cache.clear()
+        for endpoint, count in zip(endpoints, counts):
+            with self.subTest(endpoint=endpoint):
+                self.assertEqual(self.queries(*endpoint), count)
+
+    def test_sparse_fieldsets(self):
+        """?fields= оставляет только запрошенные поля и не присоединяет
+        лишние таблицы."""
+        with CaptureQueriesContext(connection) as context:
+            response = self.get('posts', fields='id,text')
+        self.assertEqual(
+            response.json()['results'],
+            [{'id': self.post.pk, 'text': 'Тестовый пост'}],
+        )
+        self.assertNotIn('posts_group', context.captured_queries[-1]['sql'])
+        response = self.get('post', self.post.pk)
+        self.assertEqual(response.json()['author'], 'leo')
+        self.assertEqual(response.json()['group'], 'test-slug')
+        response = self.get('profile', 'leo', fields='full_name,posts_count')
+        self.assertEqual(
+            response.json(), {'full_name': 'Лев Толстой', 'posts_count': 1}
+        )
+        response = self.get('posts', fields='id,password')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['error'])
+
+    def test_cursor_walks_all_posts(self):
+        """Курсоры проходят ленту без пропусков и повторов."""
+        for number in range(12):
+            Post.objects.create(author=self.author, text=f'Пост {number}')
+        seen, cursor = [], None
+        while True:
+            data = self.get('profile_posts', 'leo', fields='id',
+                            **({'cursor': cursor} if cursor else {})).json()
+            seen += [post['id'] for post in data['results']]
+            cursor = data['next']
+            if cursor is None:
+                break
+        self.assertEqual(
+            seen,
+            list(Post.objects.order_by('-pub_date', '-id')
+                 .values_list('id', flat=True)),
+        )
+
+    def test_follow_feed_and_errors(self):
+        """Лента подписок требует входа, отсутствующий объект - JSON
+        с кодом 404."""
+        response = self.get('follow')
+        self.assertEqual(
+            [post['id'] for post in response.json()['results']],
+            [self.post.pk],
+        )
+        self.assertEqual(Client().get(reverse('api:follow')).status_code, 401)
+        response = self.get('group', 'missing')
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('error', response.json())
@@ -0,0 +1,137 @@
+from functools import wraps
+
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+
+from core.page_cache import tag_request
+from posts.caching import (INDEX_TAG, author_tag, group_tag, post_tag,
+                           tag_page)
+from posts.models import Comment, Group, Post, User
+from posts.timeline import TIMELINE_ORDERING, follow_feed
+from posts.utils import (COMMENT_ORDERINGS, FEED_ORDERING, PAGE_NUM,
+                         CursorPaginator)
+
+from . import serializers
+from .serializers import InvalidFields
+
+
+def api_view(view):
+    """Ошибки запроса отдаются JSON, а не HTML-страницей"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except InvalidFields as error:
+            return JsonResponse({'error': str(error)}, status=400)
+        except Http404:
+            return JsonResponse({'error': 'Не найдено'}, status=404)
+    return wrapper
+
+
+def _one(request, serializer, queryset, **lookup):
+    names = serializer.parse(request.GET.get('fields'))
+    obj = get_object_or_404(serializer.prepare(queryset, names), **lookup)
+    return obj, serializer(obj, names)
+
+
+def _page(request, serializer, queryset, ordering=FEED_ORDERING,
+          prefix='', unwrap=None):
+    """Страница по курсору: один запрос с нужными связями"""
+    names = serializer.parse(request.GET.get('fields'))
+    page = CursorPaginator(
+        serializer.prepare(queryset, names, prefix), PAGE_NUM, ordering
+    ).get_page(request.GET.get('cursor'))
+    objects = [unwrap(row) for row in page] if unwrap else list(page)
+    return objects, {
+        'results': [serializer(obj, names) for obj in objects],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    }
+
+
+@api_view
+def post_list(request):
+    posts, data = _page(request, serializers.posts, Post.objects.all())
+    tag_page(request, posts, INDEX_TAG)
+    return JsonResponse(data)
+
+
+@api_view
+def post_detail(request, post_id):
+    post, data = _one(request, serializers.posts, Post.objects, pk=post_id)
+    tag_request(request, post_tag(post.pk))
+    return JsonResponse(data)
+
+
+@api_view
+def comment_list(request, post_id):
+    """Все комментарии поста плоским списком: ветки собираются по
+    parent и depth"""
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    order = request.GET.get('order')
+    if order not in COMMENT_ORDERINGS:
+        order = 'old'
+    _, data = _page(
+        request,
+        serializers.comments,
+        Comment.objects.filter(post_id=post_id),
+        COMMENT_ORDERINGS[order],
+    )
+    tag_request(request, post_tag(post_id))
+    return JsonResponse(data)
+
+
+@api_view
+def group_list(request):
+    _, data = _page(request, serializers.groups, Group.objects.all(), ('id',))
+    return JsonResponse(data)
+
+
+@api_view
+def group_detail(request, slug):
+    group, data = _one(request, serializers.groups, Group.objects, slug=slug)
+    tag_request(request, group_tag(group.slug))
+    return JsonResponse(data)
+
+
+@api_view
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    posts, data = _page(request, serializers.posts, group.posts.all())
+    tag_page(request, posts, group_tag(group.slug))
+    return JsonResponse(data)
+
+
+@api_view
+def profile(request, username):
+    author, data = _one(
+        request, serializers.profiles, User.objects, username=username
+    )
+    tag_request(request, author_tag(author.username))
+    return JsonResponse(data)
+
+
+@api_view
+def profile_posts(request, username):
+    author = get_object_or_404(User, username=username)
+    posts, data = _page(request, serializers.posts, author.posts.all())
+    tag_page(request, posts, author_tag(author.username))
+    return JsonResponse(data)
+
+
+@api_view
+def follow(request):
+    """Лента подписок текущего пользователя"""
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Нужна авторизация'}, status=401)
+    entries = follow_feed(request.user).select_related(None)
+    _, data = _page(
+        request,
+        serializers.posts,
+        entries.select_related('post').prefetch_related(None),
+        TIMELINE_ORDERING,
+        prefix='post__',
+        unwrap=lambda entry: entry.post,
+    )
+    return JsonResponse(data)
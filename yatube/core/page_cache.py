@@ -0,0 +1,106 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+ENTRY_KEY = 'pagecache:page:{}'
+TAG_KEY = 'pagecache:tag:{}'
+
+
+def _hashed(value):
+    return hashlib.md5(value.encode()).hexdigest()
+
+
+def tag_request(request, *tags):
+    """Пометить ответ тегами содержимого: по ним страница сбрасывается.
+
+    Версии тегов запоминаются сразу, до рендера: сброс, пришедший, пока
+    страница строится, не даст сохранить ее под новой версией.
+    """
+    if not hasattr(request, 'cache_tags'):
+        request.cache_tags = {}
+    new = set(tags) - request.cache_tags.keys()
+    if new:
+        request.cache_tags.update(tag_versions(new))
+
+
+def tag_versions(tags):
+    """Текущие версии тегов; недостающие заводятся заново"""
+    keys = {TAG_KEY.format(_hashed(tag)): tag for tag in tags}
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        # Версия от времени не повторит ту, что была до вытеснения.
+        initial = int(time.time() * 1000)
+        for key in missing:
+            cache.add(key, initial, None)
+        versions.update(cache.get_many(missing))
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def purge(*tags):
+    """Сбросить все страницы, помеченные любым из тегов"""
+    for tag in tags:
+        try:
+            cache.incr(TAG_KEY.format(_hashed(tag)))
+        except ValueError:
+            pass
+
+
+class AnonymousPageCacheMiddleware:
+    """Кэш целых страниц для анонимных читателей.
+
+    Кэшируются только ответы, которым представление назначило теги
+    через tag_request(); запись жива, пока не изменилась версия ни
+    одного из ее тегов.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return self.get_response(request)
+        if request.user.is_authenticated:
+            return self.get_response(request)
+        key = ENTRY_KEY.format(
+            _hashed(f'{request.method}:{request.build_absolute_uri()}')
+        )
+        entry = cache.get(key)
+        if entry is not None and self.is_fresh(entry['tags']):
+            response = entry['response']
+            return get_conditional_response(
+                request,
+                etag=response.get('ETag'),
+                last_modified=parse_http_date_safe(
+                    response.get('Last-Modified', '')
+                ),
+                response=response,
+            )
+        response = self.get_response(request)
+        tags = getattr(request, 'cache_tags', None)
+        if (tags and self.is_cacheable(request, response)
+                and self.is_fresh(tags)):
+            cache.set(
+                key,
+                {'response': response, 'tags': tags},
+                settings.PAGE_CACHE_TIMEOUT,
+            )
+        return response
+
+    @staticmethod
+    def is_fresh(versions):
+        current = tag_versions(versions)
+        return current == versions
+
+    @staticmethod
+    def is_cacheable(request, response):
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and not request.META.get('CSRF_COOKIE_USED')
+        )
@@ -1,17 +1,142 @@
+from hashlib import md5
+
+from django import forms
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
 
+from . import autocomplete, search
 from .models import Comment, Group, Post, Follow
 
 
-class PostAdmin(admin.ModelAdmin):
+class ChangelistPaginator(Paginator):
+    """Число строк берется из кэша, страница выбирается по ключам"""
+
+    @cached_property
+    def count(self):
+        sql, params = self.object_list.query.sql_with_params()
+        key = 'admin:count:' + md5(f'{sql}{params}'.encode()).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = self.object_list.count()
+            cache.set(key, count, settings.ADMIN_COUNT_TIMEOUT)
+        return count
+
+    def page(self, number):
+        """Смещение проходится только по индексу, строки целиком
+        читаются для одной страницы"""
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        if top + self.orphans >= self.count:
+            top = self.count
+        keys = list(
+            self.object_list.values_list('pk', flat=True)[bottom:top]
+        )
+        return self._get_page(
+            self.object_list.filter(pk__in=keys), number, self
+        )
+
+
+class RowAutocompleteSelect(AutocompleteSelect):
+    """Выбранный вариант берется из уже загруженной строки списка, а не
+    отдельным запросом на каждую строку"""
+    chosen = None
+
+    def optgroups(self, name, value, attr=None):
+        chosen = {str(obj.pk): obj for obj in self.chosen or ()}
+        selected = [item for item in value if item]
+        if self.chosen is None or set(selected) - chosen.keys():
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, '', '', False, 0))
+        for pk in selected:
+            label = self.choices.field.label_from_instance(chosen[pk])
+            options.append(
+                self.create_option(name, pk, label, True, len(options))
+            )
+        return [(None, options, 0)]
+
+
+class PostChangelistForm(forms.ModelForm):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        widget = self.fields['group'].widget
+        widget = getattr(widget, 'widget', widget)
+        widget.chosen = [self.instance.group] if self.instance.group else []
+
+
+class ChangelistAdmin(admin.ModelAdmin):
+    paginator = ChangelistPaginator
+    show_full_result_count = False
+
+
+class PostAdmin(ChangelistAdmin):
     list_display = ('pk', 'text', 'pub_date', 'group', 'author')
     list_editable = ('group',)
+    list_select_related = ('group', 'author')
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
+    raw_id_fields = ('author',)
+    autocomplete_fields = ('group',)
     empty_value_display = '-пусто-'
 
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'group':
+            kwargs['widget'] = RowAutocompleteSelect(
+                db_field.remote_field,
+                self.admin_site,
+                using=kwargs.get('using'),
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_changelist_form(self, request, **kwargs):
+        kwargs.setdefault('form', PostChangelistForm)
+        return super().get_changelist_form(request, **kwargs)
+
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по полнотекстовому индексу вместо LIKE по тексту"""
+        if not search_term or not search.supported():
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        return search.matching(queryset, search_term), False
+
+
+class GroupAdmin(ChangelistAdmin):
+    list_display = ('pk', 'title', 'slug', 'posts_count')
+    search_fields = ('title', 'slug')
+    ordering = ('title',)
+
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск и автодополнение по ключам из индекса подсказок"""
+        if not search_term:
+            return queryset, False
+        return autocomplete.matching('groups', queryset, search_term), False
+
+
+class CommentAdmin(ChangelistAdmin):
+    list_display = ('pk', 'text', 'created', 'post', 'author')
+    list_select_related = ('post', 'author')
+    date_hierarchy = 'created'
+    raw_id_fields = ('post', 'author', 'parent')
+    ordering = ('-created', '-id')
+    empty_value_display = '-пусто-'
+
+
+class FollowAdmin(ChangelistAdmin):
+    list_display = ('pk', 'user', 'author')
+    list_select_related = ('user', 'author')
+    raw_id_fields = ('user', 'author')
+    ordering = ('-id',)
+
 
 admin.site.register(Post, PostAdmin)
-admin.site.register(Group)
-admin.site.register(Comment)
-admin.site.register(Follow)
+admin.site.register(Group, GroupAdmin)
+admin.site.register(Comment, CommentAdmin)
+admin.site.register(Follow, FollowAdmin)
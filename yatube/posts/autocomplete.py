@@ -0,0 +1,190 @@
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.functions import Length
+
+from .models import Completion, Group, User
+from .search import execute, supported
+
+FTS_TABLE = 'posts_completion_fts'
+KEY_END = '\U0010ffff'
+TRIGRAM = 3
+KINDS = {
+    'users': (Completion.USER, 'user_id', User),
+    'groups': (Completion.GROUP, 'group_id', Group),
+}
+
+# Триграммы ключей для поиска по середине имени.
+INSTALL = (
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        key,
+        content='posts_completion',
+        content_rowid='id',
+        tokenize='trigram'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert
+    AFTER INSERT ON posts_completion BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, key) VALUES (new.id, new.key);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete
+    AFTER DELETE ON posts_completion BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, key)
+        VALUES ('delete', old.id, old.key);
+    END""",
+)
+UNINSTALL = (
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_insert',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_delete',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+)
+
+
+def install(using=connection):
+    if supported(using):
+        execute(using, INSTALL)
+
+
+def uninstall(using=connection):
+    if supported(using):
+        execute(using, UNINSTALL)
+
+
+def rebuild(using=connection):
+    install(using)
+    if supported(using):
+        execute(using, [
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+        ])
+
+
+def normalize(value):
+    """Ключ: нижний регистр, е вместо ё, одиночные пробелы"""
+    return ' '.join(value.lower().replace('ё', 'е').split())[:255]
+
+
+def _keys(values):
+    return {normalize(value) for value in values} - {''}
+
+
+def _sync(kind, field, instance, values):
+    """Привести ключи объекта к его текущим именам"""
+    keys = _keys(values)
+    rows = Completion.objects.filter(**{field: instance})
+    current = set(rows.values_list('key', flat=True))
+    if current - keys:
+        rows.filter(key__in=current - keys).delete()
+    Completion.objects.bulk_create([
+        Completion(kind=kind, key=key, **{field: instance})
+        for key in keys - current
+    ])
+
+
+def _user_names(user):
+    return user.username, user.get_full_name()
+
+
+def _group_names(group):
+    return group.title, group.slug
+
+
+def index_user(user):
+    _sync(Completion.USER, 'user', user, _user_names(user))
+
+
+def index_group(group):
+    _sync(Completion.GROUP, 'group', group, _group_names(group))
+
+
+def index_new(users=(), groups=()):
+    """Ключи пользователей и групп, созданных пачкой без сигналов"""
+    Completion.objects.bulk_create(
+        [
+            Completion(kind=Completion.USER, key=key, user=user)
+            for user in users
+            for key in _keys(_user_names(user))
+        ] + [
+            Completion(kind=Completion.GROUP, key=key, group=group)
+            for group in groups
+            for key in _keys(_group_names(group))
+        ]
+    )
+
+
+def _unique(ids, limit):
+    seen = []
+    for pk in ids:
+        if pk not in seen:
+            seen.append(pk)
+    return seen[:limit]
+
+
+def _phrase(key):
+    """Ключ как фраза FTS5: кавычки внутри удваиваются"""
+    return '"{}"'.format(key.replace('"', '""'))
+
+
+def _trigram(rows, key):
+    """Ключи, содержащие запрос, короткие первыми"""
+    return rows.extra(
+        where=[
+            f'posts_completion.id IN (SELECT rowid FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s)'
+        ],
+        params=[_phrase(key)],
+    ).order_by(Length('key'), 'key')
+
+
+def complete(kind, query):
+    """Лучшие совпадения: сначала по началу ключа из индекса,
+    затем по триграммам внутри ключа"""
+    kind, field, model = KINDS[kind]
+    key = normalize(query)
+    if not key:
+        return []
+    limit = settings.AUTOCOMPLETE_LIMIT
+    rows = Completion.objects.filter(kind=kind)
+    ids = _unique(
+        rows.filter(key__gte=key, key__lt=key + KEY_END)
+        .order_by('key')
+        .values_list(field, flat=True)[:limit * 2],
+        limit,
+    )
+    if len(ids) < limit and len(key) >= TRIGRAM:
+        if supported():
+            infix = _trigram(rows, key)
+        else:
+            infix = rows.filter(key__contains=key).order_by('key')
+        ids = _unique(
+            ids + list(infix.values_list(field, flat=True)[:limit * 2]),
+            limit,
+        )
+    found = model.objects.in_bulk(ids)
+    return [found[pk] for pk in ids if pk in found]
+
+
+def matching(kind, queryset, query):
+    """Объекты, чьи ключи начинаются с запроса или содержат его: поиск
+    админки по тому же индексу"""
+    kind, field, _ = KINDS[kind]
+    key = normalize(query)
+    if not supported():
+        keys = Completion.objects.filter(kind=kind).filter(
+            Q(key__gte=key, key__lt=key + KEY_END) | Q(key__contains=key)
+        )
+        return queryset.filter(pk__in=keys.values(field))
+    condition = 'key >= %s AND key < %s'
+    params = [kind, key, key + KEY_END]
+    if len(key) >= TRIGRAM:
+        condition += (
+            f' OR id IN (SELECT rowid FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s)'
+        )
+        params.append(_phrase(key))
+    table = queryset.model._meta.db_table
+    return queryset.extra(
+        where=[
+            f'{table}.id IN (SELECT {field} FROM posts_completion '
+            f'WHERE kind = %s AND ({condition}))'
+        ],
+        params=params,
+    )
@@ -0,0 +1,133 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.page_cache import tag_request
+
+FEED_GENERATION_KEY = 'feed:generation'
+FOLLOW_GENERATION_KEY = 'feed:follow:{}'
+FOLLOW_GRAPH_GENERATION_KEY = 'follow-graph:generation'
+FOLLOW_GRAPH_DELTA_KEY = 'follow-graph:delta:{}'
+COMMENTS_GENERATION_KEY = 'post:{}:comments'
+NAMES_GENERATION_KEY = 'users:names'
+
+
+def _generation(key):
+    generation = cache.get(key)
+    if generation is None:
+        # Начальное значение от времени: после вытеснения ключа
+        # поколение не вернется к уже использованному числу.
+        cache.add(key, int(time.time() * 1000), None)
+        generation = cache.get(key)
+    return generation
+
+
+def _bump(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        return _generation(key)
+
+
+def feed_generation():
+    return _generation(FEED_GENERATION_KEY)
+
+
+def bump_feed_generation():
+    """Сбросить закэшированные фрагменты всех лент"""
+    _bump(FEED_GENERATION_KEY)
+
+
+def bump_follow_generation(user_id):
+    """Сбросить закэшированную ленту подписок пользователя"""
+    _bump(FOLLOW_GENERATION_KEY.format(user_id))
+
+
+def follow_graph_generation():
+    return _generation(FOLLOW_GRAPH_GENERATION_KEY)
+
+
+def bump_follow_graph_generation(delta):
+    """Сообщить всем процессам, что граф подписок изменился, и оставить
+    им само изменение под номером нового поколения"""
+    generation = _bump(FOLLOW_GRAPH_GENERATION_KEY)
+    cache.set(
+        FOLLOW_GRAPH_DELTA_KEY.format(generation),
+        delta,
+        settings.FOLLOW_GRAPH_DELTA_TIMEOUT,
+    )
+    return generation
+
+
+def follow_graph_deltas(since, generation):
+    """Изменения графа после поколения since по generation включительно;
+    None, если какое-то из них уже вытеснено из кэша"""
+    keys = [
+        FOLLOW_GRAPH_DELTA_KEY.format(number)
+        for number in range(since + 1, generation + 1)
+    ]
+    found = cache.get_many(keys)
+    if len(found) != len(keys):
+        return None
+    return [found[key] for key in keys]
+
+
+def comments_generation(post_id):
+    return _generation(COMMENTS_GENERATION_KEY.format(post_id))
+
+
+def bump_comments_generation(post_id):
+    """Комментарии поста добавили, исправили или удалили"""
+    _bump(COMMENTS_GENERATION_KEY.format(post_id))
+
+
+def names_generation():
+    return _generation(NAMES_GENERATION_KEY)
+
+
+def bump_names_generation():
+    """Имена пользователей, которые показывают страницы постов,
+    изменились"""
+    _bump(NAMES_GENERATION_KEY)
+
+
+def feed_cache_context(request, *parts):
+    """Ключ и время жизни фрагмента ленты для тега {% cache %}"""
+    key = [feed_generation(), *parts]
+    key += [request.GET.get('page', ''), request.GET.get('cursor', '')]
+    return {
+        'feed_cache_key': ':'.join(str(part) for part in key),
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
+    }
+
+
+def follow_cache_context(request):
+    user_id = request.user.pk
+    return feed_cache_context(
+        request, user_id, _generation(FOLLOW_GENERATION_KEY.format(user_id))
+    )
+
+
+INDEX_TAG = 'index'
+
+
+def post_tag(post_id):
+    return f'post:{post_id}'
+
+
+def author_tag(username):
+    return f'author:{username}'
+
+
+def group_tag(slug):
+    return f'group:{slug}'
+
+
+def hashtag_tag(name):
+    return f'hashtag:{name}'
+
+
+def tag_page(request, posts, *tags):
+    """Теги страницы: ее собственные и всех показанных постов"""
+    tag_request(request, *tags, *(post_tag(post.pk) for post in posts))
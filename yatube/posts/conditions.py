@@ -0,0 +1,97 @@
+import hashlib
+
+from django.db.models import OuterRef, Subquery
+from django.middleware.csrf import get_token
+
+from . import caching
+from .graph import get_graph
+from .models import Comment, Group, Post, Suggestion, User
+
+
+def _latest(queryset, field):
+    """Подзапрос с самым свежим значением поля по индексу"""
+    return Subquery(queryset.order_by(f'-{field}').values(field)[:1])
+
+
+def _etag(request, row):
+    """ETag из строки валидатора; страница зависит и от зрителя"""
+    if row is None:
+        return None
+    return hashlib.md5(f'{request.user.pk}:{row}'.encode()).hexdigest()
+
+
+def post_detail_etag(request, post_id):
+    row = (
+        Post.objects.filter(pk=post_id)
+        .annotate(last_comment=_latest(
+            Comment.objects.filter(post=OuterRef('pk')), 'created'
+        ))
+        .values_list(
+            'updated_at',
+            'comments_count',
+            'last_comment',
+            'author__counters__posts_count',
+            'group__updated_at',
+        )
+        .first()
+    )
+    if row is None:
+        return None
+    # Страница показывает тексты комментариев и имена их авторов.
+    row += (caching.comments_generation(post_id), caching.names_generation())
+    if request.user.is_authenticated:
+        # И форму с CSRF-токеном, который меняется при входе; get_token
+        # заводит его заранее, чтобы ETag не менялся после первого ответа.
+        get_token(request)
+        row += (request.META['CSRF_COOKIE'],)
+    return _etag(request, row)
+
+
+def profile_etag(request, username):
+    users = User.objects.filter(username=username).annotate(
+        last_post=_latest(
+            Post.objects.filter(author=OuterRef('pk')), 'updated_at'
+        )
+    )
+    fields = [
+        'pk',
+        'counters__posts_count',
+        'counters__followers_count',
+        'counters__following_count',
+        'last_post',
+    ]
+    if request.user.is_authenticated:
+        # Пересчет заменяет строки рекомендаций, и их id растут.
+        users = users.annotate(last_suggestion=_latest(
+            Suggestion.objects.filter(user=request.user), 'id'
+        ))
+        fields.append('last_suggestion')
+    row = users.values_list(*fields).first()
+    if row is not None:
+        # Страница показывает полное имя автора.
+        row += (caching.names_generation(),)
+    if row is not None and request.user.is_authenticated:
+        follows = get_graph()
+        author_id, user_id = row[0], request.user.pk
+        row += (
+            follows.is_following(user_id, author_id),
+            follows.is_following(author_id, user_id),
+            len(follows.followed_by_following(user_id, author_id)),
+            follows.following_count(user_id),
+        )
+    return _etag(request, row)
+
+
+def group_etag(request, slug):
+    row = (
+        Group.objects.filter(slug=slug)
+        .annotate(last_post=_latest(
+            Post.objects.filter(group=OuterRef('pk')), 'updated_at'
+        ))
+        .values_list('updated_at', 'posts_count', 'last_post')
+        .first()
+    )
+    if row is not None:
+        # Страница показывает полные имена авторов постов.
+        row += (caching.names_generation(),)
+    return _etag(request, row)
@@ -0,0 +1,97 @@
+from django.db.models import (Count, F, IntegerField, OuterRef, Q,
+                              Subquery)
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Group, Post, User, UserCounters
+
+
+def _change(queryset, field, delta):
+    value = F(field) + delta
+    # Счетчик, разошедшийся с данными (например, после bulk_create),
+    # не уходит ниже нуля до ближайшей сверки.
+    if delta < 0:
+        value = Greatest(value, 0)
+    queryset.update(**{field: value})
+
+
+def change_user(user_id, field, delta):
+    """Атомарно сдвинуть счетчик пользователя"""
+    _change(UserCounters.objects.filter(user_id=user_id), field, delta)
+
+
+def change_users(user_ids, field, delta):
+    _change(UserCounters.objects.filter(user_id__in=user_ids), field, delta)
+
+
+def change_post(post_id, field, delta):
+    _change(Post.objects.filter(pk=post_id), field, delta)
+
+
+def change_comment(comment_id, field, delta):
+    _change(Comment.objects.filter(pk=comment_id), field, delta)
+
+
+def change_group(group_id, field, delta):
+    if group_id is not None:
+        _change(Group.objects.filter(pk=group_id), field, delta)
+
+
+def _count(model, field, outer='pk', **filters):
+    """Подзапрос с числом строк model, ссылающихся на внешнюю строку"""
+    rows = (
+        model.objects.filter(**{field: OuterRef(outer)}, **filters)
+        .order_by()
+        .values(field)
+        .annotate(total=Count('*'))
+        .values('total')
+    )
+    return Coalesce(Subquery(rows), 0, output_field=IntegerField())
+
+
+def _repair(queryset, **counts):
+    """Исправить строки, чьи счетчики разошлись с агрегатами"""
+    actual = {f'actual_{field}': count for field, count in counts.items()}
+    drift = Q()
+    for field in counts:
+        drift |= ~Q(**{field: F(f'actual_{field}')})
+    fixed = 0
+    for row in queryset.annotate(**actual).filter(drift).iterator():
+        queryset.filter(pk=row.pk).update(**{
+            field: getattr(row, f'actual_{field}') for field in counts
+        })
+        fixed += 1
+    return fixed
+
+
+def reconcile():
+    """Пересчитать все счетчики; вернуть число исправленных строк"""
+    UserCounters.objects.bulk_create(
+        [
+            UserCounters(user_id=user_id)
+            for user_id in User.objects.filter(
+                counters__isnull=True
+            ).values_list('pk', flat=True)
+        ],
+        ignore_conflicts=True,
+    )
+    return {
+        'users': _repair(
+            UserCounters.objects.all(),
+            posts_count=_count(Post, 'author', 'user'),
+            followers_count=_count(Follow, 'author', 'user'),
+            following_count=_count(Follow, 'user', 'user'),
+        ),
+        'posts': _repair(
+            Post.objects.all(),
+            comments_count=_count(Comment, 'post'),
+        ),
+        'groups': _repair(
+            Group.objects.all(),
+            posts_count=_count(Post, 'group'),
+        ),
+        'comments': _repair(
+            Comment.objects.all(),
+            replies_count=_count(Comment, 'parent'),
+            thread_replies_count=_count(Comment, 'thread', depth__gt=0),
+        ),
+    }
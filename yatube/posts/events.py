@@ -0,0 +1,254 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import connection
+from django.urls import reverse
+
+from .graph import get_graph
+
+BUFFER_SIZE = 100
+
+logger = logging.getLogger(__name__)
+
+
+class Listener:
+    """Открытое соединение пользователя: очередь событий и флаг, на
+    котором поток соединения спит без запросов и без нагрузки"""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.events = deque(maxlen=BUFFER_SIZE)
+        self.ready = threading.Event()
+
+    def put(self, event):
+        self.events.append(event)
+        self.ready.set()
+
+    def wait(self, timeout):
+        """События, пришедшие за timeout секунд; пустой список - тишина"""
+        self.ready.wait(timeout)
+        self.ready.clear()
+        events = []
+        while self.events:
+            events.append(self.events.popleft())
+        return events
+
+
+class Broker:
+    """Издатель-подписчик процесса: событие автора получают открытые
+    соединения его подписчиков по графу подписок в памяти"""
+
+    def __init__(self):
+        self.listeners = {}
+        self.lock = threading.Lock()
+        self.count = 0
+
+    def listen(self, user_id):
+        """Новое соединение или None, если их уже слишком много"""
+        with self.lock:
+            if self.count >= settings.EVENTS_MAX_LISTENERS:
+                return None
+            listener = Listener(user_id)
+            self.listeners.setdefault(user_id, set()).add(listener)
+            self.count += 1
+        transport().listening()
+        return listener
+
+    def close(self, listener):
+        with self.lock:
+            listeners = self.listeners.get(listener.user_id, set())
+            if listener in listeners:
+                listeners.discard(listener)
+                self.count -= 1
+            if not listeners:
+                self.listeners.pop(listener.user_id, None)
+
+    def dispatch(self, event):
+        with self.lock:
+            listeners = {
+                user_id: list(found)
+                for user_id, found in self.listeners.items()
+            }
+        if not listeners:
+            return
+        # Перебирается меньшее: подписчики автора или открытые
+        # соединения процесса.
+        graph = get_graph()
+        followers = graph.followers.get(event['author_id'], ())
+        if len(followers) < len(listeners):
+            user_ids = [pk for pk in followers if pk in listeners]
+        else:
+            user_ids = [
+                pk for pk in listeners
+                if graph.is_following(pk, event['author_id'])
+            ]
+        for user_id in user_ids:
+            for listener in listeners[user_id]:
+                listener.put(event)
+
+
+broker = Broker()
+
+
+class LocalTransport:
+    """Доставка внутри процесса"""
+
+    def publish(self, event):
+        broker.dispatch(event)
+
+    def listening(self):
+        pass
+
+
+class SpoolTransport:
+    """Замена внешней шины для нескольких процессов одной машины:
+    события дописываются строками в общий файл, а один поток в каждом
+    процессе со слушателями читает новые строки и раздает их своим
+    соединениям.
+
+    Разросшийся файл не обрезается: издатель удаляет его и начинает
+    новый, а читатели дочитывают старый через открытый дескриптор и
+    переходят к новому, заметив смену файла."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def publish(self, event):
+        line = json.dumps(event, separators=(',', ':')) + '\n'
+        try:
+            if os.path.getsize(self.path) > settings.EVENTS_SPOOL_SIZE:
+                os.remove(self.path)
+        except OSError:
+            pass
+        with open(self.path, 'a', encoding='utf-8') as spool:
+            spool.write(line)
+
+    def listening(self):
+        with self.lock:
+            if self.thread is None:
+                # Файл открывается сразу: события после listen() не
+                # теряются.
+                spool = open(self.path, 'a+b')
+                spool.seek(0, os.SEEK_END)
+                self.thread = threading.Thread(
+                    target=self.follow, args=(spool,),
+                    name='events-spool', daemon=True,
+                )
+                self.thread.start()
+
+    def _replaced(self, spool):
+        """Издатель начал новый файл вместо открытого"""
+        try:
+            return os.stat(self.path).st_ino != os.fstat(spool.fileno()).st_ino
+        except OSError:
+            return False
+
+    def follow(self, spool):
+        try:
+            self._follow(spool)
+        except Exception:
+            logger.exception('Поток чтения %s остановился', self.path)
+        finally:
+            with self.lock:
+                self.thread = None
+            # Открытые соединения не должны остаться без событий.
+            if broker.count:
+                self.listening()
+
+    def _follow(self, spool):
+        pending = b''
+        try:
+            while True:
+                time.sleep(settings.EVENTS_POLL_INTERVAL)
+                replaced = self._replaced(spool)
+                if os.fstat(spool.fileno()).st_size < spool.tell():
+                    # Файл обрезали на месте: хвост прежней строки не
+                    # склеивается с новыми, чтение идет с начала.
+                    spool.seek(0)
+                    pending = b''
+                pending = self._dispatch(pending + spool.read())
+                if replaced:
+                    spool.close()
+                    spool = open(self.path, 'a+b')
+                    spool.seek(0)
+                    pending = b''
+        finally:
+            spool.close()
+
+    def _dispatch(self, data):
+        """Раздать полные строки; вернуть недописанный хвост"""
+        *lines, pending = data.split(b'\n')
+        for line in lines:
+            if not line.strip():
+                continue
+            # Битая или чужая строка не должна останавливать поток
+            # чтения.
+            try:
+                event = json.loads(line)
+                if not isinstance(event, dict) or not isinstance(
+                    event.get('author_id'), int
+                ):
+                    raise ValueError('нет author_id')
+                broker.dispatch(event)
+            except Exception:
+                logger.exception('Событие пропущено: %r', line[:200])
+        return pending
+
+
+_transports = {}
+
+
+def transport():
+    path = settings.EVENTS_SPOOL
+    if path not in _transports:
+        _transports[path] = SpoolTransport(path) if path else LocalTransport()
+    return _transports[path]
+
+
+def post_event(post):
+    return {
+        'author_id': post.author_id,
+        'author': post.author.username,
+        'post': post.pk,
+        'url': reverse('posts:post_detail', args=[post.pk]),
+    }
+
+
+def publish(event):
+    transport().publish(event)
+
+
+class Stream:
+    """Тело ответа text/event-stream. Соединение живет не дольше
+    EVENTS_TIMEOUT, после чего браузер переподключается сам; close()
+    снимает слушателя, даже если поток так и не начали читать."""
+
+    def __init__(self, listener):
+        self.listener = listener
+
+    def __iter__(self):
+        # Спящему соединению база не нужна.
+        if not connection.in_atomic_block:
+            connection.close()
+        yield f'retry: {settings.EVENTS_RETRY * 1000}\n\n'
+        deadline = time.monotonic() + settings.EVENTS_TIMEOUT
+        while time.monotonic() < deadline:
+            timeout = min(
+                settings.EVENTS_HEARTBEAT, deadline - time.monotonic()
+            )
+            events = self.listener.wait(max(timeout, 0))
+            if not events:
+                yield ': ping\n\n'
+            for event in events:
+                data = json.dumps(event, ensure_ascii=False)
+                yield f'event: post\ndata: {data}\n\n'
+
+    def close(self):
+        broker.close(self.listener)
@@ -0,0 +1,245 @@
+import csv
+import json
+import zipfile
+from itertools import chain, islice
+
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+
+from .models import Comment, Follow, Post
+
+FORMATS = {
+    'jsonl': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'zip': 'application/zip',
+}
+TABLES = ('posts', 'comments', 'follows')
+FIELDS = {
+    'posts': (
+        'id', 'author', 'group', 'text', 'pub_date', 'image',
+        'comments_count',
+    ),
+    'comments': ('id', 'post', 'parent', 'author', 'text', 'created'),
+    'follows': ('user', 'author'),
+}
+CHUNK_SIZE = 1000
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+def _after(ordering, row):
+    """Условие «строго после row» для сортировки по ordering; нестрогая
+    граница по первому полю дает индексу диапазон, остальное отсекает
+    уже выданные строки"""
+    condition, equal = Q(), {}
+    for field in ordering:
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= Q(**equal, **{f'{name}__{lookup}': row[name]})
+        equal[name] = row[name]
+    first = ordering[0].lstrip('-')
+    lookup = 'lte' if ordering[0].startswith('-') else 'gte'
+    return Q(**{f'{first}__{lookup}': row[first]}) & condition
+
+
+def keyset(queryset, ordering, *fields, **expressions):
+    """Строки запроса словарями, порциями по ключу сортировки: каждая
+    порция начинается по индексу с того места, где кончилась прежняя"""
+    queryset = queryset.order_by(*ordering).values(*fields, **expressions)
+    chunk = queryset
+    while True:
+        row = None
+        for row in chunk[:CHUNK_SIZE].iterator():
+            yield row
+        if row is None:
+            return
+        chunk = queryset.filter(_after(ordering, row))
+
+
+def _posts(posts):
+    return keyset(
+        posts, ('-pub_date', '-id'), 'id', 'text', 'pub_date', 'image',
+        'comments_count',
+        author_name=F('author__username'), group_slug=F('group__slug'),
+    )
+
+
+def post_records(posts):
+    for row in _posts(posts):
+        yield {
+            'id': row['id'],
+            'author': row['author_name'],
+            'group': row['group_slug'],
+            'text': row['text'],
+            'pub_date': row['pub_date'],
+            'image': row['image'] or None,
+            'comments_count': row['comments_count'],
+        }
+
+
+def _comment_record(row):
+    return {
+        'id': row['id'],
+        'post': row['post_id'],
+        'parent': row['parent_id'],
+        'author': row['author_name'],
+        'text': row['text'],
+        'created': row['created'],
+    }
+
+
+def _comments(comments, ordering):
+    rows = keyset(
+        comments, ordering, 'id', 'post_id', 'parent_id', 'text', 'created',
+        author_name=F('author__username'),
+    )
+    return map(_comment_record, rows)
+
+
+def comment_records(user=None, posts=None):
+    """Комментарии пользователя или комментарии к постам: во втором
+    случае по индексу постов для каждой порции их id"""
+    if user is not None:
+        yield from _comments(Comment.objects.filter(author=user), ('id',))
+        return
+    post_ids = (
+        row['id']
+        for row in keyset(posts, ('-pub_date', '-id'), 'id', 'pub_date')
+    )
+    chunk = list(islice(post_ids, CHUNK_SIZE))
+    while chunk:
+        yield from _comments(
+            Comment.objects.filter(post_id__in=chunk),
+            ('post_id', 'created', 'id'),
+        )
+        chunk = list(islice(post_ids, CHUNK_SIZE))
+
+
+def follow_records(user):
+    """Подписки пользователя, затем его подписчики"""
+    for follows, ordering in (
+        (Follow.objects.filter(user=user), ('author_id',)),
+        (Follow.objects.filter(author=user), ('user_id',)),
+    ):
+        for row in keyset(
+            follows, ordering, 'user_id', 'author_id',
+            user_name=F('user__username'), author_name=F('author__username'),
+        ):
+            yield {'user': row['user_name'], 'author': row['author_name']}
+
+
+def _posts_of(user=None, group=None):
+    if user is not None:
+        return Post.objects.filter(author=user)
+    return Post.objects.filter(group=group)
+
+
+def sources(user=None, group=None):
+    """Записи каждой таблицы выгрузки пользователя или группы"""
+    posts = _posts_of(user, group)
+    if user is not None:
+        return {
+            'posts': lambda: post_records(posts),
+            'comments': lambda: comment_records(user=user),
+            'follows': lambda: follow_records(user),
+        }
+    return {
+        'posts': lambda: post_records(posts),
+        'comments': lambda: comment_records(posts=posts),
+    }
+
+
+def jsonl(records, kind=None):
+    for record in records:
+        if kind is not None:
+            record = {'type': kind, **record}
+        yield (
+            json.dumps(record, ensure_ascii=False, cls=DjangoJSONEncoder)
+            + '\n'
+        ).encode()
+
+
+class _Echo:
+    """Файл для csv.writer, возвращающий строку вместо записи"""
+
+    def write(self, value):
+        return value
+
+
+def csv_rows(records, fields):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields).encode()
+    for record in records:
+        yield writer.writerow(
+            [
+                '' if record[field] is None else record[field]
+                for field in fields
+            ]
+        ).encode()
+
+
+def _image_chunks(name):
+    with default_storage.open(name, 'rb') as image:
+        for chunk in iter(lambda: image.read(FILE_CHUNK_SIZE), b''):
+            yield chunk
+
+
+def _images(posts):
+    for row in keyset(
+        posts.exclude(image='').exclude(image__isnull=True),
+        ('-pub_date', '-id'), 'id', 'pub_date', 'image',
+    ):
+        if default_storage.exists(row['image']):
+            yield f'images/{row["image"]}', _image_chunks(row['image'])
+
+
+class _Stream:
+    """Файл без seek: zipfile пишет в него, генератор забирает байты"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def archive(members):
+    """Zip из пар (имя, куски байтов), отдаваемый по мере записи"""
+    stream = _Stream()
+    with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        for name, chunks in members:
+            with zip_file.open(name, 'w', force_zip64=True) as member:
+                for chunk in chunks:
+                    member.write(chunk)
+                    data = stream.pop()
+                    if data:
+                        yield data
+    yield stream.pop()
+
+
+def export(file_format, table='posts', user=None, group=None):
+    """Байты выгрузки: JSONL со всеми таблицами, CSV одной таблицы или
+    zip с JSONL таблиц и картинками постов"""
+    tables = sources(user, group)
+    if file_format == 'csv':
+        return csv_rows(tables[table](), FIELDS[table])
+    if file_format == 'jsonl':
+        return (
+            line
+            for kind, records in tables.items()
+            for line in jsonl(records(), kind[:-1])
+        )
+    members = [
+        (f'{kind}.jsonl', jsonl(records()))
+        for kind, records in tables.items()
+    ]
+    return archive(chain(members, _images(_posts_of(user, group))))
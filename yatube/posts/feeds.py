@@ -0,0 +1,136 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.http import parse_http_date_safe
+from django.utils.text import Truncator
+
+from .caching import INDEX_TAG, author_tag, group_tag, tag_page
+from .models import Group, Post, User
+
+
+class PostsFeed(Feed):
+    """Последние посты. Ответ помечен тегами кэша страниц: анонимным
+    читателям XML отдается из кэша, пока не изменится один из его
+    постов, а ETag и Last-Modified позволяют ответить 304."""
+
+    def __call__(self, request, *args, **kwargs):
+        response = super().__call__(request, *args, **kwargs)
+        response['ETag'] = quote_etag(
+            hashlib.md5(response.content).hexdigest()
+        )
+        return get_conditional_response(
+            request,
+            etag=response['ETag'],
+            last_modified=parse_http_date_safe(response['Last-Modified']),
+            response=response,
+        )
+
+    def get_object(self, request, **kwargs):
+        """Владелец ленты и ее посты; теги ставятся по ним же"""
+        owner = self.get_owner(**kwargs)
+        posts = list(
+            self.get_posts(owner).select_related('author', 'group')
+            .order_by('-pub_date', '-id')[:settings.FEED_ITEMS]
+        )
+        tag_page(request, posts, self.get_tag(owner))
+        return owner, posts
+
+    def get_owner(self):
+        return None
+
+    def get_posts(self, owner):
+        return Post.objects.all()
+
+    def get_tag(self, owner):
+        return INDEX_TAG
+
+    def title(self, obj):
+        return 'Yatube: последние обновления'
+
+    def description(self, obj):
+        return self.title(obj)
+
+    def subtitle(self, obj):
+        return self.description(obj)
+
+    def link(self, obj):
+        return reverse('posts:index')
+
+    def items(self, obj):
+        return obj[1]
+
+    def item_title(self, post):
+        return Truncator(post.text).words(10)
+
+    def item_description(self, post):
+        return post.text
+
+    def item_link(self, post):
+        return reverse('posts:post_detail', args=[post.pk])
+
+    def item_author_name(self, post):
+        return post.author.get_full_name() or post.author.username
+
+    def item_pubdate(self, post):
+        return post.pub_date
+
+    def item_updateddate(self, post):
+        return post.updated_at
+
+    def item_categories(self, post):
+        return [post.group.title] if post.group_id else []
+
+
+class GroupFeed(PostsFeed):
+    def get_owner(self, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def get_posts(self, group):
+        return group.posts.all()
+
+    def get_tag(self, group):
+        return group_tag(group.slug)
+
+    def title(self, obj):
+        return f'Yatube: {obj[0].title}'
+
+    def description(self, obj):
+        return obj[0].description
+
+    def link(self, obj):
+        return reverse('posts:group_list', args=[obj[0].slug])
+
+
+class ProfileFeed(PostsFeed):
+    def get_owner(self, username):
+        return get_object_or_404(User, username=username)
+
+    def get_posts(self, author):
+        return author.posts.all()
+
+    def get_tag(self, author):
+        return author_tag(author.username)
+
+    def title(self, obj):
+        author = obj[0]
+        return f'Yatube: {author.get_full_name() or author.username}'
+
+    def link(self, obj):
+        return reverse('posts:profile', args=[obj[0].username])
+
+
+class AtomPostsFeed(PostsFeed):
+    feed_type = Atom1Feed
+
+
+class AtomGroupFeed(GroupFeed):
+    feed_type = Atom1Feed
+
+
+class AtomProfileFeed(ProfileFeed):
+    feed_type = Atom1Feed
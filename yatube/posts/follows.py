@@ -0,0 +1,77 @@
+from django.db import connection, transaction
+from django.dispatch import Signal
+
+from .models import Follow, User
+
+# Подписки менялись пачкой в обход сигналов модели: одна отправка на
+# читателя со списком авторов.
+follows_changed = Signal(providing_args=['user', 'authors', 'followed'])
+
+TABLE = connection.ops.quote_name(Follow._meta.db_table)
+USER = connection.ops.quote_name(Follow._meta.get_field('user').column)
+AUTHOR = connection.ops.quote_name(Follow._meta.get_field('author').column)
+
+
+def resolve(usernames):
+    """Пользователи по списку имен одним запросом"""
+    return list(
+        User.objects.filter(username__in=set(usernames)).only(
+            'id', 'username'
+        )
+    )
+
+
+def _returning(sql, params):
+    """Выполнить запрос с RETURNING и вернуть id авторов строк, которые
+    он действительно вставил или удалил"""
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return {row[0] for row in cursor.fetchall()}
+
+
+@transaction.atomic
+def follow(user, authors):
+    """Подписать на авторов одной вставкой; вернуть новых авторов"""
+    authors = list({
+        author.pk: author for author in authors if author.pk != user.pk
+    }.values())
+    if not authors:
+        return []
+    # Считаются только строки, вставленные этим запросом: параллельная
+    # подписка на того же автора не увеличит счетчики второй раз.
+    added_ids = _returning(
+        f'INSERT INTO {TABLE} ({USER}, {AUTHOR}) VALUES '
+        + ', '.join(['(%s, %s)'] * len(authors))
+        + f' ON CONFLICT DO NOTHING RETURNING {AUTHOR}',
+        [value for author in authors for value in (user.pk, author.pk)],
+    )
+    added = [author for author in authors if author.pk in added_ids]
+    if added:
+        # Вставка идет в обход сигналов модели: одна отправка на пачку.
+        follows_changed.send(
+            sender=Follow, user=user, authors=added, followed=True
+        )
+    return added
+
+
+@transaction.atomic
+def unfollow(user, authors):
+    """Отписать от авторов одним DELETE; вернуть авторов, от которых
+    пользователь действительно отписался"""
+    authors = list({author.pk: author for author in authors}.values())
+    if not authors:
+        return []
+    removed_ids = _returning(
+        f'DELETE FROM {TABLE} WHERE {USER} = %s AND {AUTHOR} IN ('
+        + ', '.join(['%s'] * len(authors))
+        + f') RETURNING {AUTHOR}',
+        [user.pk, *(author.pk for author in authors)],
+    )
+    removed = [author for author in authors if author.pk in removed_ids]
+    if removed:
+        # Удаление без выборки строк и без обработчиков на каждую из
+        # них: сигналы модели заменяет follows_changed.
+        follows_changed.send(
+            sender=Follow, user=user, authors=removed, followed=False
+        )
+    return removed
@@ -1,6 +1,8 @@
 from django import forms
+from django.urls import reverse_lazy
 
-from .models import Post, Comment
+from .models import Comment, Group, Post
+from .widgets import AutocompleteSelect
 
 
 class PostForm(forms.ModelForm):
@@ -15,6 +17,17 @@ class PostForm(forms.ModelForm):
             'text': 'Текст нового поста',
             'group': 'Группа, к которой будет относиться пост'
         }
+        widgets = {
+            'group': AutocompleteSelect(
+                reverse_lazy('posts:autocomplete', args=['groups'])
+            ),
+        }
+
+    def save(self, commit=True):
+        """Новая картинка ждет миниатюр, которые готовятся в фоне"""
+        if 'image' in self.changed_data:
+            self.instance.thumbnails_pending = bool(self.instance.image)
+        return super().save(commit)
 
 
 class CommentForm(forms.ModelForm):
@@ -27,3 +40,15 @@ class CommentForm(forms.ModelForm):
         help_texts = {
             'text': 'Текст комментария',
         }
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(label='Запрос', max_length=200)
+    group = forms.ModelChoiceField(
+        Group.objects.all(),
+        label='Группа',
+        required=False,
+        empty_label='Все группы',
+        to_field_name='slug',
+    )
+    author = forms.CharField(label='Автор', max_length=150, required=False)
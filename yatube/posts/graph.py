@@ -0,0 +1,228 @@
+import os
+import threading
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+
+from . import caching
+from .models import Follow
+
+EDGE_TYPE = 'q'
+
+
+def _contains(row, value):
+    index = bisect_left(row, value)
+    return index < len(row) and row[index] == value
+
+
+def _insert(index, key, value):
+    row = index.setdefault(key, array(EDGE_TYPE))
+    position = bisect_left(row, value)
+    if position == len(row) or row[position] != value:
+        row.insert(position, value)
+
+
+def _discard(index, key, value):
+    row = index.get(key)
+    if row is None:
+        return
+    position = bisect_left(row, value)
+    if position < len(row) and row[position] == value:
+        del row[position]
+    if not row:
+        del index[key]
+
+
+def _intersect(first, second):
+    """Пересечение отсортированных массивов: поиск меньшего в большем"""
+    small, large = sorted((first, second), key=len)
+    return [value for value in small if _contains(large, value)]
+
+
+class FollowGraph:
+    """Граф подписок в памяти: для каждого пользователя отсортированные
+    массивы id его подписок и подписчиков."""
+
+    def __init__(self, edges=()):
+        self.following = {}
+        self.followers = {}
+        for user_id, author_id in edges:
+            self.following.setdefault(user_id, array(EDGE_TYPE)).append(
+                author_id
+            )
+            self.followers.setdefault(author_id, array(EDGE_TYPE)).append(
+                user_id
+            )
+        for index in (self.following, self.followers):
+            for key, row in index.items():
+                index[key] = array(EDGE_TYPE, sorted(set(row)))
+
+    def __len__(self):
+        return sum(len(row) for row in self.following.values())
+
+    def edges(self):
+        for user_id, row in self.following.items():
+            for author_id in row:
+                yield user_id, author_id
+
+    def add(self, user_id, author_id):
+        _insert(self.following, user_id, author_id)
+        _insert(self.followers, author_id, user_id)
+
+    def remove(self, user_id, author_id):
+        _discard(self.following, user_id, author_id)
+        _discard(self.followers, author_id, user_id)
+
+    def is_following(self, user_id, author_id):
+        return _contains(self.following.get(user_id, ()), author_id)
+
+    def following_count(self, user_id):
+        return len(self.following.get(user_id, ()))
+
+    def followers_count(self, user_id):
+        return len(self.followers.get(user_id, ()))
+
+    def follow_state(self, user_id, author_ids):
+        """Подписан ли пользователь на каждого из авторов"""
+        row = self.following.get(user_id, ())
+        return {author_id: _contains(row, author_id)
+                for author_id in author_ids}
+
+    def mutual(self, user_id):
+        """Взаимные подписки пользователя"""
+        return _intersect(
+            self.following.get(user_id, ()),
+            self.followers.get(user_id, ()),
+        )
+
+    def followed_by_following(self, user_id, author_id):
+        """Подписки пользователя, которые подписаны на автора"""
+        return _intersect(
+            self.following.get(user_id, ()),
+            self.followers.get(author_id, ()),
+        )
+
+    def snapshot(self, path, last_follow_id):
+        """Записать граф плоским массивом пар рядом с отметкой id"""
+        flat = array(EDGE_TYPE, [last_follow_id, len(self)])
+        for edge in self.edges():
+            flat.extend(edge)
+        temporary = f'{path}.tmp'
+        with open(temporary, 'wb') as snapshot:
+            flat.tofile(snapshot)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+        """Граф и отметка id последней подписки из снимка"""
+        flat = array(EDGE_TYPE)
+        with open(path, 'rb') as snapshot:
+            flat.frombytes(snapshot.read())
+        last_follow_id, count = flat[0], flat[1]
+        pairs = flat[2:2 + 2 * count]
+        return cls(zip(pairs[::2], pairs[1::2])), last_follow_id
+
+
+_graph = None
+_generation = None
+_lock = threading.Lock()
+
+
+def _from_database():
+    return FollowGraph(Follow.objects.values_list('user_id', 'author_id'))
+
+
+def _from_snapshot(path):
+    """Граф из снимка с подписками, добавленными после него; если
+    подписки с тех пор удалялись, снимок не годится"""
+    graph, last_follow_id = FollowGraph.load(path)
+    kept = Follow.objects.filter(pk__lte=last_follow_id).count()
+    if kept != len(graph):
+        return None
+    newer = Follow.objects.filter(pk__gt=last_follow_id).values_list(
+        'user_id', 'author_id'
+    )
+    for user_id, author_id in newer:
+        graph.add(user_id, author_id)
+    return graph
+
+
+def _build():
+    path = settings.FOLLOW_GRAPH_SNAPSHOT
+    if path and os.path.exists(path):
+        graph = _from_snapshot(path)
+        if graph is not None:
+            return graph
+    return _from_database()
+
+
+def _change(graph, user_id, author_ids, followed):
+    for author_id in author_ids:
+        if followed:
+            graph.add(user_id, author_id)
+        else:
+            graph.remove(user_id, author_id)
+
+
+def _catch_up(generation):
+    """Догнать чужие записи их изменениями вместо полной перестройки"""
+    global _generation
+    if _graph is None or _generation is None:
+        return False
+    if not 0 < generation - _generation <= settings.FOLLOW_GRAPH_DELTAS:
+        return False
+    deltas = caching.follow_graph_deltas(_generation, generation)
+    if deltas is None:
+        return False
+    for user_id, author_ids, followed in deltas:
+        _change(_graph, user_id, author_ids, followed)
+    _generation = generation
+    return True
+
+
+def get_graph():
+    """Граф процесса; подписки, сделанные другими процессами,
+    применяются их изменениями, а граф перестраивается, только если
+    процесс отстал слишком сильно"""
+    global _graph, _generation
+    generation = caching.follow_graph_generation()
+    if _graph is None or generation != _generation:
+        with _lock:
+            if _graph is None or generation != _generation:
+                if not _catch_up(generation):
+                    _graph = _build()
+                    _generation = generation
+    return _graph
+
+
+def reset():
+    global _graph
+    with _lock:
+        _graph = None
+
+
+def apply(user_id, *author_ids, followed):
+    """Применить подписки или отписки после фиксации транзакции"""
+    global _generation
+    generation = caching.bump_follow_graph_generation(
+        (user_id, author_ids, followed)
+    )
+    with _lock:
+        if _graph is None:
+            return
+        _change(_graph, user_id, author_ids, followed)
+        # Поколение сдвинул только этот процесс: граф уже актуален.
+        # Иначе get_graph повторит это изменение по порядку вместе
+        # с чужими, а повтор подписки или отписки ничего не ломает.
+        if _generation is not None and generation == _generation + 1:
+            _generation = generation
+
+
+def save_snapshot(path=None):
+    """Снять снимок графа по базе для быстрого старта воркеров"""
+    path = path or settings.FOLLOW_GRAPH_SNAPSHOT
+    rows = list(Follow.objects.values_list('pk', 'user_id', 'author_id'))
+    graph = FollowGraph((user_id, author_id) for _, user_id, author_id in rows)
+    graph.snapshot(path, max((row[0] for row in rows), default=0))
+    return len(graph)
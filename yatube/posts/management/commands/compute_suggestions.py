@@ -0,0 +1,147 @@
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F
+from django.utils import timezone
+from scipy import sparse
+
+from posts import suggestions
+from posts.models import Comment, Follow, User
+
+BATCH_SIZE = 500
+
+
+def _ids(*groups):
+    """Все id пользователей из выборок: пары из таблиц читаются не
+    одновременно со списком пользователей"""
+    return np.unique(np.concatenate([
+        np.array(group, dtype=np.int64).reshape(-1) for group in groups
+    ]))
+
+
+def _matrix(ids, rows, weights=None):
+    """Разреженная матрица пользователь x автор по парам id"""
+    shape = (len(ids), len(ids))
+    if not rows:
+        return sparse.csr_matrix(shape)
+    pairs = np.array(rows, dtype=np.int64)
+    if weights is None:
+        weights = np.ones(len(pairs))
+    return sparse.csr_matrix(
+        (
+            weights,
+            (
+                np.searchsorted(ids, pairs[:, 0]),
+                np.searchsorted(ids, pairs[:, 1]),
+            ),
+        ),
+        shape=shape,
+    )
+
+
+def _normalized(matrix):
+    """Столбцы матрицы единичной длины для косинусной близости"""
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    norms[norms == 0] = 1
+    return (matrix @ sparse.diags(1 / norms)).tocsc()
+
+
+def _similarity(normalized, authors):
+    """Строки косинусной близости только для нужных авторов, без
+    близости автора к самому себе"""
+    rows = (normalized[:, authors].T @ normalized).tocsr()
+    index = np.arange(len(authors))
+    own = np.asarray(rows[index, authors]).ravel()
+    rows = rows - sparse.csr_matrix((own, (index, authors)), shape=rows.shape)
+    rows.eliminate_zeros()
+    return rows
+
+
+def _top(columns, values, limit):
+    """Лучшие limit столбцов строки по убыванию оценки"""
+    if len(values) > limit:
+        best = np.argpartition(-values, limit - 1)[:limit]
+    else:
+        best = np.arange(len(values))
+    best = best[np.argsort(-values[best], kind='stable')]
+    return columns[best], values[best]
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рекомендации авторов по совместным подпискам '
+        'и комментариям'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересчитать всех, а не только отмеченных пользователей',
+        )
+
+    def handle(self, *args, **options):
+        started, clock = timezone.now(), time.monotonic()
+        followed_pairs = list(
+            Follow.objects.values_list('user_id', 'author_id')
+        )
+        commented = list(
+            Comment.objects.exclude(author=F('post__author'))
+            .values_list('author_id', 'post__author_id')
+            .annotate(total=Count('id'))
+            .order_by()
+        )
+        commented_pairs = [row[:2] for row in commented]
+        ids = _ids(
+            list(User.objects.values_list('pk', flat=True)),
+            followed_pairs,
+            commented_pairs,
+        )
+        users = ids if options['all'] else np.intersect1d(
+            ids, np.array(suggestions.stale_users(), dtype=np.int64)
+        )
+        follows = _matrix(ids, followed_pairs)
+        comments = _matrix(
+            ids, commented_pairs, np.log1p([row[2] for row in commented])
+        )
+        weight = settings.SUGGESTIONS_COMMENT_WEIGHT
+        normalized_follows = _normalized(follows)
+        normalized_comments = _normalized(comments)
+        interests = follows + weight * comments
+        limit = settings.SUGGESTIONS_PER_USER
+        stored = 0
+        for start in range(0, len(users), BATCH_SIZE):
+            batch = users[start:start + BATCH_SIZE]
+            rows = np.searchsorted(ids, batch)
+            interest = interests[rows]
+            # Близость нужна только для авторов, которых эти
+            # пользователи читают или обсуждают.
+            authors = np.unique(interest.indices)
+            similarity = (
+                _similarity(normalized_follows, authors)
+                + weight * _similarity(normalized_comments, authors)
+            )
+            scores = (interest[:, authors] @ similarity).tolil()
+            # Себя и уже читаемых авторов не рекомендуем.
+            followed = follows[rows].tocoo()
+            scores[followed.row, followed.col] = 0
+            scores[np.arange(len(rows)), rows] = 0
+            scores = scores.tocsr()
+            scores.eliminate_zeros()
+            suggested = {}
+            for index, user_id in enumerate(batch.tolist()):
+                row = slice(scores.indptr[index], scores.indptr[index + 1])
+                columns, values = _top(
+                    scores.indices[row], scores.data[row], limit
+                )
+                suggested[user_id] = list(
+                    zip(ids[columns].tolist(), values.tolist())
+                )
+                stored += len(columns)
+            suggestions.store(suggested, started)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пользователей: {len(users)}, рекомендаций: {stored}, '
+            f'время: {time.monotonic() - clock:.1f} с'
+        ))
@@ -0,0 +1,59 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+from posts.models import Group, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты, комментарии и подписки автора или группы '
+        'в JSONL, CSV или zip с картинками, не держа их в памяти'
+    )
+
+    def add_arguments(self, parser):
+        owner = parser.add_mutually_exclusive_group(required=True)
+        owner.add_argument('--user', help='Имя автора')
+        owner.add_argument('--group', help='Адрес (slug) группы')
+        parser.add_argument(
+            '--format', choices=export.FORMATS, default='jsonl',
+        )
+        parser.add_argument(
+            '--table', choices=export.TABLES, default='posts',
+            help='Таблица для CSV',
+        )
+        parser.add_argument(
+            '--output', default='-',
+            help='Файл выгрузки; «-» пишет в стандартный вывод',
+        )
+
+    def handle(self, *args, **options):
+        user = group = None
+        try:
+            if options['user'] is not None:
+                user = User.objects.get(username=options['user'])
+            else:
+                group = Group.objects.get(slug=options['group'])
+        except (User.DoesNotExist, Group.DoesNotExist):
+            raise CommandError('Нет такого автора или группы')
+        if options['table'] not in export.sources(user, group):
+            raise CommandError('У группы нет таблицы подписок')
+        chunks = export.export(
+            options['format'], options['table'], user, group
+        )
+        if options['output'] == '-':
+            self.write(sys.stdout.buffer, chunks)
+            return
+        with open(options['output'], 'wb') as output:
+            size = self.write(output, chunks)
+        self.stdout.write(self.style.SUCCESS(
+            f'Записано {size} Б в {options["output"]}'
+        ))
+
+    def write(self, output, chunks):
+        size = 0
+        for chunk in chunks:
+            output.write(chunk)
+            size += len(chunk)
+        return size
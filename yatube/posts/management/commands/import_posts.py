@@ -0,0 +1,236 @@
+import csv
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.page_cache import purge
+from posts import autocomplete, caching, counters, tags, timeline
+from posts.models import Follow, Group, Post, User
+
+BATCH_SIZE = 500
+CHUNK_SIZE = 5000
+
+
+def _chunks(items, size):
+    items = iter(items)
+    chunk = list(islice(items, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(items, size))
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует посты из JSONL или CSV пачками bulk_create, '
+        'минуя сигналы, и один раз пересобирает производные данные'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Файл с постами; «-» читает стандартный ввод'
+        )
+        parser.add_argument(
+            '--format', choices=('jsonl', 'csv'),
+            help='Формат файла; по умолчанию по расширению',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Постов в одной вставке',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=CHUNK_SIZE,
+            help='Постов в одной транзакции',
+        )
+        parser.add_argument(
+            '--images', metavar='DIRECTORY',
+            help='Каталог с картинками, на которые ссылается поле image',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        path, images = options['path'], options['images']
+        if images is not None and not os.path.isdir(images):
+            raise CommandError(f'Нет каталога с картинками: {images}')
+        file_format = options['format'] or (
+            'csv' if path.lower().endswith('.csv') else 'jsonl'
+        )
+        # Имена уже известных авторов и групп: каждая пачка спрашивает
+        # базу только о новых.
+        self.authors, self.groups = {}, {}
+        self.touched_groups, self.touched_tags = set(), set()
+        self.images, self.skipped, imported = images, 0, 0
+        try:
+            with self.open(path) as stream:
+                rows = self.rows(stream, file_format)
+                for chunk in _chunks(rows, options['chunk_size']):
+                    with transaction.atomic():
+                        count = sum(
+                            self.insert(batch)
+                            for batch in _chunks(chunk, options['batch_size'])
+                        )
+                    imported += count
+                    self.stdout.write(f'Импортировано постов: {imported}')
+        finally:
+            # Упавшая пачка откатывается целиком, но уже зафиксированным
+            # нужны счетчики, ленты и сброс кэша.
+            if imported:
+                self.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Постов: {imported}, пропущено строк: {self.skipped}, '
+            f'время: {time.monotonic() - started:.1f} с'
+        ))
+
+    @contextmanager
+    def open(self, path):
+        if path == '-':
+            yield sys.stdin
+            return
+        try:
+            stream = open(path, encoding='utf-8', newline='')
+        except OSError as error:
+            raise CommandError(f'Не удалось открыть {path}: {error}')
+        with stream:
+            yield stream
+
+    def rows(self, stream, file_format):
+        """Проверенные строки файла; негодные пропускаются с сообщением"""
+        if file_format == 'csv':
+            records = enumerate(csv.DictReader(stream), 2)
+        else:
+            records = (
+                (number, line)
+                for number, line in enumerate(stream, 1)
+                if line.strip()
+            )
+        for number, record in records:
+            try:
+                if file_format == 'jsonl':
+                    record = json.loads(record)
+                yield self.parse(record)
+            except (ValueError, TypeError, AttributeError) as error:
+                self.skipped += 1
+                self.stderr.write(f'Строка {number} пропущена: {error}')
+
+    def parse(self, record):
+        author = (record.get('author') or '').strip()
+        text = record.get('text') or ''
+        if not author or not text.strip():
+            raise ValueError('нужны author и text')
+        pub_date = timezone.now()
+        if record.get('pub_date'):
+            pub_date = parse_datetime(record['pub_date'])
+            if pub_date is None:
+                raise ValueError(f'неверная дата {record["pub_date"]}')
+            if timezone.is_naive(pub_date):
+                pub_date = timezone.make_aware(pub_date)
+        return {
+            'author': author,
+            'text': text,
+            'group': (record.get('group') or '').strip() or None,
+            'pub_date': pub_date,
+            'image': record.get('image') or None,
+        }
+
+    def resolve(self, model, field, known, names, new):
+        """Дополнить словарь имя -> id, создав недостающие объекты"""
+        missing = names - known.keys()
+        if not missing:
+            return []
+        known.update(
+            model.objects.filter(**{f'{field}__in': missing})
+            .values_list(field, 'pk')
+        )
+        missing -= known.keys()
+        if not missing:
+            return []
+        model.objects.bulk_create([new(name) for name in missing])
+        created = list(model.objects.filter(**{f'{field}__in': missing}))
+        known.update((getattr(obj, field), obj.pk) for obj in created)
+        return created
+
+    def insert(self, batch):
+        users = self.resolve(
+            User, 'username', self.authors,
+            {row['author'] for row in batch},
+            lambda name: User(username=name, password=make_password(None)),
+        )
+        groups = self.resolve(
+            Group, 'slug', self.groups,
+            {row['group'] for row in batch if row['group']},
+            lambda slug: Group(title=slug, slug=slug, description=''),
+        )
+        autocomplete.index_new(users, groups)
+        posts = []
+        for row in batch:
+            image = self.image(row['image'])
+            posts.append(Post(
+                author_id=self.authors[row['author']],
+                group_id=self.groups.get(row['group']),
+                text=row['text'],
+                pub_date=row['pub_date'],
+                image=image,
+                thumbnails_pending=bool(image),
+            ))
+            self.touched_groups.add(row['group'])
+        Post.objects.bulk_create(posts)
+        if posts[0].pk is None:
+            # SQLite не возвращает ключи вставки. Транзакция держит
+            # блокировку записи, поэтому последние id принадлежат пачке.
+            ids = Post.objects.order_by('-pk').values_list('pk', flat=True)
+            for post, pk in zip(posts, reversed(ids[:len(posts)])):
+                post.pk = pk
+        # auto_now_add подставил при вставке текущее время: дата из файла
+        # пишется вторым запросом на пачку.
+        for post, row in zip(posts, batch):
+            post.pub_date = row['pub_date']
+        Post.objects.bulk_update(posts, ['pub_date'])
+        self.touched_tags |= tags.attach(
+            (post.pk, post.pub_date, post.text) for post in posts
+        )
+        return len(posts)
+
+    def image(self, name):
+        """Скопировать картинку в хранилище; файлы отмененной транзакции
+        уберет warm_thumbnails как осиротевшие"""
+        if not name or self.images is None:
+            return None
+        source = os.path.join(self.images, os.path.basename(name))
+        if not os.path.isfile(source):
+            self.stderr.write(f'Нет картинки {source}, пост без нее')
+            return None
+        field = Post._meta.get_field('image')
+        with open(source, 'rb') as image:
+            return default_storage.save(
+                field.generate_filename(None, os.path.basename(name)),
+                File(image),
+            )
+
+    def rebuild(self):
+        """Один раз сделать то, что сигналы делают на каждый пост"""
+        counters.reconcile()
+        author_ids = self.authors.values()
+        for chunk in _chunks(author_ids, BATCH_SIZE):
+            follows = Follow.objects.filter(author_id__in=chunk)
+            for user_id, author_id in follows.values_list(
+                'user_id', 'author_id'
+            ).iterator():
+                timeline.backfill(user_id, author_id)
+        caching.bump_feed_generation()
+        purge(
+            caching.INDEX_TAG,
+            *(caching.author_tag(name) for name in self.authors),
+            *(caching.group_tag(slug) for slug in self.touched_groups
+              if slug),
+            *(caching.hashtag_tag(name) for name in self.touched_tags),
+        )
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Готовит миниатюры новых картинок постов; с --watch работает '
+        'фоновым воркером'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--watch', type=float, metavar='SECONDS',
+            help=(
+                'Повторять проход с такой паузой, подхватывая новые '
+                'картинки'
+            ),
+        )
+
+    def handle(self, *args, **options):
+        # Битые картинки не пробуются заново на каждом проходе.
+        failed = set()
+        while True:
+            pending = (
+                Post.objects.filter(thumbnails_pending=True)
+                .exclude(pk__in=failed)
+                .order_by('pk')
+                .values_list('pk', flat=True)
+            )
+            for post_id in list(pending):
+                try:
+                    thumbnails.generate(post_id)
+                except Exception as error:
+                    failed.add(post_id)
+                    self.stderr.write(f'Пост {post_id}: {error}')
+            if options['watch'] is None:
+                return
+            time.sleep(options['watch'])
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает полнотекстовый индекс постов'
+
+    def handle(self, *args, **options):
+        if not search.supported():
+            self.stdout.write('Полнотекстовый индекс есть только в SQLite')
+            return
+        search.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Постов в индексе: {Post.objects.count()}'
+        ))
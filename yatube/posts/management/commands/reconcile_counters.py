@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счетчики и исправляет расхождения'
+
+    def handle(self, *args, **options):
+        fixed = counters.reconcile()
+        for table, count in fixed.items():
+            self.stdout.write(f'{table}: исправлено {count}')
+        self.stdout.write(self.style.SUCCESS('Счетчики сверены'))
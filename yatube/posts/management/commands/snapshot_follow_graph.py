@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import graph
+
+
+class Command(BaseCommand):
+    help = 'Сохраняет снимок графа подписок для быстрого старта воркеров'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', help='Куда записать снимок')
+
+    def handle(self, *args, **options):
+        count = graph.save_snapshot(options['path'])
+        self.stdout.write(self.style.SUCCESS(f'Подписок в снимке: {count}'))
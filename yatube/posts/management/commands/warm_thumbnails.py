@@ -0,0 +1,152 @@
+import os
+import posixpath
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import timedelta
+from itertools import islice
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from sorl.thumbnail import default as sorl
+from sorl.thumbnail.images import ImageFile
+
+from posts import thumbnails, variants
+from posts.models import Post, PostImageVariant
+
+# Свежий файл может принадлежать посту, который еще сохраняется.
+ORPHAN_GRACE = timedelta(hours=1)
+# Задач в работе на один процесс: остальные ждут в списке, а не в пуле.
+JOBS_PER_WORKER = 2
+
+
+def _render(post_id, name):
+    """Работа процесса: только декодирование и сжатие, без базы"""
+    try:
+        return post_id, variants.render_file(name), None
+    except Exception as error:
+        return post_id, None, str(error)
+
+
+def _walk(directory):
+    if not default_storage.exists(directory):
+        return
+    directories, files = default_storage.listdir(directory)
+    for name in files:
+        yield posixpath.join(directory, name)
+    for subdirectory in directories:
+        yield from _walk(posixpath.join(directory, subdirectory))
+
+
+class Command(BaseCommand):
+    help = (
+        'Готовит варианты картинок постов в несколько процессов '
+        'и удаляет осиротевшие файлы'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--jobs', type=int, default=os.cpu_count() or 1,
+            help='Число процессов, сжимающих картинки',
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересобрать варианты и у уже готовых постов',
+        )
+        parser.add_argument(
+            '--no-cleanup', action='store_true',
+            help='Не удалять осиротевшие файлы',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        posts = Post.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['force']:
+            # Готовые посты пропускаются, поэтому прерванный запуск
+            # продолжается с того места, где остановился.
+            posts = posts.annotate(
+                has_variants=Exists(
+                    PostImageVariant.objects.filter(post=OuterRef('pk'))
+                )
+            ).filter(Q(thumbnails_pending=True) | Q(has_variants=False))
+        jobs = list(posts.order_by('pk').values_list('pk', 'image'))
+        built = written = failed = 0
+        for done, (post_id, rendered, error) in enumerate(
+            self.rendered(jobs, options['jobs']), 1
+        ):
+            prefix = f'[{done}/{len(jobs)}] пост {post_id}'
+            if error is not None:
+                failed += 1
+                self.stderr.write(f'{prefix}: {error}')
+                continue
+            post = (
+                Post.objects.select_related('author', 'group')
+                .filter(pk=post_id).first()
+            )
+            if post is None or not post.image:
+                continue
+            size = sum(variant.size for variant in variants.store(
+                post, rendered
+            ))
+            thumbnails.publish(post)
+            built += 1
+            written += size
+            self.stdout.write(f'{prefix}: {len(rendered)} файлов, {size} Б')
+        removed = freed = 0
+        if not options['no_cleanup']:
+            removed, freed = self.cleanup()
+        self.stdout.write(self.style.SUCCESS(
+            f'Постов: {built}, ошибок: {failed}, записано: {written} Б; '
+            f'удалено файлов: {removed}, освобождено: {freed} Б; '
+            f'время: {time.monotonic() - started:.1f} с'
+        ))
+
+    def rendered(self, jobs, workers):
+        if workers <= 1:
+            for job in jobs:
+                yield _render(*job)
+            return
+        # Дочерние процессы не должны унаследовать открытые соединения.
+        connections.close_all()
+        jobs = iter(jobs)
+        window = workers * JOBS_PER_WORKER
+        running = set()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            try:
+                while True:
+                    for job in islice(jobs, window - len(running)):
+                        running.add(pool.submit(_render, *job))
+                    if not running:
+                        return
+                    done, running = wait(
+                        running, return_when=FIRST_COMPLETED
+                    )
+                    for future in done:
+                        yield future.result()
+            finally:
+                # Прерванный запуск не дожидается уже поставленных задач.
+                for future in running:
+                    future.cancel()
+
+    def cleanup(self):
+        """Удалить исходники и варианты, на которые не ссылается ни
+        один пост, вместе с их миниатюрами sorl"""
+        referenced = set(Post.objects.values_list('image', flat=True))
+        referenced.update(
+            PostImageVariant.objects.values_list('file', flat=True)
+        )
+        upload_to = Post._meta.get_field('image').upload_to.rstrip('/')
+        cutoff = timezone.now() - ORPHAN_GRACE
+        removed = freed = 0
+        for name in _walk(upload_to):
+            if name in referenced:
+                continue
+            if default_storage.get_modified_time(name) > cutoff:
+                continue
+            freed += default_storage.size(name)
+            sorl.kvstore.delete_thumbnails(ImageFile(name, default_storage))
+            default_storage.delete(name)
+            removed += 1
+        return removed, freed
@@ -0,0 +1,131 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:28
+
+from collections import Counter
+from datetime import timedelta
+import re
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+# Разбор хэштегов на момент миграции: posts.tags может меняться дальше.
+HASHTAG = re.compile(r'(?<![\w#])#(\w{1,64})(?!\w)')
+
+
+def extract(text):
+    return {name.lower() for name in HASHTAG.findall(text)}
+
+
+def window_start():
+    return timezone.localdate() - timedelta(days=settings.TRENDING_TAGS_DAYS)
+
+
+def fill_tags(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Tag = apps.get_model('posts', 'Tag')
+    PostTag = apps.get_model('posts', 'PostTag')
+    TagDay = apps.get_model('posts', 'TagDay')
+    posts = [
+        (pk, pub_date, extract(text))
+        for pk, pub_date, text in Post.objects.values_list(
+            'pk', 'pub_date', 'text'
+        ).iterator()
+    ]
+    cutoff = window_start()
+    totals, recent, days = Counter(), Counter(), Counter()
+    for _, pub_date, names in posts:
+        day = timezone.localdate(pub_date)
+        for name in names:
+            totals[name] += 1
+            recent[name] += day > cutoff
+            days[name, day] += 1
+    Tag.objects.bulk_create([
+        Tag(name=name, posts_count=count, recent_count=recent[name])
+        for name, count in totals.items()
+    ])
+    tag_ids = dict(Tag.objects.values_list('name', 'pk'))
+    PostTag.objects.bulk_create(
+        [
+            PostTag(post_id=pk, tag_id=tag_ids[name], pub_date=pub_date)
+            for pk, pub_date, names in posts
+            for name in names
+        ],
+        batch_size=500,
+    )
+    TagDay.objects.bulk_create([
+        TagDay(
+            tag_id=tag_ids[name],
+            day=day,
+            posts_count=count,
+            expired=day <= cutoff,
+        )
+        for (name, day), count in days.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_post_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostTag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True)),
+                ('posts_count', models.PositiveIntegerField(default=0)),
+                ('recent_count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TagDay',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('posts_count', models.IntegerField(default=0)),
+                ('expired', models.BooleanField(default=False)),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='days', to='posts.Tag')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['-recent_count', 'name'], name='tag_trending_idx'),
+        ),
+        migrations.AddField(
+            model_name='posttag',
+            name='post',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_tags', to='posts.Post'),
+        ),
+        migrations.AddField(
+            model_name='posttag',
+            name='tag',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_tags', to='posts.Tag'),
+        ),
+        migrations.AddIndex(
+            model_name='tagday',
+            index=models.Index(fields=['expired', 'day'], name='tag_day_expiry_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='tagday',
+            constraint=models.UniqueConstraint(fields=('tag', 'day'), name='tag_day_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='posttag',
+            index=models.Index(fields=['tag', '-pub_date', '-post'], name='post_tag_feed_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='posttag',
+            constraint=models.UniqueConstraint(fields=('post', 'tag'), name='post_tag_unique'),
+        ),
+        migrations.RunPython(fill_tags, migrations.RunPython.noop),
+    ]
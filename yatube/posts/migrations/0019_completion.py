@@ -0,0 +1,94 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Ключи и индекс триграмм на момент миграции: posts.autocomplete может
+# меняться дальше.
+FTS_TABLE = 'posts_completion_fts'
+INSTALL = (
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        key,
+        content='posts_completion',
+        content_rowid='id',
+        tokenize='trigram'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert
+    AFTER INSERT ON posts_completion BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, key) VALUES (new.id, new.key);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete
+    AFTER DELETE ON posts_completion BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, key)
+        VALUES ('delete', old.id, old.key);
+    END""",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+)
+UNINSTALL = (
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_insert',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_delete',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+)
+
+
+def normalize(value):
+    return ' '.join(value.lower().replace('ё', 'е').split())[:255]
+
+
+def execute(schema_editor, statements):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in statements:
+            schema_editor.execute(statement)
+
+
+def fill_completions(apps, schema_editor):
+    Completion = apps.get_model('posts', 'Completion')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Group = apps.get_model('posts', 'Group')
+    rows = []
+    users = User.objects.values_list(
+        'pk', 'username', 'first_name', 'last_name'
+    )
+    for pk, *names in users.iterator():
+        full_name = ' '.join(names[1:])
+        for key in {normalize(names[0]),
+                    normalize(full_name)} - {''}:
+            rows.append(Completion(kind='user', key=key, user_id=pk))
+    for pk, *names in Group.objects.values_list(
+        'pk', 'title', 'slug'
+    ).iterator():
+        for key in {normalize(name) for name in names} - {''}:
+            rows.append(Completion(kind='group', key=key, group_id=pk))
+    Completion.objects.bulk_create(rows, batch_size=500)
+    execute(schema_editor, INSTALL)
+
+
+def drop_trigrams(apps, schema_editor):
+    execute(schema_editor, UNINSTALL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0018_auto_20261018_0628'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Completion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('user', 'Пользователь'), ('group', 'Группа')], max_length=5)),
+                ('key', models.CharField(max_length=255)),
+                ('group', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Group')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='completion',
+            index=models.Index(fields=['kind', 'key'], name='completion_prefix_idx'),
+        ),
+        migrations.RunPython(fill_completions, drop_trigrams),
+    ]
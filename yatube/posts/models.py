@@ -8,6 +8,8 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self) -> str:
         return self.title
@@ -32,13 +34,95 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True, null=True,
     )
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    thumbnails_pending = models.BooleanField(default=False, editable=False)
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx',
+            ),
+            models.Index(
+                fields=['author', '-updated_at'],
+                name='post_author_updated_idx',
+            ),
+            models.Index(
+                fields=['group', '-updated_at'],
+                name='post_group_updated_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    def picture(self):
+        """Источники для <picture> из сохраненных вариантов картинки"""
+        if not self.image:
+            return None
+        variants = sorted(self.variants.all(), key=lambda v: v.width)
+        if not variants:
+            return None
+        by_format = {}
+        for variant in variants:
+            by_format.setdefault(variant.format, []).append(variant)
+        fallback = by_format.get(PostImageVariant.JPEG, variants)
+        return {
+            'sources': [
+                {
+                    'type': PostImageVariant.MIME_TYPES[image_format],
+                    'srcset': _srcset(by_format[image_format]),
+                }
+                for image_format in by_format
+                if image_format != PostImageVariant.JPEG
+            ],
+            'img': fallback[-1],
+            'srcset': _srcset(fallback),
+        }
+
+
+def _srcset(variants):
+    return ', '.join(
+        f'{variant.file.url} {variant.width}w' for variant in variants
+    )
+
+
+class PostImageVariant(models.Model):
+    """Готовый размер картинки поста с метаданными для разметки."""
+    WEBP = 'webp'
+    JPEG = 'jpeg'
+    FORMATS = [(WEBP, 'WebP'), (JPEG, 'JPEG')]
+    MIME_TYPES = {WEBP: 'image/webp', JPEG: 'image/jpeg'}
+
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='variants',
+    )
+    file = models.FileField(upload_to='posts/variants/')
+    format = models.CharField(max_length=4, choices=FORMATS)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    size = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'format', 'width'],
+                name='variant_unique',
+            ),
+        ]
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -53,6 +137,53 @@ class Comment(models.Model):
     )
     text = models.TextField(blank=False)
     created = models.DateTimeField(auto_now_add=True)
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        blank=True, null=True,
+        related_name='replies',
+    )
+    # Корень ветки и путь от него: id предков фиксированной ширины,
+    # поэтому сортировка по пути выводит дерево в порядке обхода.
+    thread = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        blank=True, null=True,
+        related_name='+',
+        editable=False,
+    )
+    path = models.CharField(
+        max_length=255, unique=True, null=True, editable=False
+    )
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    # Порядковый номер ответа в ветке: первые K ответов ветки всегда
+    # включают своих родителей.
+    position = models.PositiveIntegerField(default=0, editable=False)
+    replies_count = models.PositiveIntegerField(default=0, editable=False)
+    thread_replies_count = models.PositiveIntegerField(
+        default=0, editable=False
+    )
+    last_position = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'created'],
+                name='comment_post_created_idx',
+            ),
+            models.Index(
+                fields=['post', 'depth', 'created'],
+                name='comment_post_roots_idx',
+            ),
+            models.Index(
+                fields=['thread', 'position'],
+                name='comment_thread_position_idx',
+            ),
+            models.Index(
+                fields=['-created', '-id'],
+                name='comment_created_idx',
+            ),
+        ]
 
 
 class Follow(models.Model):
@@ -78,3 +209,218 @@ class Follow(models.Model):
                 name="author_not_user"
             ),
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx',
+            ),
+        ]
+
+
+class UserCounters(models.Model):
+    """Денормализованные счетчики пользователя."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='counters',
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+
+class TimelineEntry(models.Model):
+    """Пост в материализованной ленте подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='timeline_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_feed_idx',
+            ),
+            models.Index(
+                fields=['user', 'author', '-pub_date'],
+                name='timeline_author_idx',
+            ),
+        ]
+
+
+class PullAuthor(models.Model):
+    """Автор с большим числом подписчиков: его посты не раскладываются
+    по лентам при публикации, а подтягиваются читателем.
+    """
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='pull_author',
+    )
+
+
+class Suggestion(models.Model):
+    """Рекомендованный автор: строки пересчитывает compute_suggestions."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='suggestions',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='suggestion_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-score'],
+                name='suggestion_user_score_idx',
+            ),
+        ]
+
+
+class StaleSuggestions(models.Model):
+    """Пользователь, чьи подписки менялись после пересчета рекомендаций."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+',
+    )
+    marked_at = models.DateTimeField()
+
+
+class Tag(models.Model):
+    """Хэштег из текстов постов; recent_count считает посты за
+    последние TRENDING_TAGS_DAYS дней."""
+    name = models.CharField(max_length=64, unique=True)
+    posts_count = models.PositiveIntegerField(default=0)
+    recent_count = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['-recent_count', 'name'],
+                name='tag_trending_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'#{self.name}'
+
+
+class PostTag(models.Model):
+    """Хэштег поста; дата поста продублирована для ленты тега."""
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='post_tags',
+    )
+    tag = models.ForeignKey(
+        Tag,
+        on_delete=models.CASCADE,
+        related_name='post_tags',
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'tag'],
+                name='post_tag_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['tag', '-pub_date', '-post'],
+                name='post_tag_feed_idx',
+            ),
+        ]
+
+
+class TagDay(models.Model):
+    """Сколько постов за день получили хэштег; expired ставится, когда
+    день выпал из окна популярных тегов и вычтен из recent_count."""
+    tag = models.ForeignKey(
+        Tag,
+        on_delete=models.CASCADE,
+        related_name='days',
+    )
+    day = models.DateField()
+    posts_count = models.IntegerField(default=0)
+    expired = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['tag', 'day'],
+                name='tag_day_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['expired', 'day'],
+                name='tag_day_expiry_idx',
+            ),
+        ]
+
+
+class Completion(models.Model):
+    """Ключ автодополнения: нормализованное имя пользователя или
+    название группы."""
+    USER = 'user'
+    GROUP = 'group'
+    KINDS = (
+        (USER, 'Пользователь'),
+        (GROUP, 'Группа'),
+    )
+    kind = models.CharField(max_length=5, choices=KINDS)
+    key = models.CharField(max_length=255)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        related_name='+',
+    )
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        null=True,
+        related_name='+',
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['kind', 'key'],
+                name='completion_prefix_idx',
+            ),
+        ]
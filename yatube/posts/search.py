@@ -0,0 +1,135 @@
+import re
+
+from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+FTS_TABLE = 'posts_post_fts'
+SNIPPET_START = '\x02'
+SNIPPET_END = '\x03'
+SNIPPET_TOKENS = 24
+WORD = re.compile(r'\w+')
+
+# Индекс хранит только словарь: текст читается из posts_post по rowid.
+INSTALL = (
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        text,
+        content='posts_post',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert
+    AFTER INSERT ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete
+    AFTER DELETE ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update
+    AFTER UPDATE OF text ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END""",
+)
+UNINSTALL = (
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_insert',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_delete',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_update',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+)
+
+
+def supported(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def execute(using, statements):
+    with using.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def install(using=connection):
+    """Создать индекс и триггеры, если их нет: пересоздание таблицы
+    постов в миграциях SQLite удаляет триггеры"""
+    if supported(using):
+        execute(using, INSTALL)
+
+
+def uninstall(using=connection):
+    if supported(using):
+        execute(using, UNINSTALL)
+
+
+def rebuild(using=connection):
+    """Переиндексировать все посты"""
+    install(using)
+    if supported(using):
+        execute(using, [
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+        ])
+
+
+def match_expression(query):
+    """Запрос читателя как выражение FTS5: нужны все слова, последнее
+    может быть началом слова"""
+    words = WORD.findall(query.lower())
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def matching(queryset, query):
+    """Посты, подходящие под запрос, без ранжирования"""
+    expression = match_expression(query)
+    if expression is None:
+        return queryset.none()
+    if not supported():
+        return queryset.filter(text__icontains=query)
+    # Не pk__in=RawSQL(): лишние скобки SQLite читает как список из
+    # одного скалярного подзапроса.
+    return queryset.extra(
+        where=[
+            f'posts_post.id IN (SELECT rowid FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s)'
+        ],
+        params=[expression],
+    )
+
+
+def ranked(queryset, query):
+    """Посты по убыванию BM25 с фрагментом текста вокруг совпадений"""
+    expression = match_expression(query)
+    if expression is None:
+        return queryset.none()
+    if not supported():
+        return matching(queryset, query).extra(
+            select={'snippet': 'posts_post.text'}
+        ).order_by('-pub_date', '-id')
+    return queryset.extra(
+        select={
+            'rank': f'bm25({FTS_TABLE})',
+            'snippet': f"snippet({FTS_TABLE}, 0, %s, %s, '…', %s)",
+        },
+        select_params=(SNIPPET_START, SNIPPET_END, SNIPPET_TOKENS),
+        tables=[FTS_TABLE],
+        where=[
+            f'{FTS_TABLE}.rowid = posts_post.id',
+            f'{FTS_TABLE} MATCH %s',
+        ],
+        params=[expression],
+    ).order_by('rank', '-id')
+
+
+def highlight(snippet):
+    """Фрагмент с совпадениями в <mark>; остальной текст экранирован"""
+    return mark_safe(
+        escape(snippet)
+        .replace(SNIPPET_START, '<mark>')
+        .replace(SNIPPET_END, '</mark>')
+    )
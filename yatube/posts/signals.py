@@ -0,0 +1,351 @@
+from django.db import connections, transaction
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from core.page_cache import purge
+
+from . import (autocomplete, caching, counters, events, graph, search,
+               suggestions, tags, threads, timeline)
+from .follows import follows_changed
+from .models import (Comment, Follow, Group, Post, PostImageVariant, User,
+                     UserCounters)
+
+
+@receiver(post_save, sender=User)
+def create_counters(sender, instance, created, raw=False, **kwargs):
+    """У нового пользователя сразу есть строка счетчиков"""
+    if created and not raw:
+        UserCounters.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=User)
+def index_user_names(sender, instance, raw=False, update_fields=None,
+                     **kwargs):
+    """Имена для автодополнения; вход пользователя их не меняет"""
+    if not raw and update_fields != frozenset({'last_login'}):
+        autocomplete.index_user(instance)
+
+
+@receiver(post_save, sender=User)
+def bump_user_names(sender, instance, raw=False, update_fields=None,
+                    **kwargs):
+    if not raw and update_fields != frozenset({'last_login'}):
+        caching.bump_names_generation()
+
+
+@receiver(post_save, sender=Group)
+def index_group_names(sender, instance, raw=False, **kwargs):
+    if not raw:
+        autocomplete.index_group(instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_group(sender, instance, raw=False, **kwargs):
+    """Запомнить прежние группу, автора, картинку и текст поста: от них
+    зависят счетчики, ленты, кэш страниц, варианты картинки и хэштеги"""
+    instance._previous_group_id = instance._previous_group_slug = None
+    instance._previous_author_id = instance._previous_author_name = None
+    instance._previous_image = instance._previous_text = None
+    if instance.pk is not None and not raw:
+        previous = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list(
+                'group_id', 'group__slug', 'author_id', 'author__username',
+                'image', 'text',
+            )
+            .first()
+        )
+        if previous is not None:
+            (instance._previous_group_id,
+             instance._previous_group_slug,
+             instance._previous_author_id,
+             instance._previous_author_name,
+             instance._previous_image,
+             instance._previous_text) = previous
+
+
+def _author_changed(post):
+    return post._previous_author_id not in (None, post.author_id)
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, raw=False, **kwargs):
+    """Счетчики постов автора и группы"""
+    if raw:
+        return
+    if created:
+        counters.change_user(instance.author_id, 'posts_count', 1)
+        counters.change_group(instance.group_id, 'posts_count', 1)
+        return
+    if instance._previous_group_id != instance.group_id:
+        counters.change_group(instance._previous_group_id, 'posts_count', -1)
+        counters.change_group(instance.group_id, 'posts_count', 1)
+    if _author_changed(instance):
+        # Автора меняют в админке.
+        counters.change_user(
+            instance._previous_author_id, 'posts_count', -1
+        )
+        counters.change_user(instance.author_id, 'posts_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, 'posts_count', -1)
+    counters.change_group(instance.group_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    """Новый пост попадает в ленты подписчиков, пост со сменившимся
+    автором переезжает в ленты подписчиков нового"""
+    if raw:
+        return
+    if created:
+        timeline.fan_out(instance)
+    elif _author_changed(instance):
+        timeline.refan(instance)
+
+
+@receiver(post_save, sender=Post)
+def announce_post(sender, instance, created, raw=False, **kwargs):
+    """Открытые ленты подписчиков узнают о посте после фиксации"""
+    if created and not raw:
+        event = events.post_event(instance)
+        transaction.on_commit(lambda: events.publish(event))
+
+
+@receiver(post_save, sender=Post)
+def sync_tags(sender, instance, created, raw=False, **kwargs):
+    """Хэштеги разбираются заново, только если менялся текст"""
+    if not raw and (created or instance._previous_text != instance.text):
+        tags.sync(instance)
+
+
+@receiver(pre_delete, sender=Post)
+def detach_tags(sender, instance, **kwargs):
+    """Строки хэштегов удалятся каскадом раньше post_delete"""
+    tags.detach(instance)
+
+
+@receiver(post_save, sender=Post)
+def drop_variants(sender, instance, raw=False, **kwargs):
+    """Картинку убрали из поста: ее варианты больше не нужны"""
+    if instance._previous_image and not instance.image and not raw:
+        for variant in instance.variants.all():
+            variant.delete()
+
+
+@receiver(post_delete, sender=PostImageVariant)
+def delete_variant_file(sender, instance, **kwargs):
+    instance.file.delete(save=False)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_post(instance.post_id, 'comments_count', 1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    counters.change_post(instance.post_id, 'comments_count', -1)
+
+
+@receiver(pre_save, sender=Comment)
+def place_comment(sender, instance, raw=False, **kwargs):
+    """Новый комментарий встает в свою ветку"""
+    if instance._state.adding and not raw:
+        threads.place(instance)
+
+
+@receiver(post_save, sender=Comment)
+def attach_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        threads.attach(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def detach_comment(sender, instance, **kwargs):
+    threads.detach(instance)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, raw=False, **kwargs):
+    """Счетчики подписчиков автора и подписок читателя"""
+    if created and not raw:
+        counters.change_user(instance.author_id, 'followers_count', 1)
+        counters.change_user(instance.user_id, 'following_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, 'followers_count', -1)
+    counters.change_user(instance.user_id, 'following_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def add_follow_edge(sender, instance, created, raw=False, **kwargs):
+    """Граф подписок в памяти меняется только после фиксации"""
+    if created and not raw:
+        user_id, author_id = instance.user_id, instance.author_id
+        transaction.on_commit(
+            lambda: graph.apply(user_id, author_id, followed=True)
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def remove_follow_edge(sender, instance, **kwargs):
+    user_id, author_id = instance.user_id, instance.author_id
+    transaction.on_commit(
+        lambda: graph.apply(user_id, author_id, followed=False)
+    )
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def mark_suggestions_stale(sender, instance, raw=False, **kwargs):
+    """Рекомендации читателя пересчитаются при следующем запуске"""
+    if not raw:
+        suggestions.mark_stale(instance.user_id)
+
+
+@receiver(post_delete, sender=User)
+def forget_deleted_user(sender, instance, **kwargs):
+    """Та же транзакция, до проверки внешних ключей при фиксации"""
+    suggestions.forget(instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    """Подписка добавляет в ленту посты автора"""
+    if created and not raw:
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def trim_timeline(sender, instance, **kwargs):
+    """Отписка убирает из ленты посты автора"""
+    timeline.trim(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_feeds(sender, raw=False, **kwargs):
+    """Новое поколение лент: старые фрагменты больше не читаются"""
+    if not raw:
+        caching.bump_feed_generation()
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_feed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        caching.bump_follow_generation(instance.user_id)
+
+
+def _post_page_tags(post):
+    tags = [
+        caching.post_tag(post.pk),
+        caching.author_tag(post.author.username),
+    ]
+    if post.group_id is not None:
+        tags.append(caching.group_tag(post.group.slug))
+    return tags
+
+
+@receiver(post_save, sender=Post)
+def purge_post_pages(sender, instance, created, raw=False, **kwargs):
+    """Сбросить закэшированные страницы, где виден пост"""
+    if raw:
+        return
+    tags = _post_page_tags(instance)
+    if created:
+        tags.append(caching.INDEX_TAG)
+    if instance._previous_group_id not in (None, instance.group_id):
+        tags.append(caching.group_tag(instance._previous_group_slug))
+    if _author_changed(instance):
+        tags.append(caching.author_tag(instance._previous_author_name))
+    purge(*tags)
+
+
+@receiver(post_delete, sender=Post)
+def purge_deleted_post_pages(sender, instance, **kwargs):
+    purge(caching.INDEX_TAG, *_post_page_tags(instance))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def purge_comment_pages(sender, instance, raw=False, **kwargs):
+    if not raw:
+        caching.bump_comments_generation(instance.post_id)
+        purge(caching.post_tag(instance.post_id))
+
+
+@receiver(pre_save, sender=Group)
+def remember_slug(sender, instance, raw=False, **kwargs):
+    instance._previous_slug = None
+    if instance.pk is not None and not raw:
+        instance._previous_slug = (
+            Group.objects.filter(pk=instance.pk)
+            .values_list('slug', flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def purge_group_pages(sender, instance, raw=False, **kwargs):
+    """Сбросить страницы группы, в том числе под прежним адресом"""
+    if raw:
+        return
+    tags = {caching.group_tag(instance.slug)}
+    if getattr(instance, '_previous_slug', None):
+        tags.add(caching.group_tag(instance._previous_slug))
+    purge(*tags)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def purge_profile_pages(sender, instance, raw=False, **kwargs):
+    """Счетчики подписок видны в профилях обоих участников"""
+    if not raw:
+        purge(
+            caching.author_tag(instance.author.username),
+            caching.author_tag(instance.user.username),
+        )
+
+
+@receiver(follows_changed, sender=Follow)
+def apply_follows(sender, user, authors, followed, **kwargs):
+    """Пачка подписок или отписок читателя: те же счетчики, граф, лента,
+    рекомендации и кэши, что и у одной подписки"""
+    author_ids = [author.pk for author in authors]
+    delta = 1 if followed else -1
+    counters.change_users(author_ids, 'followers_count', delta)
+    counters.change_user(user.pk, 'following_count', delta * len(authors))
+    transaction.on_commit(
+        lambda: graph.apply(user.pk, *author_ids, followed=followed)
+    )
+    if followed:
+        timeline.backfill(user.pk, *author_ids)
+    else:
+        timeline.trim(user.pk, *author_ids)
+    suggestions.mark_stale(user.pk)
+    caching.bump_follow_generation(user.pk)
+    purge(
+        caching.author_tag(user.username),
+        *(caching.author_tag(author.username) for author in authors),
+    )
+
+
+def install_fts(sender, using, **kwargs):
+    """Вернуть триггеры полнотекстовых индексов, если миграция
+    пересоздала их таблицы"""
+    connection = connections[using]
+    tables = connection.introspection.table_names()
+    for index in (search, autocomplete):
+        if index.FTS_TABLE in tables:
+            index.install(connection)
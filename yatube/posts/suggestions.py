@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import StaleSuggestions, Suggestion
+
+
+def mark_stale(user_id):
+    """Подписки пользователя изменились: пересчитать его рекомендации"""
+    now = timezone.now()
+    marked = StaleSuggestions.objects.filter(user_id=user_id).update(
+        marked_at=now
+    )
+    if not marked:
+        StaleSuggestions.objects.bulk_create(
+            [StaleSuggestions(user_id=user_id, marked_at=now)],
+            ignore_conflicts=True,
+        )
+
+
+def forget(user_id):
+    """Снять отметку удаленного пользователя: каскад удаляет его
+    подписки уже после отметок, и обработчики подписок ставят новую"""
+    StaleSuggestions.objects.filter(user_id=user_id).delete()
+
+
+def stale_users():
+    return list(StaleSuggestions.objects.values_list('user_id', flat=True))
+
+
+@transaction.atomic
+def store(suggested, started):
+    """Заменить рекомендации пользователей и снять с них отметку,
+    если подписки не менялись с начала пересчета.
+
+    suggested: {user_id: [(author_id, score), ...]}
+    """
+    user_ids = list(suggested)
+    Suggestion.objects.filter(user_id__in=user_ids).delete()
+    Suggestion.objects.bulk_create(
+        [
+            Suggestion(user_id=user_id, author_id=author_id, score=score)
+            for user_id, rows in suggested.items()
+            for author_id, score in rows
+        ],
+        batch_size=500,
+    )
+    StaleSuggestions.objects.filter(
+        user_id__in=user_ids, marked_at__lte=started
+    ).delete()
+
+
+def for_user(user):
+    """Рекомендации для страницы: один запрос по индексу без авторов,
+    на которых пользователь подписался после пересчета"""
+    if not user.is_authenticated:
+        return []
+    return list(
+        Suggestion.objects.filter(user=user)
+        .exclude(author__following__user=user)
+        .select_related('author')
+        .order_by('-score')[:settings.SUGGESTIONS_SHOWN]
+    )
@@ -0,0 +1,152 @@
+import re
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.page_cache import purge
+
+from .caching import hashtag_tag
+from .models import PostTag, Tag, TagDay
+
+# Длиннее 64 символов тег не помещается в Tag.name: такой не считается
+# тегом вовсе, а не обрезается до другого.
+HASHTAG = re.compile(r'(?<![\w#])#(\w{1,64})(?!\w)')
+TAG_ORDERING = ('-pub_date', '-post_id')
+EXPIRED_KEY = 'tags:expired:{}'
+
+
+def extract(text):
+    """Имена хэштегов текста в нижнем регистре"""
+    return {name.lower() for name in HASHTAG.findall(text)}
+
+
+def window_start():
+    """Последний день, который уже не входит в окно популярных тегов"""
+    return timezone.localdate() - timedelta(days=settings.TRENDING_TAGS_DAYS)
+
+
+def _count(tag_ids, day, delta):
+    """Сдвинуть счетчики тегов и их строки за день"""
+    recent = day > window_start()
+    changes = {'posts_count': F('posts_count') + delta}
+    if recent:
+        changes['recent_count'] = F('recent_count') + delta
+    Tag.objects.filter(pk__in=tag_ids).update(**changes)
+    TagDay.objects.bulk_create(
+        [
+            TagDay(tag_id=tag_id, day=day, expired=not recent)
+            for tag_id in tag_ids
+        ],
+        ignore_conflicts=True,
+    )
+    TagDay.objects.filter(tag_id__in=tag_ids, day=day).update(
+        posts_count=F('posts_count') + delta
+    )
+
+
+def _day(post):
+    return timezone.localdate(post.pub_date)
+
+
+def sync(post):
+    """Привести хэштеги поста к его тексту"""
+    names = extract(post.text)
+    current = dict(
+        PostTag.objects.filter(post=post).values_list('tag__name', 'tag_id')
+    )
+    removed = [current[name] for name in current.keys() - names]
+    added = names - current.keys()
+    if removed:
+        PostTag.objects.filter(post=post, tag_id__in=removed).delete()
+        _count(removed, _day(post), -1)
+    if added:
+        Tag.objects.bulk_create(
+            [Tag(name=name) for name in added], ignore_conflicts=True
+        )
+        tag_ids = list(
+            Tag.objects.filter(name__in=added).values_list('pk', flat=True)
+        )
+        PostTag.objects.bulk_create([
+            PostTag(post=post, tag_id=tag_id, pub_date=post.pub_date)
+            for tag_id in tag_ids
+        ])
+        _count(tag_ids, _day(post), 1)
+    changed = (current.keys() - names) | added
+    if changed:
+        purge(*(hashtag_tag(name) for name in changed))
+
+
+def attach(posts):
+    """Хэштеги пачки новых постов по строкам (id, pub_date, text);
+    вернуть имена затронутых тегов"""
+    rows = [(pk, pub_date, extract(text)) for pk, pub_date, text in posts]
+    names = set().union(*(names for _, _, names in rows))
+    if not names:
+        return names
+    Tag.objects.bulk_create(
+        [Tag(name=name) for name in names], ignore_conflicts=True
+    )
+    tag_ids = dict(
+        Tag.objects.filter(name__in=names).values_list('name', 'pk')
+    )
+    PostTag.objects.bulk_create([
+        PostTag(post_id=pk, tag_id=tag_ids[name], pub_date=pub_date)
+        for pk, pub_date, names in rows
+        for name in names
+    ])
+    days = Counter(
+        (tag_ids[name], timezone.localdate(pub_date))
+        for _, pub_date, names in rows
+        for name in names
+    )
+    # Одним обновлением сдвигаются теги с одинаковым днем и приростом.
+    changes = defaultdict(list)
+    for (tag_id, day), count in days.items():
+        changes[day, count].append(tag_id)
+    for (day, count), ids in changes.items():
+        _count(ids, day, count)
+    return names
+
+
+def detach(post):
+    """Пост удаляется: снять его со счетчиков тегов"""
+    tags = list(
+        PostTag.objects.filter(post=post).values_list('tag_id', 'tag__name')
+    )
+    if tags:
+        _count([tag_id for tag_id, _ in tags], _day(post), -1)
+        purge(*(hashtag_tag(name) for _, name in tags))
+
+
+@transaction.atomic
+def expire():
+    """Вычесть из recent_count дни, выпавшие из окна"""
+    days = list(
+        TagDay.objects.filter(expired=False, day__lte=window_start())
+        .values_list('pk', 'tag_id', 'posts_count')
+    )
+    for _, tag_id, count in days:
+        Tag.objects.filter(pk=tag_id).update(
+            recent_count=F('recent_count') - count
+        )
+    TagDay.objects.filter(pk__in=[pk for pk, _, _ in days]).update(
+        expired=True
+    )
+    return len(days)
+
+
+def trending():
+    """Популярные теги: начало индекса по recent_count; выпавшие из
+    окна дни вычитаются раз в сутки первым же запросом"""
+    if cache.add(EXPIRED_KEY.format(window_start()), True, 2 * 24 * 60 * 60):
+        expire()
+    return list(
+        Tag.objects.filter(recent_count__gt=0)
+        .order_by('-recent_count', 'name')
+        .values_list('name', flat=True)[:settings.TRENDING_TAGS]
+    )
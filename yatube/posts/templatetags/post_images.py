@@ -0,0 +1,12 @@
+from django import template
+
+from posts.thumbnails import prefetch_thumbnails as prefetch
+
+register = template.Library()
+
+
+@register.simple_tag
+def prefetch_thumbnails(posts):
+    """Подготовить миниатюры всех постов страницы до вывода карточек"""
+    prefetch(posts)
+    return ''
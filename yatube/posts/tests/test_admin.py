@@ -0,0 +1,122 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+class AdminChangelistTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Временные файлы необходимые для тестов."""
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        cls.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(3)
+        ]
+        cls.group = Group.objects.create(
+            title='Читатели Толстого',
+            slug='tolstoy',
+            description='Тестовое описание',
+        )
+        Group.objects.create(
+            title='Другая группа',
+            slug='other',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        """Авторизация администратора."""
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def create(self, number):
+        for index in range(number):
+            author = self.authors[index % len(self.authors)]
+            post = Post.objects.create(
+                author=author, group=self.group, text=f'Пост {index}'
+            )
+            Comment.objects.create(post=post, author=author, text='Ком')
+
+    def queries(self, name, **params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                reverse(f'admin:posts_{name}_changelist'), params
+            )
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        """Связанные объекты выбираются одним запросом, число строк не
+        влияет на число запросов."""
+        Follow.objects.create(user=self.authors[0], author=self.authors[1])
+        self.create(2)
+        few = {name: self.queries(name) for name in ('post', 'comment')}
+        few['follow'] = self.queries('follow')
+        Follow.objects.create(user=self.authors[0], author=self.authors[2])
+        Follow.objects.create(user=self.authors[1], author=self.authors[2])
+        self.create(12)
+        cache.clear()
+        for name, count in few.items():
+            with self.subTest(name=name):
+                self.assertEqual(self.queries(name), count)
+
+    def test_count_is_cached_and_pages_keep_order(self):
+        """Число строк запоминается, страница выбирается по ключам в
+        порядке списка."""
+        self.create(3)
+        first = self.queries('post')
+        self.assertEqual(self.queries('post'), first - 1)
+        response = self.client.get(reverse('admin:posts_post_changelist'))
+        self.assertEqual(
+            list(response.context['cl'].result_list),
+            list(Post.objects.order_by('-pub_date', '-pk')),
+        )
+        self.assertContains(
+            response,
+            f'<option value="{self.group.pk}" selected>Читатели Толстого',
+            count=3,
+        )
+
+    def test_foreign_keys_are_not_rendered_as_select(self):
+        """Пользователи и посты вводятся по id, группа через
+        автодополнение, списки объектов в форму не попадают."""
+        post = Post.objects.create(author=self.authors[0], text='Пост')
+        response = self.client.get(
+            reverse('admin:posts_post_change', args=[post.pk])
+        )
+        self.assertContains(response, 'vForeignKeyRawIdAdminField')
+        self.assertContains(response, 'admin-autocomplete')
+        self.assertNotContains(response, 'Другая группа')
+        comment = Comment.objects.create(
+            post=post, author=self.authors[1], text='Ком'
+        )
+        response = self.client.get(
+            reverse('admin:posts_comment_change', args=[comment.pk])
+        )
+        self.assertNotContains(response, f'>{self.authors[2].username}<')
+
+    def test_group_search_uses_completion_keys(self):
+        """Поиск групп в админке идет по ключам автодополнения: по
+        началу и по части названия."""
+        for query in ('ЧИТА', 'толст', 'tolstoy'):
+            with self.subTest(query=query):
+                response = self.client.get(
+                    reverse('admin:posts_group_changelist'), {'q': query}
+                )
+                self.assertEqual(
+                    list(response.context['cl'].result_list), [self.group]
+                )
+        response = self.client.get(
+            reverse('admin:posts_group_autocomplete'), {'term': 'толст'}
+        )
+        self.assertEqual(
+            [result['text'] for result in response.json()['results']],
+            ['Читатели Толстого'],
+        )
@@ -0,0 +1,82 @@
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Completion, Group, User
+
+
+class AutocompleteTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Временные файлы необходимые для тестов."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='leo', first_name='Лев', last_name='Толстой'
+        )
+        cls.groups = [
+            Group.objects.create(
+                title=f'Клуб номер {number}',
+                slug=f'club-{number}',
+                description='Тестовое описание',
+            )
+            for number in range(30)
+        ]
+        cls.tolstoy = Group.objects.create(
+            title='Читатели Толстого',
+            slug='tolstoy',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        """Авторизация пользователя."""
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def complete(self, kind, query):
+        response = self.client.get(
+            reverse('posts:autocomplete', args=[kind]), {'q': query}
+        )
+        return [result['label'] for result in response.json()['results']]
+
+    def test_prefix_then_trigram_matches(self):
+        """Сначала совпадения по началу ключа, затем по его части;
+        регистр и ё не важны."""
+        for query in ('ЧИТА', 'толст'):
+            with self.subTest(query=query):
+                self.assertEqual(
+                    self.complete('groups', query), ['Читатели Толстого']
+                )
+        self.assertEqual(self.complete('users', 'лёв'), ['Лев Толстой'])
+        self.assertEqual(self.complete('users', 'олсто'), ['Лев Толстой'])
+        self.assertEqual(len(self.complete('groups', 'клуб')), 10)
+        self.assertEqual(self.complete('groups', ''), [])
+
+    def test_keys_follow_renames_and_deletes(self):
+        """Ключи пересчитываются при переименовании и удаляются вместе
+        с объектом."""
+        self.tolstoy.title = 'Поклонники графа'
+        self.tolstoy.save()
+        self.assertEqual(self.complete('groups', 'читат'), [])
+        self.assertEqual(self.complete('groups', 'покл'), ['Поклонники графа'])
+        self.tolstoy.delete()
+        self.assertFalse(Completion.objects.filter(key='tolstoy'))
+        self.assertEqual(
+            self.client.get(
+                reverse('posts:autocomplete', args=['posts'])
+            ).status_code,
+            404,
+        )
+
+    def test_login_does_not_reindex(self):
+        """Обновление last_login не трогает ключи пользователя."""
+        with self.assertNumQueries(1):
+            self.user.save(update_fields=['last_login'])
+
+    def test_post_form_renders_only_selected_group(self):
+        """Форма поста не выводит весь список групп."""
+        response = self.client.get(reverse('posts:post_create'))
+        self.assertNotContains(response, 'Клуб номер')
+        self.assertContains(response, 'data-autocomplete="/autocomplete/')
+        post = self.user.posts.create(text='Пост', group=self.groups[3])
+        response = self.client.get(reverse('posts:post_edit', args=[post.pk]))
+        self.assertContains(response, 'Клуб номер 3', count=1)
+        self.assertNotContains(response, 'Клуб номер 4')
@@ -0,0 +1,210 @@
+from http import HTTPStatus
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..counters import reconcile
+from ..models import Comment, Post, User
+from ..threads import MAX_DEPTH, REPLIES_SHOWN, subtree
+from ..utils import COMMENTS_PAGE_NUM
+
+COMMENTS_TOTAL = COMMENTS_PAGE_NUM + 5
+
+
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Временные файлы необходимые для тестов."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+        cls.quiet_post = Post.objects.create(author=cls.user, text='Тихий')
+        authors = [
+            User.objects.create_user(username=f'reader{index}')
+            for index in range(COMMENTS_TOTAL)
+        ]
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.post, author=author, text=f'Комментарий {index}'
+            )
+            for index, author in enumerate(authors)
+        ]
+        Comment.objects.create(post=cls.quiet_post, author=cls.user, text='К')
+
+    def setUp(self):
+        """Пользователь для тестирования."""
+        cache.clear()
+        self.guest_client = Client()
+
+    def detail(self, post, **params):
+        return self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.id}), params
+        )
+
+    def more(self, post, **params):
+        return self.guest_client.get(
+            reverse('posts:comment_list', kwargs={'post_id': post.id}), params
+        ).json()
+
+    def test_post_detail_shows_first_page(self):
+        """Страница поста выводит одну порцию комментариев."""
+        comments = self.detail(self.post).context['comments']
+        self.assertEqual(len(comments), COMMENTS_PAGE_NUM)
+        self.assertEqual(comments[0], self.comments[0])
+        self.assertTrue(comments.has_next())
+        newest = self.detail(self.post, order='new').context['comments']
+        self.assertEqual(newest[0], self.comments[-1])
+
+    def test_authors_are_not_queried_per_comment(self):
+        """Число запросов не зависит от числа комментариев."""
+        with CaptureQueriesContext(connection) as busy:
+            self.detail(self.post)
+        cache.clear()
+        with CaptureQueriesContext(connection) as quiet:
+            self.detail(self.quiet_post)
+        self.assertEqual(len(busy), len(quiet))
+
+    def test_load_more_streams_all_comments(self):
+        """Подгрузка по курсору отдает все комментарии без повторов."""
+        for order, expected in (
+            ('old', self.comments),
+            ('new', self.comments[::-1]),
+        ):
+            with self.subTest(order=order):
+                page = self.detail(self.post, order=order).context['comments']
+                seen = [comment.id for comment in page]
+                cursor = page.next_cursor
+                while cursor:
+                    data = self.more(self.post, order=order, cursor=cursor)
+                    seen += [comment['id'] for comment in data['comments']]
+                    cursor = data['next']
+                self.assertEqual(seen, [comment.id for comment in expected])
+
+    def test_load_more_payload(self):
+        """Порция комментариев содержит автора и ссылку на профиль."""
+        comment = self.more(self.quiet_post)['comments'][0]
+        self.assertEqual(comment['author'], self.user.username)
+        self.assertEqual(
+            comment['author_url'],
+            reverse('posts:profile', args=[self.user.username]),
+        )
+        self.assertEqual(comment['text'], 'К')
+
+    def test_load_more_unknown_post(self):
+        """Для несуществующего поста подгрузка отвечает 404."""
+        response = self.guest_client.get(
+            reverse('posts:comment_list', kwargs={'post_id': 0})
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class ThreadedCommentsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Временные файлы необходимые для тестов."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        """Авторизация пользователя."""
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def comment(self, text, parent=None):
+        comment = Comment.objects.create(
+            post=self.post, author=self.user, text=text, parent=parent
+        )
+        comment.refresh_from_db()
+        return comment
+
+    def test_replies_get_path_depth_and_counters(self):
+        """Ответ наследует путь и ветку, счетчики ответов растут."""
+        root = self.comment('Корень')
+        reply = self.comment('Ответ', root)
+        nested = self.comment('Ответ на ответ', reply)
+        self.assertTrue(nested.path.startswith(reply.path))
+        self.assertTrue(reply.path.startswith(root.path))
+        self.assertEqual(
+            [root.depth, reply.depth, nested.depth], [0, 1, 2]
+        )
+        self.assertEqual({root.thread_id, reply.thread_id}, {root.id})
+        root.refresh_from_db()
+        reply.refresh_from_db()
+        self.assertEqual(root.replies_count, 1)
+        self.assertEqual(reply.replies_count, 1)
+        self.assertEqual(root.thread_replies_count, 2)
+
+    def test_depth_is_limited(self):
+        """Слишком глубокий ответ становится соседом родителя."""
+        parent = self.comment('Корень')
+        for level in range(MAX_DEPTH + 2):
+            parent = self.comment(f'Уровень {level}', parent)
+        self.assertEqual(parent.depth, MAX_DEPTH - 1)
+
+    def test_subtree_is_ordered_depth_first(self):
+        """Поддерево читается одним запросом в порядке обхода."""
+        root = self.comment('Корень')
+        first = self.comment('Первый', root)
+        second = self.comment('Второй', root)
+        late = self.comment('Поздний ответ первому', first)
+        self.comment('Другая ветка')
+        with self.assertNumQueries(1):
+            ids = [comment.id for comment in subtree(root)]
+        self.assertEqual(ids, [root.id, first.id, late.id, second.id])
+
+    def test_page_shows_first_replies_of_each_thread(self):
+        """Страница поста выводит первые ответы веток и число скрытых."""
+        root = self.comment('Корень')
+        replies = [
+            self.comment(f'Ответ {index}', root)
+            for index in range(REPLIES_SHOWN + 2)
+        ]
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        )
+        (thread,) = response.context['comments']
+        self.assertEqual(thread.shown_replies, replies[:REPLIES_SHOWN])
+        self.assertEqual(thread.hidden_replies, 2)
+        data = self.authorized_client.get(
+            reverse('posts:comment_thread', args=[self.post.id, root.id])
+        ).json()
+        self.assertEqual(len(data['comments']), len(replies) + 1)
+
+    def test_reply_through_form(self):
+        """Форма комментария принимает родителя из того же поста."""
+        root = self.comment('Корень')
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            data={'text': 'Ответ', 'parent': root.id},
+        )
+        reply = Comment.objects.get(text='Ответ')
+        self.assertEqual(reply.parent, root)
+        self.assertEqual(reply.depth, 1)
+
+    def test_delete_and_reconcile_reply_counters(self):
+        """Удаление ответа уменьшает счетчики, сверка их не меняет."""
+        root = self.comment('Корень')
+        reply = self.comment('Ответ', root)
+        self.comment('Ответ на ответ', reply)
+        reply.delete()
+        root.refresh_from_db()
+        self.assertEqual(root.replies_count, 0)
+        self.assertEqual(root.thread_replies_count, 0)
+        self.assertEqual(reconcile()['comments'], 0)
+
+    def test_delete_with_drifted_counters(self):
+        """Разошедшиеся до нуля счетчики не мешают удалить ответ."""
+        root = self.comment('Корень')
+        reply = self.comment('Ответ', root)
+        Comment.objects.filter(pk=root.pk).update(
+            replies_count=0, thread_replies_count=0
+        )
+        reply.delete()
+        root.refresh_from_db()
+        self.assertEqual(root.replies_count, 0)
+        self.assertEqual(root.thread_replies_count, 0)
@@ -0,0 +1,142 @@
+from http import HTTPStatus
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Group, Post, User
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Временные файлы необходимые для тестов."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост',
+            group=cls.group,
+        )
+
+    def setUp(self):
+        """Пользователи для тестирования."""
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def urls(self):
+        return (
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+        )
+
+    def test_unchanged_pages_return_not_modified(self):
+        """Неизменная страница отдает 304 без рендера шаблона."""
+        for url in self.urls():
+            with self.subTest(url=url):
+                etag = self.authorized_client.get(url)['ETag']
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+                self.assertEqual(response.templates, [])
+
+    def test_edit_changes_validator(self):
+        """Правка поста меняет ETag всех его страниц."""
+        etags = [
+            self.authorized_client.get(url)['ETag'] for url in self.urls()
+        ]
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+        for url, etag in zip(self.urls(), etags):
+            with self.subTest(url=url):
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_comment_changes_post_validator(self):
+        """Новый комментарий меняет ETag страницы поста."""
+        url = self.urls()[0]
+        etag = self.authorized_client.get(url)['ETag']
+        Comment.objects.create(post=self.post, author=self.user, text='Ком')
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_comment_edit_and_names_change_post_validator(self):
+        """Правка комментария и новое имя комментатора меняют ETag
+        страницы поста."""
+        url = self.urls()[0]
+        reader = User.objects.create_user(username='reader')
+        comment = Comment.objects.create(
+            post=self.post, author=reader, text='Ком'
+        )
+        for change in ('comment', 'name'):
+            with self.subTest(change=change):
+                etag = self.authorized_client.get(url)['ETag']
+                if change == 'comment':
+                    comment.text = 'Исправленный ком'
+                    comment.save()
+                else:
+                    reader.first_name = 'Лев'
+                    reader.save()
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_author_rename_changes_validators(self):
+        """Новое имя автора меняет ETag всех страниц с его постами."""
+        etags = [
+            self.authorized_client.get(url)['ETag'] for url in self.urls()
+        ]
+        author = User.objects.get(pk=self.user.pk)
+        author.first_name = 'Лев'
+        author.save()
+        for url, etag in zip(self.urls(), etags):
+            with self.subTest(url=url):
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_new_login_changes_post_validator(self):
+        """После нового входа страница поста приходит заново со свежим
+        CSRF-токеном."""
+        User.objects.create_user(username='reader', password='password')
+        client = Client()
+        credentials = {'username': 'reader', 'password': 'password'}
+        client.post(reverse('users:login'), credentials)
+        url = self.urls()[0]
+        etag = client.get(url)['ETag']
+        self.assertEqual(
+            client.get(url, HTTP_IF_NONE_MATCH=etag).status_code,
+            HTTPStatus.NOT_MODIFIED,
+        )
+        client.post(reverse('users:login'), credentials)
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_validator_depends_on_viewer(self):
+        """Гость и автор получают разные ETag одной страницы."""
+        url = self.urls()[1]
+        self.assertNotEqual(
+            self.guest_client.get(url)['ETag'],
+            self.authorized_client.get(url)['ETag'],
+        )
+
+    def test_cached_anonymous_page_answers_not_modified(self):
+        """Кэш анонимных страниц тоже отвечает 304."""
+        url = self.urls()[0]
+        etag = self.guest_client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
@@ -0,0 +1,116 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import (Comment, Follow, Group, Post, TimelineEntry, User,
+                      UserCounters)
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Временные файлы необходимые для тестов."""
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.group_2 = Group.objects.create(
+            title='Тестовая группа 2',
+            slug='test-slug-2',
+            description='Тестовое описание 2',
+        )
+
+    def counters(self, user):
+        return UserCounters.objects.get(user=user)
+
+    def test_post_counters_follow_writes(self):
+        """Создание, перенос и удаление поста меняют счетчики."""
+        post = Post.objects.create(
+            author=self.author, text='Тестовый пост', group=self.group
+        )
+        self.assertEqual(self.counters(self.author).posts_count, 1)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        post.group = self.group_2
+        post.save()
+        self.group.refresh_from_db()
+        self.group_2.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.group_2.posts_count, 1)
+        post.delete()
+        self.group_2.refresh_from_db()
+        self.assertEqual(self.counters(self.author).posts_count, 0)
+        self.assertEqual(self.group_2.posts_count, 0)
+
+    def test_author_change_moves_post(self):
+        """Смена автора в админке переносит счетчик, ленты и сбрасывает
+        кэш страниц обоих авторов."""
+        cache.clear()
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Тестовый пост')
+        profile = reverse('posts:profile', args=[self.author.username])
+        self.client.get(profile)
+        self.assertIsNone(self.client.get(profile).context)
+        post.author = self.reader
+        post.save()
+        self.assertIsNotNone(self.client.get(profile).context)
+        self.assertEqual(self.counters(self.author).posts_count, 0)
+        self.assertEqual(self.counters(self.reader).posts_count, 1)
+        self.assertFalse(TimelineEntry.objects.filter(post=post))
+        Follow.objects.create(user=self.author, author=self.reader)
+        post.author = self.author
+        post.save()
+        self.assertEqual(
+            list(TimelineEntry.objects.filter(post=post).values_list(
+                'user', 'author'
+            )),
+            [(self.reader.pk, self.author.pk)],
+        )
+
+    def test_comment_and_follow_counters(self):
+        """Комментарии и подписки ведут свои счетчики."""
+        post = Post.objects.create(author=self.author, text='Тестовый пост')
+        Comment.objects.create(post=post, author=self.reader, text='Ком')
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.counters(self.author).followers_count, 1)
+        self.assertEqual(self.counters(self.reader).following_count, 1)
+        Follow.objects.all().delete()
+        self.assertEqual(self.counters(self.author).followers_count, 0)
+        self.assertEqual(self.counters(self.reader).following_count, 0)
+
+    def test_reconcile_counters_repairs_drift(self):
+        """Команда сверки исправляет разошедшиеся счетчики."""
+        Post.objects.bulk_create([
+            Post(author=self.author, text='Без сигналов', group=self.group)
+        ])
+        UserCounters.objects.filter(user=self.reader).delete()
+        call_command('reconcile_counters', stdout=StringIO())
+        self.group.refresh_from_db()
+        self.assertEqual(self.counters(self.author).posts_count, 1)
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(self.counters(self.reader).posts_count, 0)
+
+    def test_decrement_stops_at_zero(self):
+        """Удаление поста, не попавшего в счетчики, не уводит их ниже
+        нуля."""
+        Post.objects.bulk_create([
+            Post(author=self.author, text='Без сигналов', group=self.group)
+        ])
+        post = Post.objects.get(text='Без сигналов')
+        Comment.objects.bulk_create([
+            Comment(post=post, author=self.reader, text='Без сигналов')
+        ])
+        Comment.objects.get(text='Без сигналов').delete()
+        post.delete()
+        self.group.refresh_from_db()
+        self.assertEqual(self.counters(self.author).posts_count, 0)
+        self.assertEqual(self.group.posts_count, 0)
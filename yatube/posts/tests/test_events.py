@@ -0,0 +1,203 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+
+from .. import events, graph
+from ..models import Follow, Post, User
+
+
+class BrokerTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Временные файлы необходимые для тестов."""
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.stranger = User.objects.create_user(username='stranger')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        """Граф подписок заново из базы."""
+        cache.clear()
+        graph.reset()
+        self.broker = events.Broker()
+
+    def test_only_followers_receive_events(self):
+        """Событие автора получают только соединения его подписчиков."""
+        reader = self.broker.listen(self.reader.pk)
+        stranger = self.broker.listen(self.stranger.pk)
+        self.broker.dispatch({'author_id': self.author.pk, 'post': 1})
+        self.assertEqual(
+            reader.wait(0), [{'author_id': self.author.pk, 'post': 1}]
+        )
+        self.assertEqual(stranger.wait(0), [])
+        self.broker.close(reader)
+        self.broker.close(stranger)
+        self.assertEqual((self.broker.count, self.broker.listeners), (0, {}))
+
+    @override_settings(EVENTS_MAX_LISTENERS=1)
+    def test_listeners_are_limited(self):
+        """Сверх лимита соединение не открывается, поток отвечает 503."""
+        client = Client()
+        client.force_login(self.reader)
+        listener = events.broker.listen(self.stranger.pk)
+        self.addCleanup(events.broker.close, listener)
+        self.assertIsNotNone(self.broker.listen(self.reader.pk))
+        self.assertIsNone(events.broker.listen(self.reader.pk))
+        response = client.get(reverse('posts:follow_events'))
+        self.assertEqual(response.status_code, 503)
+
+    def spool(self):
+        directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        graph.get_graph()
+        return os.path.join(directory, 'events.spool')
+
+    def received(self, listener, count):
+        events = []
+        for _ in range(50):
+            events += listener.wait(0.1)
+            if len(events) >= count:
+                break
+        return events
+
+    def test_spool_delivers_between_processes(self):
+        """Файловая шина доставляет событие потоку чтения процесса."""
+        path = self.spool()
+        with override_settings(EVENTS_SPOOL=path, EVENTS_POLL_INTERVAL=0.01):
+            listener = events.broker.listen(self.reader.pk)
+            self.addCleanup(events.broker.close, listener)
+            events.publish({'author_id': self.author.pk, 'post': 2})
+            self.assertEqual(
+                listener.wait(5), [{'author_id': self.author.pk, 'post': 2}]
+            )
+
+    def test_spool_survives_new_file_and_broken_lines(self):
+        """Разросшийся файл сменяется новым, а битые строки
+        пропускаются: поток чтения продолжает раздавать события."""
+        path = self.spool()
+        with override_settings(
+            EVENTS_SPOOL=path, EVENTS_POLL_INTERVAL=0.01, EVENTS_SPOOL_SIZE=40
+        ):
+            listener = events.broker.listen(self.reader.pk)
+            self.addCleanup(events.broker.close, listener)
+            events.publish({'author_id': self.author.pk, 'post': 1})
+            first = os.stat(path).st_ino
+            with open(path, 'a', encoding='utf-8') as spool:
+                spool.write('{"author_id": обрыв\n')
+            for post in (2, 3):
+                events.publish({'author_id': self.author.pk, 'post': post})
+            self.assertNotEqual(os.stat(path).st_ino, first)
+            self.assertEqual(
+                [event['post'] for event in self.received(listener, 3)],
+                [1, 2, 3],
+            )
+            # Файл, обрезанный на месте посреди строки, читается заново
+            # с начала.
+            with open(path, 'w', encoding='utf-8') as spool:
+                spool.write('thor_id":1}\n')
+            events.publish({'author_id': self.author.pk, 'post': 4})
+            self.assertEqual(
+                [event['post'] for event in self.received(listener, 1)],
+                [4],
+            )
+
+    def test_spool_skips_foreign_lines_and_failed_dispatch(self):
+        """Строка не с событием и сбой раздачи одного события не
+        останавливают поток чтения."""
+        path = self.spool()
+        dispatch = events.broker.dispatch
+
+        def fail_first(event):
+            if event['post'] == 1:
+                raise RuntimeError('сбой раздачи')
+            dispatch(event)
+
+        with override_settings(
+            EVENTS_SPOOL=path, EVENTS_POLL_INTERVAL=0.01
+        ), mock.patch.object(
+            events.broker, 'dispatch', side_effect=fail_first
+        ), self.assertLogs('posts.events', 'ERROR') as logs:
+            listener = events.broker.listen(self.reader.pk)
+            self.addCleanup(events.broker.close, listener)
+            with open(path, 'a', encoding='utf-8') as spool:
+                spool.write('[1,2]\n{"post":0}\n')
+            for post in (1, 2):
+                events.publish({'author_id': self.author.pk, 'post': post})
+            self.assertEqual(
+                [event['post'] for event in self.received(listener, 1)],
+                [2],
+            )
+        self.assertEqual(len(logs.records), 3)
+
+    def test_stopped_spool_reader_restarts(self):
+        """Упавший поток чтения запускается заново, пока есть открытые
+        соединения."""
+        path = self.spool()
+        follow = events.SpoolTransport._follow
+        started = []
+
+        def crash_once(transport, spool):
+            started.append(spool)
+            if len(started) == 1:
+                spool.close()
+                raise OSError('сбой чтения')
+            return follow(transport, spool)
+
+        with override_settings(
+            EVENTS_SPOOL=path, EVENTS_POLL_INTERVAL=0.01
+        ), mock.patch.object(
+            events.SpoolTransport, '_follow', crash_once
+        ), self.assertLogs('posts.events', 'ERROR'):
+            listener = events.broker.listen(self.reader.pk)
+            self.addCleanup(events.broker.close, listener)
+            for _ in range(100):
+                if len(started) == 2:
+                    break
+                time.sleep(0.01)
+            events.publish({'author_id': self.author.pk, 'post': 1})
+            self.assertEqual(
+                [event['post'] for event in self.received(listener, 1)],
+                [1],
+            )
+            self.assertTrue(events.transport().thread.is_alive())
+
+
+@override_settings(EVENTS_TIMEOUT=0.3, EVENTS_HEARTBEAT=0.1)
+class FollowEventsStreamTest(TransactionTestCase):
+    def setUp(self):
+        """Читатель, подписанный на автора."""
+        cache.clear()
+        graph.reset()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_new_post_is_pushed(self):
+        """Новый пост автора приходит в открытый поток подписчика, после
+        закрытия потока слушатель снимается."""
+        response = self.client.get(reverse('posts:follow_events'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        content = b''.join(response.streaming_content).decode()
+        self.assertTrue(content.startswith('retry: '))
+        self.assertIn('event: post', content)
+        self.assertIn(reverse('posts:post_detail', args=[post.pk]), content)
+        self.assertIn(': ping', content)
+        response.close()
+        self.assertEqual(events.broker.count, 0)
+
+    def test_follow_page_subscribes(self):
+        """Лента подписок подключает поток событий."""
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertContains(response, reverse('posts:follow_events'))
@@ -0,0 +1,149 @@
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import export
+from ..models import Comment, Follow, Group, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Временные файлы необходимые для тестов."""
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {number}'
+            )
+            for number in range(5)
+        ]
+        cls.pictured = Post.objects.create(
+            author=cls.author,
+            text='С картинкой',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF),
+        )
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text='Комментарий'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        """Авторизация автора."""
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def download(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_jsonl_pages_by_keys(self):
+        """JSONL содержит посты новыми сверху, комментарии и подписки;
+        порции по ключу не теряют и не повторяют строк."""
+        url = reverse('posts:profile_export', args=['author'])
+        with mock.patch.object(export, 'CHUNK_SIZE', 2):
+            content = self.download(url)
+        records = [json.loads(line) for line in content.splitlines()]
+        posts = [record for record in records if record['type'] == 'post']
+        self.assertEqual(
+            [post['id'] for post in posts],
+            [post.pk for post in reversed([*self.posts, self.pictured])],
+        )
+        self.assertEqual(posts[-1]['group'], 'test-slug')
+        self.assertEqual(
+            [record for record in records if record['type'] == 'follow'],
+            [{'type': 'follow', 'user': 'reader', 'author': 'author'}],
+        )
+        self.assertFalse(
+            [record for record in records if record['type'] == 'comment']
+        )
+
+    def test_group_csv(self):
+        """CSV одной таблицы группы; подписок у группы нет."""
+        url = reverse('posts:group_export', args=['test-slug'])
+        self.client.force_login(
+            User.objects.create_user(username='staff', is_staff=True)
+        )
+        with mock.patch.object(export, 'CHUNK_SIZE', 2):
+            content = self.download(url, format='csv', table='comments')
+        rows = list(csv.DictReader(io.StringIO(content.decode())))
+        self.assertEqual(
+            [(row['post'], row['author'], row['parent']) for row in rows],
+            [(str(self.posts[0].pk), 'reader', '')],
+        )
+        response = self.client.get(url, {'format': 'csv', 'table': 'follows'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_zip_includes_images(self):
+        """Архив содержит таблицы и картинки постов."""
+        content = self.download(
+            reverse('posts:profile_export', args=['author']), format='zip'
+        )
+        archive = zipfile.ZipFile(io.BytesIO(content))
+        self.assertEqual(
+            archive.read(f'images/{self.pictured.image.name}'), SMALL_GIF
+        )
+        self.assertEqual(
+            len(archive.read('posts.jsonl').splitlines()), 6
+        )
+        self.assertIn('follows.jsonl', archive.namelist())
+
+    def test_only_owner_or_staff(self):
+        """Чужие данные выгружает только персонал."""
+        self.client.force_login(self.reader)
+        response = self.client.get(
+            reverse('posts:profile_export', args=['author'])
+        )
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(
+            reverse('posts:group_export', args=['test-slug'])
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_command_writes_file(self):
+        """Команда пишет ту же выгрузку в файл."""
+        directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'posts.csv')
+        call_command(
+            'export_content', '--user=author', '--format=csv',
+            f'--output={path}', stdout=io.StringIO(),
+        )
+        with open(path, encoding='utf-8') as output:
+            self.assertEqual(len(list(csv.DictReader(output))), 6)
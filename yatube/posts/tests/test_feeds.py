@@ -0,0 +1,101 @@
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Group, Post, User
+
+
+@override_settings(FEED_ITEMS=3)
+class FeedsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Временные файлы необходимые для тестов."""
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='leo')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author,
+                group=cls.group if number % 2 else None,
+                text=f'Пост номер {number}',
+            )
+            for number in range(5)
+        ]
+
+    def setUp(self):
+        """Анонимный читатель ленты."""
+        cache.clear()
+        self.client = Client()
+
+    def test_feeds_are_capped_and_scoped(self):
+        """Лента содержит только последние посты своей области."""
+        response = self.client.get(reverse('posts:index_rss'))
+        self.assertEqual(
+            response['Content-Type'], 'application/rss+xml; charset=utf-8'
+        )
+        content = response.content.decode()
+        for number in (4, 3, 2):
+            self.assertIn(f'Пост номер {number}', content)
+        self.assertNotIn('Пост номер 1', content)
+        response = self.client.get(
+            reverse('posts:group_atom', args=['test-slug'])
+        )
+        self.assertIn('application/atom+xml', response['Content-Type'])
+        content = response.content.decode()
+        self.assertIn('Пост номер 3', content)
+        self.assertNotIn('Пост номер 4', content)
+        response = self.client.get(reverse('posts:profile_rss', args=['leo']))
+        self.assertIn('Пост номер 4', response.content.decode())
+        response = self.client.get(
+            reverse('posts:group_rss', args=['missing'])
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_cached_until_post_changes(self):
+        """Повторный запрос не обращается к базе; правка показанного
+        поста и новый пост сбрасывают кэш."""
+        url = reverse('posts:group_rss', args=['test-slug'])
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+        post = Post.objects.get(pk=self.posts[3].pk)
+        post.text = 'Исправленный пост'
+        post.save()
+        self.assertIn(
+            'Исправленный пост', self.client.get(url).content.decode()
+        )
+        Post.objects.create(author=self.author, group=self.group, text='Новый')
+        self.assertIn('Новый', self.client.get(url).content.decode())
+
+    def test_conditional_requests(self):
+        """С ETag или датой последнего ответа приходит 304 и из кэша,
+        и после его сброса."""
+        url = reverse('posts:index_atom')
+        response = self.client.get(url)
+        for _ in range(2):
+            self.assertEqual(
+                self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                ).status_code,
+                304,
+            )
+            self.assertEqual(
+                self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                ).status_code,
+                304,
+            )
+            cache.clear()
+
+    def test_pages_link_feeds(self):
+        """Страницы объявляют свои ленты для автообнаружения."""
+        response = self.client.get(
+            reverse('posts:group_list', args=['test-slug'])
+        )
+        self.assertContains(
+            response, reverse('posts:group_atom', args=['test-slug'])
+        )
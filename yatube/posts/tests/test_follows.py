@@ -0,0 +1,122 @@
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import follows
+from ..models import (Follow, Post, StaleSuggestions, TimelineEntry, User,
+                      UserCounters)
+from ..suggestions import mark_stale
+
+
+class BulkFollowTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Временные файлы необходимые для тестов."""
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(5)
+        ]
+        for author in cls.authors:
+            Post.objects.create(author=author, text='Пост')
+
+    def setUp(self):
+        """Авторизация читателя."""
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def bulk(self, **lists):
+        return self.client.post(reverse('posts:follow_bulk'), lists)
+
+    def counters(self, user):
+        return UserCounters.objects.get(user=user)
+
+    def test_bulk_follow_keeps_derived_state(self):
+        """Пачка подписок обновляет счетчики, ленту и отметку
+        рекомендаций, пропуская себя и неизвестные имена."""
+        names = [author.username for author in self.authors[:3]]
+        response = self.bulk(follow=names + ['reader', 'ghost'])
+        self.assertEqual(response.json(), {
+            'following': {**dict.fromkeys(names, True), 'reader': False},
+            'unknown': ['ghost'],
+        })
+        self.assertEqual(self.reader.follower.count(), 3)
+        self.assertEqual(self.counters(self.reader).following_count, 3)
+        self.assertEqual(self.counters(self.authors[0]).followers_count, 1)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 3
+        )
+        self.assertTrue(StaleSuggestions.objects.filter(user=self.reader))
+
+    def test_bulk_follow_is_idempotent_and_unfollows(self):
+        """Повтор подписки ничего не меняет, отписка убирает строки,
+        ленту и счетчики."""
+        names = [author.username for author in self.authors]
+        self.bulk(follow=names[:3])
+        response = self.bulk(follow=names[:2], unfollow=names[2:])
+        self.assertEqual(response.json()['following'], {
+            **dict.fromkeys(names[:2], True),
+            **dict.fromkeys(names[2:], False),
+        })
+        self.assertEqual(
+            set(self.reader.follower.values_list('author', flat=True)),
+            {self.authors[0].pk, self.authors[1].pk},
+        )
+        self.assertEqual(self.counters(self.reader).following_count, 2)
+        self.assertEqual(self.counters(self.authors[2]).followers_count, 0)
+        self.assertFalse(
+            TimelineEntry.objects.filter(author=self.authors[2])
+        )
+
+    def test_concurrent_follow_is_counted_once(self):
+        """Строки, которые успел вставить или удалить другой запрос, не
+        меняют счетчики второй раз."""
+        first, second = self.authors[:2]
+        # Подписка из параллельного запроса: строка уже есть, ее
+        # счетчики учтет тот запрос.
+        Follow.objects.bulk_create([Follow(user=self.reader, author=first)])
+        self.assertEqual(
+            follows.follow(self.reader, [first, second, second]), [second]
+        )
+        self.assertEqual(self.counters(self.reader).following_count, 1)
+        self.assertEqual(self.counters(first).followers_count, 0)
+        Follow.objects.filter(author=first).delete()
+        UserCounters.objects.filter(user=self.reader).update(
+            following_count=2
+        )
+        self.assertEqual(
+            follows.unfollow(self.reader, [first, second]), [second]
+        )
+        self.assertEqual(self.counters(self.reader).following_count, 1)
+        self.assertEqual(self.counters(second).followers_count, 0)
+
+    def test_query_count_does_not_grow_with_authors(self):
+        """Число запросов не зависит от числа авторов."""
+        names = [author.username for author in self.authors]
+        # Первая отметка рекомендаций вставляет строку, следующие обновляют.
+        mark_stale(self.reader.pk)
+        counts = []
+        for chunk in (names[:2], names[2:]):
+            for action in ('follow', 'unfollow'):
+                with CaptureQueriesContext(connection) as queries:
+                    self.bulk(**{action: chunk})
+                counts.append(len(queries))
+        self.assertEqual(counts[:2], counts[2:])
+
+    @override_settings(FOLLOW_BULK_LIMIT=2)
+    def test_limit_and_method(self):
+        """Слишком длинный список и GET отклоняются."""
+        names = [author.username for author in self.authors[:3]]
+        self.assertEqual(self.bulk(follow=names).status_code, 400)
+        self.assertFalse(Follow.objects.exists())
+        response = self.client.get(reverse('posts:follow_bulk'))
+        self.assertEqual(response.status_code, 405)
+
+    def test_unfollow_without_follow_redirects(self):
+        """Отписка без подписки не падает."""
+        response = self.client.get(
+            reverse('posts:profile_unfollow', args=[self.authors[0].username])
+        )
+        self.assertRedirects(response, reverse('posts:follow_index'))
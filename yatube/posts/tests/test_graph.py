@@ -0,0 +1,149 @@
+import os
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from .. import caching, graph
+from ..graph import FollowGraph
+from ..models import Follow, User
+
+TEMP_DIR = tempfile.mkdtemp()
+
+
+class FollowGraphTest(TestCase):
+    def setUp(self):
+        """Граф: 1 и 2 подписаны друг на друга, 1 и 3 подписаны на 4."""
+        self.graph = FollowGraph([(1, 2), (2, 1), (1, 4), (3, 4), (1, 4)])
+
+    def test_counts_and_state(self):
+        """Счетчики и проверка подписки."""
+        self.assertEqual(len(self.graph), 4)
+        self.assertEqual(self.graph.following_count(1), 2)
+        self.assertEqual(self.graph.followers_count(4), 2)
+        self.assertTrue(self.graph.is_following(3, 4))
+        self.assertFalse(self.graph.is_following(4, 3))
+        self.assertEqual(
+            self.graph.follow_state(1, [2, 3, 4]),
+            {2: True, 3: False, 4: True},
+        )
+
+    def test_mutual_and_followed_by_following(self):
+        """Взаимные подписки и подписчики автора среди подписок."""
+        self.assertEqual(self.graph.mutual(1), [2])
+        self.assertEqual(self.graph.mutual(3), [])
+        self.graph.add(2, 3)
+        self.assertEqual(self.graph.followed_by_following(1, 3), [2])
+
+    def test_add_and_remove_are_idempotent(self):
+        """Повторная подписка и отписка не ломают массивы."""
+        self.graph.add(3, 1)
+        self.graph.add(3, 1)
+        self.assertEqual(self.graph.following_count(3), 2)
+        self.graph.remove(3, 1)
+        self.graph.remove(3, 1)
+        self.assertEqual(self.graph.followers_count(1), 1)
+
+    def test_snapshot_roundtrip(self):
+        """Снимок восстанавливает те же ребра и отметку id."""
+        path = os.path.join(TEMP_DIR, 'graph.snapshot')
+        self.graph.snapshot(path, 42)
+        loaded, last_follow_id = FollowGraph.load(path)
+        self.assertEqual(last_follow_id, 42)
+        self.assertEqual(sorted(loaded.edges()), sorted(self.graph.edges()))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+
+class FollowGraphSnapshotTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Временные файлы необходимые для тестов."""
+        super().setUpClass()
+        cls.users = [
+            User.objects.create_user(username=f'user{index}')
+            for index in range(3)
+        ]
+        cls.path = os.path.join(tempfile.mkdtemp(), 'graph.snapshot')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(os.path.dirname(cls.path), ignore_errors=True)
+
+    def follow(self, user, author):
+        return Follow.objects.create(
+            user=self.users[user], author=self.users[author]
+        )
+
+    def test_snapshot_catches_up_with_new_follows(self):
+        """Снимок дополняется подписками, созданными после него."""
+        self.follow(0, 1)
+        graph.save_snapshot(self.path)
+        self.follow(0, 2)
+        loaded = graph._from_snapshot(self.path)
+        self.assertTrue(
+            loaded.is_following(self.users[0].pk, self.users[2].pk)
+        )
+        self.assertEqual(len(loaded), 2)
+
+    def test_snapshot_is_dropped_after_unfollow(self):
+        """После отписки снимок не используется."""
+        follow = self.follow(0, 1)
+        graph.save_snapshot(self.path)
+        follow.delete()
+        self.assertIsNone(graph._from_snapshot(self.path))
+
+
+class FollowGraphSignalsTest(TransactionTestCase):
+    def setUp(self):
+        """Пользователи для тестирования."""
+        cache.clear()
+        graph.reset()
+        self.reader = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='author')
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_follow_and_unfollow_update_graph(self):
+        """Подписка и отписка сразу видны в графе и профиле."""
+        follows = graph.get_graph()
+        self.client.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        self.assertIs(graph.get_graph(), follows)
+        self.assertTrue(follows.is_following(self.reader.pk, self.author.pk))
+        response = self.client.get(
+            reverse('posts:profile', args=[self.author.username])
+        )
+        self.assertTrue(response.context['following'])
+        self.client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username])
+        )
+        self.assertFalse(
+            graph.get_graph().is_following(self.reader.pk, self.author.pk)
+        )
+
+    def test_other_process_changes_are_applied_as_deltas(self):
+        """Подписка другого процесса применяется ее изменением без
+        чтения таблицы; после вытеснения изменения граф
+        перестраивается."""
+        follows = graph.get_graph()
+        caching.bump_follow_graph_generation(
+            (self.reader.pk, (self.author.pk,), True)
+        )
+        with self.assertNumQueries(0):
+            self.assertIs(graph.get_graph(), follows)
+        self.assertTrue(follows.is_following(self.reader.pk, self.author.pk))
+        generation = caching.bump_follow_graph_generation(
+            (self.reader.pk, (self.author.pk,), False)
+        )
+        cache.delete(caching.FOLLOW_GRAPH_DELTA_KEY.format(generation))
+        rebuilt = graph.get_graph()
+        self.assertIsNot(rebuilt, follows)
+        self.assertFalse(rebuilt.is_following(self.reader.pk, self.author.pk))
@@ -0,0 +1,154 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from .. import tags
+from ..models import (Completion, Follow, Group, Post, Tag, TimelineEntry,
+                      User, UserCounters)
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImportPostsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Временные файлы необходимые для тестов."""
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='leo')
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        with open(os.path.join(cls.directory, 'small.gif'), 'wb') as image:
+            image.write(SMALL_GIF)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.directory, ignore_errors=True)
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.write(content)
+        return path
+
+    def run_import(self, path, *args):
+        out, err = StringIO(), StringIO()
+        call_command('import_posts', path, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_jsonl_import_rebuilds_derived_state(self):
+        """Посты вставляются пачками с датой из файла, новые авторы и
+        группы создаются, счетчики, теги, ленты и подсказки
+        пересобираются, битые строки пропускаются."""
+        rows = [
+            {'author': 'leo', 'text': 'Первый #импорт',
+             'group': 'test-slug', 'pub_date': '2020-01-02T10:00:00'},
+            {'author': 'newcomer', 'text': 'Второй #импорт',
+             'group': 'fresh', 'image': 'small.gif'},
+            {'author': 'leo', 'text': 'Третий'},
+        ]
+        lines = [json.dumps(row, ensure_ascii=False) for row in rows]
+        lines[2:2] = ['{"author": "leo"}', 'не json', '']
+        path = self.write('posts.jsonl', '\n'.join(lines))
+        out, err = self.run_import(
+            path, '--batch-size=2', '--chunk-size=2',
+            f'--images={self.directory}',
+        )
+        self.assertIn('Постов: 3, пропущено строк: 2', out)
+        self.assertIn('Строка 3', err)
+        first = Post.objects.get(text='Первый #импорт')
+        self.assertEqual(first.pub_date.year, 2020)
+        self.assertEqual(first.group, self.group)
+        second = Post.objects.get(text='Второй #импорт')
+        self.assertEqual(second.group.slug, 'fresh')
+        self.assertTrue(second.image.name.startswith('posts/small'))
+        self.assertTrue(second.thumbnails_pending)
+        self.assertEqual(
+            UserCounters.objects.get(user=self.author).posts_count, 2
+        )
+        self.assertEqual(Group.objects.get(slug='fresh').posts_count, 1)
+        self.assertEqual(Tag.objects.get(name='импорт').posts_count, 2)
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(user=self.reader)
+                .values_list('post__text', flat=True)),
+            {'Первый #импорт', 'Третий'},
+        )
+        self.assertTrue(
+            Completion.objects.filter(key='newcomer', user__isnull=False)
+        )
+
+    def test_csv_import(self):
+        """CSV читается по заголовку, существующий автор не
+        дублируется."""
+        path = self.write(
+            'posts.csv',
+            'author,text,group\nleo,"Пост, с запятой",\nleo,Еще,test-slug\n',
+        )
+        self.run_import(path)
+        self.assertEqual(User.objects.filter(username='leo').count(), 1)
+        self.assertEqual(
+            list(Post.objects.order_by('pk').values_list('text', 'group')),
+            [('Пост, с запятой', None), ('Еще', self.group.pk)],
+        )
+
+    def test_failed_chunk_keeps_committed_chunks_consistent(self):
+        """Пока идет импорт, другие посты получают дату как обычно; если
+        пачка падает, уже зафиксированные получают счетчики и ленты."""
+        attach = tags.attach
+
+        def fail_second(posts):
+            if Post.objects.filter(text='Параллельный').exists():
+                raise RuntimeError('сбой пачки')
+            Post.objects.create(author=self.reader, text='Параллельный')
+            return attach(posts)
+
+        rows = [
+            {'author': 'leo', 'text': 'Первый',
+             'pub_date': '2020-01-02T10:00:00'},
+            {'author': 'leo', 'text': 'Второй'},
+        ]
+        path = self.write('posts.jsonl', '\n'.join(
+            json.dumps(row, ensure_ascii=False) for row in rows
+        ))
+        with mock.patch.object(tags, 'attach', side_effect=fail_second):
+            with self.assertRaises(RuntimeError):
+                self.run_import(path, '--batch-size=1', '--chunk-size=1')
+        self.assertEqual(
+            Post.objects.get(text='Первый').pub_date.year, 2020
+        )
+        self.assertFalse(Post.objects.filter(text='Второй'))
+        self.assertIsNotNone(
+            Post.objects.get(text='Параллельный').pub_date
+        )
+        self.assertEqual(
+            UserCounters.objects.get(user=self.author).posts_count, 1
+        )
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=self.reader, post__text='Первый'
+            )
+        )
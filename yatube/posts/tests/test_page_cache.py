@@ -0,0 +1,100 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.page_cache import purge
+
+from .. import tags
+from ..caching import INDEX_TAG
+from ..models import Comment, Group, Post, User
+
+
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Временные файлы необходимые для тестов."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост',
+            group=cls.group,
+        )
+
+    def setUp(self):
+        """Пользователи для тестирования."""
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_anonymous_pages_are_served_from_cache(self):
+        """Повторный анонимный запрос не обращается к базе."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.guest_client.get(url)
+                with self.assertNumQueries(0):
+                    response = self.guest_client.get(url)
+                self.assertContains(response, self.post.text)
+
+    def test_post_edit_purges_tagged_pages(self):
+        """Правка поста сбрасывает только страницы с этим постом."""
+        other = Post.objects.create(
+            author=User.objects.create_user(username='other'),
+            text='Другой пост',
+        )
+        detail = reverse('posts:post_detail', kwargs={'post_id': other.id})
+        group = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        self.guest_client.get(detail)
+        self.guest_client.get(group)
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+        self.assertContains(self.guest_client.get(group), 'Исправленный пост')
+        with self.assertNumQueries(0):
+            self.guest_client.get(detail)
+
+    def test_purge_during_render_is_not_cached(self):
+        """Страница, сброшенная пока строилась, не сохраняется под новой
+        версией тега."""
+        trending = tags.trending
+
+        def purge_while_rendering():
+            purge(INDEX_TAG)
+            return trending()
+
+        url = reverse('posts:index')
+        with mock.patch.object(
+            tags, 'trending', side_effect=purge_while_rendering
+        ):
+            self.guest_client.get(url)
+        self.assertIsNotNone(self.guest_client.get(url).context)
+        self.assertIsNone(self.guest_client.get(url).context)
+
+    def test_comment_purges_post_page(self):
+        """Новый комментарий виден анонимному читателю сразу."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        self.guest_client.get(url)
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Свежий комментарий'
+        )
+        self.assertContains(self.guest_client.get(url), 'Свежий комментарий')
+
+    def test_authenticated_requests_bypass_cache(self):
+        """Авторизованный пользователь всегда получает свежую страницу."""
+        url = reverse('posts:index')
+        self.guest_client.get(url)
+        response = self.authorized_client.get(url)
+        self.assertIsNotNone(response.context)
@@ -0,0 +1,104 @@
+import re
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..graph import get_graph
+from ..models import Comment, Follow, Group, Post, User
+from ..utils import encode_cursor
+
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?\w+( AS \w+)?$')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'План запроса снимается в SQLite')
+class QueryPlanTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Временные файлы необходимые для тестов."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост #тест',
+            group=cls.group,
+        )
+        comment = Comment.objects.create(
+            post=cls.post,
+            author=cls.reader,
+            text='Тестовый комментарий',
+        )
+        Comment.objects.create(
+            post=cls.post,
+            author=cls.user,
+            text='Тестовый ответ',
+            parent=comment,
+        )
+        Follow.objects.create(user=cls.reader, author=cls.user)
+
+    def setUp(self):
+        """Авторизация читателя."""
+        cache.clear()
+        # Граф подписок читает всю таблицу один раз на процесс.
+        get_graph()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertQueriesUseIndexes(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, params)
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT'):
+                continue
+            for step in self.explain(sql):
+                with self.subTest(url=url, sql=sql, step=step):
+                    self.assertIsNone(FULL_SCAN.match(step))
+                    self.assertNotIn('TEMP B-TREE', step)
+
+    def test_feed_queries_use_indexes(self):
+        """Запросы лент не сканируют таблицы и не сортируют во временных
+        B-деревьях.
+        """
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+            reverse('posts:follow_index'),
+            reverse('posts:tag_posts', args=['тест']),
+        )
+        for url in urls:
+            self.assertQueriesUseIndexes(url)
+            cursor = encode_cursor([self.post.pub_date, self.post.id + 1])
+            self.assertQueriesUseIndexes(url, {'cursor': cursor})
+
+    def test_post_detail_queries_use_indexes(self):
+        """Запросы страницы поста и комментариев идут по индексам."""
+        comment = self.post.comments.get(depth=0)
+        self.assertQueriesUseIndexes(reverse(
+            'posts:comment_thread', args=[self.post.id, comment.id]
+        ))
+        for name in ('posts:post_detail', 'posts:comment_list'):
+            url = reverse(name, kwargs={'post_id': self.post.id})
+            self.assertQueriesUseIndexes(url)
+            for order, direction in (('old', 'p'), ('new', 'n')):
+                cursor = encode_cursor(
+                    [comment.created, comment.id], direction
+                )
+                self.assertQueriesUseIndexes(
+                    url, {'order': order, 'cursor': cursor}
+                )
@@ -0,0 +1,97 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Group, Post, User
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Индекс FTS5 есть только в SQLite')
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Временные файлы необходимые для тестов."""
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.frequent = Post.objects.create(
+            author=cls.author,
+            group=cls.group,
+            text='Ежик <b>в</b> тумане: ежик ищет ежика',
+        )
+        cls.rare = Post.objects.create(
+            author=cls.other,
+            text='Длинный пост о лошадях, где ежик упомянут однажды '
+                 'среди множества других слов про туман и реку',
+        )
+        Post.objects.create(author=cls.other, text='Совсем про другое')
+
+    def search(self, **params):
+        return self.client.get(reverse('posts:search'), params)
+
+    def found(self, **params):
+        return list(self.search(**params).context['page_obj'])
+
+    def test_results_are_ranked_and_highlighted(self):
+        """BM25 ставит выше пост с частым словом, совпадения в <mark>,
+        остальной текст экранирован."""
+        response = self.search(q='ежик')
+        self.assertEqual(
+            list(response.context['page_obj']), [self.frequent, self.rare]
+        )
+        highlighted = response.context['page_obj'][0].highlighted
+        self.assertIn('<mark>Ежик</mark>', highlighted)
+        self.assertIn('&lt;b&gt;', highlighted)
+
+    def test_prefix_and_filters(self):
+        """Последнее слово ищется по началу, фильтры по группе и
+        автору сужают выдачу."""
+        self.assertEqual(self.found(q='туман'), [self.frequent, self.rare])
+        self.assertEqual(
+            self.found(q='туман', group=self.group.slug), [self.frequent]
+        )
+        self.assertEqual(self.found(q='туман', author='other'), [self.rare])
+        self.assertEqual(self.found(q='"*)'), [])
+
+    def test_index_follows_edits_and_deletes(self):
+        """Триггеры переиндексируют измененный текст и убирают
+        удаленные посты."""
+        rare = Post.objects.get(pk=self.rare.pk)
+        rare.text = 'Теперь про енота'
+        rare.save()
+        self.assertEqual(self.found(q='ежик'), [self.frequent])
+        self.assertEqual(self.found(q='енот'), [rare])
+        Post.objects.filter(pk=self.frequent.pk).delete()
+        self.assertEqual(self.found(q='ежик'), [])
+
+    def test_empty_query_shows_form_only(self):
+        """Без запроса показывается только форма."""
+        response = self.search()
+        self.assertIsNone(response.context['page_obj'])
+
+    def test_admin_search_and_rebuild_command(self):
+        """Поиск в админке идет по индексу, команда его пересобирает."""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'ежик'}
+        )
+        self.assertEqual(
+            set(response.context['cl'].result_list),
+            {self.frequent, self.rare},
+        )
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('3', out.getvalue())
+        self.assertEqual(self.found(q='ежик'), [self.frequent, self.rare])
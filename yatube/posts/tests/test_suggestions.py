@@ -0,0 +1,167 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.db.models.signals import post_delete
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from .. import suggestions
+from ..models import Comment, Follow, Post, StaleSuggestions, Suggestion, User
+
+
+class SuggestionsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Временные файлы необходимые для тестов."""
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.neighbour = User.objects.create_user(username='neighbour')
+        cls.author = User.objects.create_user(username='author')
+        cls.co_followed = User.objects.create_user(username='co_followed')
+        cls.co_commented = User.objects.create_user(username='co_commented')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Follow.objects.create(user=cls.neighbour, author=cls.author)
+        Follow.objects.create(user=cls.neighbour, author=cls.co_followed)
+        for author in (cls.author, cls.co_commented):
+            Comment.objects.create(
+                post=Post.objects.create(author=author, text='Пост'),
+                author=cls.neighbour,
+                text='Комментарий',
+            )
+
+    def setUp(self):
+        """Авторизация читателя."""
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def compute(self, *args):
+        call_command('compute_suggestions', *args, stdout=StringIO())
+
+    def suggested(self, user):
+        return list(
+            Suggestion.objects.filter(user=user).order_by('-score')
+            .values_list('author__username', flat=True)
+        )
+
+    def test_co_follow_and_co_comment_scores(self):
+        """Рекомендуются авторы, которых читают и обсуждают вместе с
+        подписками, но не сами подписки и не сам пользователь."""
+        self.compute('--all')
+        self.assertEqual(
+            self.suggested(self.reader), ['co_followed', 'co_commented']
+        )
+        self.assertNotIn('reader', self.suggested(self.neighbour))
+        self.assertFalse(StaleSuggestions.objects.exists())
+
+    def test_incremental_run_recomputes_stale_users_only(self):
+        """Без --all пересчитываются только пользователи, чьи подписки
+        менялись."""
+        self.compute('--all')
+        kept = set(
+            Suggestion.objects.exclude(user=self.reader)
+            .values_list('pk', flat=True)
+        )
+        Follow.objects.create(user=self.reader, author=self.co_followed)
+        self.assertEqual(
+            list(StaleSuggestions.objects.values_list('user', flat=True)),
+            [self.reader.pk],
+        )
+        self.compute()
+        self.assertEqual(self.suggested(self.reader), ['co_commented'])
+        self.assertEqual(
+            set(
+                Suggestion.objects.exclude(user=self.reader)
+                .values_list('pk', flat=True)
+            ),
+            kept,
+        )
+        self.assertFalse(StaleSuggestions.objects.exists())
+
+    def test_user_created_during_run(self):
+        """Пользователь с подпиской, появившийся посреди пересчета, не
+        ломает его и остается в очереди на следующий пересчет."""
+        stale_users = suggestions.stale_users
+
+        def sign_up():
+            newcomer = User.objects.create_user(username='newcomer')
+            Follow.objects.create(user=newcomer, author=self.author)
+            return stale_users()
+
+        Follow.objects.create(user=self.reader, author=self.co_followed)
+        with mock.patch.object(
+            suggestions, 'stale_users', side_effect=sign_up
+        ):
+            self.compute()
+        self.assertEqual(self.suggested(self.reader), ['co_commented'])
+        self.assertEqual(
+            list(StaleSuggestions.objects.values_list(
+                'user__username', flat=True
+            )),
+            ['newcomer'],
+        )
+        self.compute()
+        self.assertEqual(
+            self.suggested(User.objects.get(username='newcomer')),
+            ['co_followed', 'co_commented'],
+        )
+
+    def test_pages_show_suggestions_without_followed_authors(self):
+        """Профиль и лента подписок показывают рекомендации; автор, на
+        которого уже подписались, пропадает до пересчета."""
+        self.compute('--all')
+        Follow.objects.create(user=self.reader, author=self.co_followed)
+        for url in (
+            reverse('posts:follow_index'),
+            reverse('posts:profile', args=[self.author.username]),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(
+                    [s.author for s in response.context['suggestions']],
+                    [self.co_commented],
+                )
+
+
+class DeletedUserSuggestionsTest(TransactionTestCase):
+    def test_deleting_user_with_follows(self):
+        """Удаление пользователя с подписками не оставляет отметку
+        о пересчете без пользователя, а его подписчиков отмечает."""
+        reader = User.objects.create_user(username='reader')
+        author = User.objects.create_user(username='author')
+        follower = User.objects.create_user(username='follower')
+        Follow.objects.create(user=reader, author=author)
+        Follow.objects.create(user=follower, author=reader)
+        StaleSuggestions.objects.all().delete()
+        reader.delete()
+        self.assertEqual(
+            list(StaleSuggestions.objects.values_list('user', flat=True)),
+            [follower.pk],
+        )
+
+    def test_rolled_back_deletion_keeps_marking_user(self):
+        """Удаление, упавшее посреди каскада, не мешает отмечать
+        пользователя дальше."""
+        reader = User.objects.create_user(username='reader')
+        author = User.objects.create_user(username='author')
+        Follow.objects.create(user=reader, author=author)
+        reader_id = reader.pk
+
+        def fail(**kwargs):
+            raise DatabaseError('сбой удаления')
+
+        post_delete.connect(fail, sender=Follow)
+        self.addCleanup(post_delete.disconnect, fail, sender=Follow)
+        with self.assertRaises(DatabaseError):
+            reader.delete()
+        post_delete.disconnect(fail, sender=Follow)
+        StaleSuggestions.objects.all().delete()
+        Follow.objects.create(
+            user_id=reader_id,
+            author=User.objects.create_user(username='other'),
+        )
+        self.assertEqual(
+            list(StaleSuggestions.objects.values_list('user', flat=True)),
+            [reader_id],
+        )
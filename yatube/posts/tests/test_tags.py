@@ -0,0 +1,87 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Post, PostTag, Tag, TagDay, User
+from ..tags import extract, trending, window_start
+
+
+class TagsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Временные файлы необходимые для тестов."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    def setUp(self):
+        """Авторизация автора."""
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def counts(self):
+        return dict(Tag.objects.values_list('name', 'posts_count'))
+
+    def test_extract(self):
+        """Хэштеги приводятся к нижнему регистру, якоря, почта и
+        слишком длинные теги не считаются хэштегами."""
+        self.assertEqual(
+            extract('#Django и #джанго, снова #django; a#b ##x'),
+            {'django', 'джанго'},
+        )
+        self.assertEqual(
+            extract(f'#{"a" * 64} #{"b" * 65}.'), {'a' * 64}
+        )
+
+    def test_form_create_and_edit_maintain_counts(self):
+        """Создание и правка через форму пересчитывают теги поста."""
+        self.client.post(
+            reverse('posts:post_create'), {'text': 'Пост про #python #django'}
+        )
+        post = Post.objects.get()
+        self.assertEqual(self.counts(), {'python': 1, 'django': 1})
+        self.client.post(
+            reverse('posts:post_edit', args=[post.pk]),
+            {'text': 'Пост про #python и #sqlite'},
+        )
+        self.assertEqual(
+            self.counts(), {'python': 1, 'django': 0, 'sqlite': 1}
+        )
+        self.assertEqual(
+            set(post.post_tags.values_list('tag__name', flat=True)),
+            {'python', 'sqlite'},
+        )
+        post.delete()
+        self.assertEqual(set(self.counts().values()), {0})
+        self.assertEqual(
+            set(TagDay.objects.values_list('posts_count', flat=True)), {0}
+        )
+
+    def test_unchanged_text_is_not_parsed_again(self):
+        """Сохранение без правки текста не трогает теги."""
+        post = Post.objects.create(author=self.user, text='#python')
+        with self.assertNumQueries(2):
+            post.save()
+        self.assertEqual(PostTag.objects.count(), 1)
+
+    def test_tag_feed_and_trending(self):
+        """Лента тега новая сверху, популярные теги по числу постов."""
+        first = Post.objects.create(author=self.user, text='#python #django')
+        second = Post.objects.create(author=self.user, text='Снова #Python')
+        Post.objects.create(author=self.user, text='Без тегов')
+        response = self.client.get(reverse('posts:tag_posts', args=['python']))
+        self.assertEqual(list(response.context['page_obj']), [second, first])
+        self.assertEqual(response.context['trending'], ['python', 'django'])
+        response = self.client.get(reverse('posts:tag_posts', args=['nope']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_days_out_of_window_leave_trending(self):
+        """День, выпавший из окна, вычитается из недавних счетчиков один
+        раз."""
+        Post.objects.create(author=self.user, text='#old')
+        TagDay.objects.update(day=window_start())
+        self.assertEqual(trending(), [])
+        cache.clear()
+        trending()
+        tag = Tag.objects.get()
+        self.assertEqual((tag.posts_count, tag.recent_count), (1, 0))
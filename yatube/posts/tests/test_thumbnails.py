@@ -0,0 +1,332 @@
+import io
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import get_thumbnail
+
+from .. import thumbnails, variants
+from ..management.commands import process_thumbnails, warm_thumbnails
+from ..models import Post, PostImageVariant, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    POST_THUMBNAILS=(('2x1', {'upscale': False}),),
+)
+class ThumbnailPipelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Временные файлы необходимые для тестов."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        """Авторизация пользователя."""
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def upload(self, text='Пост с картинкой'):
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': text,
+                'image': SimpleUploadedFile(
+                    'small.gif', SMALL_GIF, content_type='image/gif'
+                ),
+            },
+        )
+        return Post.objects.get(text=text)
+
+    def test_upload_marks_thumbnails_pending(self):
+        """Загруженная картинка ждет миниатюр, страница показывает
+        оригинал."""
+        post = self.upload()
+        self.assertTrue(post.thumbnails_pending)
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.id})
+        )
+        self.assertContains(response, post.image.url)
+
+    def test_generate_prepares_thumbnails(self):
+        """Фоновая задача готовит варианты и миниатюры и снимает
+        отметку."""
+        # Хранилище sorl помнит одноименные файлы прежних тестов.
+        cache.clear()
+        post = self.upload()
+        self.assertTrue(thumbnails.generate(post.id))
+        post.refresh_from_db()
+        self.assertFalse(post.thumbnails_pending)
+        self.assertFalse(thumbnails.generate(post.id))
+        self.assertTrue(post.variants.exists())
+        self.assertTrue(os.listdir(os.path.join(TEMP_MEDIA_ROOT, 'cache')))
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.id})
+        )
+        self.assertNotContains(response, post.image.url)
+
+    def test_text_edit_keeps_thumbnails(self):
+        """Правка текста без новой картинки не ставит задачу заново."""
+        post = self.upload()
+        thumbnails.generate(post.id)
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.id}),
+            data={'text': 'Новый текст'},
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Новый текст')
+        self.assertFalse(post.thumbnails_pending)
+
+    def test_worker_picks_up_new_uploads(self):
+        """Воркер с --watch готовит миниатюры картинок, загруженных
+        между проходами."""
+        posts = [self.upload('Первый пост')]
+
+        def pause(seconds):
+            if len(posts) > 1:
+                raise KeyboardInterrupt
+            posts.append(self.upload('Второй пост'))
+
+        with mock.patch.object(process_thumbnails, 'time') as clock:
+            clock.sleep.side_effect = pause
+            with self.assertRaises(KeyboardInterrupt):
+                call_command('process_thumbnails', watch=1)
+        for post in posts:
+            post.refresh_from_db()
+            self.assertFalse(post.thumbnails_pending)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageVariantsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Временные файлы необходимые для тестов."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        buffer = io.BytesIO()
+        Image.new('RGB', (1600, 1200), 'red').save(buffer, 'PNG')
+        cls.source = buffer.getvalue()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        """Авторизация пользователя."""
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_render_builds_widths_and_formats(self):
+        """Из картинки получаются все ширины в WebP и JPEG
+        с пропорцией карточки."""
+        rendered = variants.render(
+            io.BytesIO(self.source), (320, 1260, 2000), (1260, 839), 80
+        )
+        self.assertEqual(
+            [(width, height, fmt) for width, height, fmt, _ in rendered],
+            [
+                (320, 213, 'webp'), (320, 213, 'jpeg'),
+                (1260, 839, 'webp'), (1260, 839, 'jpeg'),
+            ],
+        )
+        for width, height, fmt, data in rendered:
+            with Image.open(io.BytesIO(data)) as image:
+                self.assertEqual(image.size, (width, height))
+                self.assertEqual(image.format, fmt.upper())
+
+    def test_card_renders_picture_without_opening_files(self):
+        """Карточка выводит picture с srcset по сохраненным вариантам."""
+        post = Post.objects.create(
+            author=self.user,
+            text='Пост',
+            image=SimpleUploadedFile('big.png', self.source),
+        )
+        built = variants.build(post)
+        self.assertEqual(post.variants.count(), len(built))
+        response = self.authorized_client.get(reverse('posts:index'))
+        content = response.content.decode()
+        self.assertIn('<picture>', content)
+        self.assertIn('type="image/webp"', content)
+        self.assertIn('loading="lazy"', content)
+        self.assertIn('width="1260" height="839"', content)
+        for variant in built:
+            self.assertIn(f'{variant.file.url} {variant.width}w', content)
+
+    def test_removed_image_drops_variants(self):
+        """Удаление картинки из поста удаляет ее варианты."""
+        post = Post.objects.create(
+            author=self.user,
+            text='Пост',
+            image=SimpleUploadedFile('big.png', self.source),
+        )
+        variants.build(post)
+        post.image = None
+        post.save()
+        self.assertFalse(PostImageVariant.objects.filter(post=post).exists())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class WarmThumbnailsCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Временные файлы необходимые для тестов."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def warm(self, **options):
+        out = io.StringIO()
+        call_command('warm_thumbnails', stdout=out, stderr=out, **options)
+        return out.getvalue()
+
+    def test_builds_missing_variants_and_resumes(self):
+        """Команда готовит недостающие варианты и пропускает готовые."""
+        posts = [
+            Post.objects.create(
+                author=self.user,
+                text=f'Пост {index}',
+                image=SimpleUploadedFile('small.gif', SMALL_GIF),
+            )
+            for index in range(3)
+        ]
+        output = self.warm(jobs=2)
+        self.assertIn('Постов: 3, ошибок: 0', output)
+        for post in posts:
+            self.assertTrue(post.variants.exists())
+        self.assertIn('Постов: 0', self.warm(jobs=1))
+
+    def test_pool_keeps_a_bounded_window(self):
+        """В пуле не больше JOBS_PER_WORKER задач на процесс, сколько бы
+        постов ни ждало."""
+        submitted = []
+
+        class Pool(ThreadPoolExecutor):
+            def submit(self, *args):
+                submitted.append(args)
+                return super().submit(*args)
+
+        jobs = [(post_id, 'name') for post_id in range(20)]
+        with mock.patch.object(
+            warm_thumbnails, 'ProcessPoolExecutor', Pool
+        ), mock.patch.object(
+            warm_thumbnails, '_render',
+            side_effect=lambda post_id, name: (post_id, [], None),
+        ):
+            results = warm_thumbnails.Command().rendered(jobs, 2)
+            first = next(results)
+            self.assertLessEqual(
+                len(submitted), 2 * warm_thumbnails.JOBS_PER_WORKER
+            )
+            rest = list(results)
+        self.assertEqual(
+            sorted(post_id for post_id, _, _ in [first, *rest]),
+            list(range(20)),
+        )
+
+    def test_reports_broken_images(self):
+        """Битый файл попадает в ошибки, остальные посты готовятся."""
+        Post.objects.create(
+            author=self.user,
+            text='Битый',
+            image=SimpleUploadedFile('broken.gif', b'not an image'),
+        )
+        self.assertIn('ошибок: 1', self.warm(jobs=1))
+
+    def test_deletes_orphaned_files(self):
+        """Файлы без постов удаляются, свежие и живые остаются."""
+        post = Post.objects.create(
+            author=self.user,
+            text='Пост',
+            image=SimpleUploadedFile('kept.gif', SMALL_GIF),
+        )
+        orphan = default_storage.save('posts/orphan.gif', io.BytesIO(
+            SMALL_GIF
+        ))
+        fresh = default_storage.save('posts/fresh.gif', io.BytesIO(
+            SMALL_GIF
+        ))
+        os.utime(default_storage.path(orphan), (0, 0))
+        self.warm(jobs=1)
+        self.assertFalse(default_storage.exists(orphan))
+        self.assertTrue(default_storage.exists(fresh))
+        self.assertTrue(default_storage.exists(post.image.name))
+        for variant in post.variants.all():
+            self.assertTrue(default_storage.exists(variant.file.name))
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    POST_THUMBNAILS=(('2x1', {'upscale': False}),),
+)
+class PrefetchThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Временные файлы необходимые для тестов."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.user,
+                text=f'Пост {index}',
+                image=SimpleUploadedFile('small.gif', SMALL_GIF),
+            )
+            for index in range(3)
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_feed_page_reads_thumbnails_in_one_query(self):
+        """Миниатюры всей страницы читаются одним запросом."""
+        # Кэш sorl мог остаться от других тестов с тем же именем файла:
+        # тогда get_thumbnail не запишет строки в базу.
+        cache.clear()
+        urls = [
+            get_thumbnail(post.image, '2x1', upscale=False).url
+            for post in self.posts
+        ]
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+        kvstore_queries = [
+            query for query in queries.captured_queries
+            if 'thumbnail_kvstore' in query['sql']
+        ]
+        self.assertEqual(len(kvstore_queries), 1)
+        for url in urls:
+            self.assertContains(response, url)
@@ -0,0 +1,96 @@
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Follow, Post, PullAuthor, TimelineEntry, User
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Временные файлы необходимые для тестов."""
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.old_post = Post.objects.create(
+            author=cls.author,
+            text='Пост до подписки',
+        )
+
+    def setUp(self):
+        """Авторизация читателя."""
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def feed(self, **params):
+        response = self.reader_client.get(
+            reverse('posts:follow_index'), params
+        )
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_and_unfollow_trims_timeline(self):
+        """Подписка заполняет ленту, отписка ее очищает."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.feed(), [self.old_post])
+        Follow.objects.filter(user=self.reader).delete()
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader))
+        self.assertEqual(self.feed(), [])
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        """Новый пост раскладывается по лентам подписчиков."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.reader, post=post).exists()
+        )
+        self.assertEqual(self.feed(), [post, self.old_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_popular_author_is_pulled_on_read(self):
+        """Посты популярного автора подтягиваются при чтении ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Популярный пост')
+        self.assertTrue(PullAuthor.objects.filter(author=self.author))
+        self.assertFalse(TimelineEntry.objects.filter(post=post))
+        self.assertEqual(self.feed(), [post, self.old_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_pull_keeps_posts_with_same_date(self):
+        """Пост с той же датой, что и последний в ленте, тоже
+        подтягивается."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        first = Post.objects.create(author=self.author, text='Первый пост')
+        self.assertEqual(self.feed(), [first, self.old_post])
+        second = Post.objects.create(author=self.author, text='Второй пост')
+        Post.objects.filter(pk=second.pk).update(pub_date=first.pub_date)
+        self.assertEqual(self.feed(), [second, first, self.old_post])
+
+    def test_migration_fills_existing_follows(self):
+        """Миграция заполняет ленты подписок, созданных до нее."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        TimelineEntry.objects.all().delete()
+        migration = import_module('posts.migrations.0009_auto_20261018_0554')
+        migration.fill_timelines(apps, None)
+        self.assertEqual(self.feed(), [self.old_post])
+
+    def test_rebuild_timelines_command(self):
+        """Команда пересобирает ленты по подпискам."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(self.feed(), [self.old_post])
+
+    def test_timeline_cursor_pages(self):
+        """Лента подписок листается курсором."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост {i}') for i in range(10)
+        )
+        call_command('rebuild_timelines', stdout=StringIO())
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        cursor = response.context['page_obj'].next_cursor
+        self.assertEqual(self.feed(cursor=cursor), [self.old_post])
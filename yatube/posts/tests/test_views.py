@@ -1,10 +1,14 @@
+import base64
+import json
 import shutil
 import tempfile
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django import forms
 
@@ -188,17 +192,32 @@ class PostViewsTest(TestCase):
         """Проверяем, что механизм кеширования главной страницы
         """
         response_1 = self.authorized_client.get(reverse('posts:index'))
-        Post.objects.create(
-            author=self.user,
-            text='Тестовый пост для кэша',
-            group=self.group,
-        )
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
         response_2 = self.authorized_client.get(reverse('posts:index'))
         self.assertEqual(response_1.content, response_2.content)
         cache.clear()
         response_3 = self.authorized_client.get(reverse('posts:index'))
         self.assertNotEqual(response_1.content, response_3.content)
 
+    def test_feed_cache_shows_new_post_at_once(self):
+        """Новый пост сбрасывает кэш лент без ожидания TTL."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+        )
+        for url in urls:
+            self.authorized_client.get(url)
+        Post.objects.create(
+            author=self.user,
+            text='Тестовый пост для кэша',
+            group=self.group,
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertContains(response, 'Тестовый пост для кэша')
+
     def test_follow_create(self):
         """
         Авторизованный пользователь может подписываться
@@ -357,3 +376,62 @@ class PostViewsPaginatorTest(TestCase):
             count = Post.objects.count()
             response = self.authorized_client.get(reverse_name, {'page': 2})
             self.assertEqual(len(response.context[page_obj]), count - PAGE_NUM)
+
+    def test_cursor_pages_follow_next_and_previous_links(self):
+        """Курсорная пагинация листает ленту без COUNT и OFFSET."""
+        count = Post.objects.count()
+        response = self.guest_client.get(reverse('posts:index'))
+        next_cursor = response.context['page_obj'].next_cursor
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(
+                reverse('posts:index'), {'cursor': next_cursor}
+            )
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), count - PAGE_NUM)
+        self.assertFalse(page_obj.has_next())
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'])
+            self.assertNotIn('OFFSET', query['sql'])
+        response = self.guest_client.get(
+            reverse('posts:index'), {'cursor': page_obj.previous_cursor}
+        )
+        self.assertEqual(len(response.context['page_obj']), PAGE_NUM)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+    def test_broken_cursor_shows_first_page(self):
+        """Испорченный курсор открывает первую страницу."""
+        response = self.guest_client.get(
+            reverse('posts:index'), {'cursor': 'мусор'}
+        )
+        self.assertEqual(len(response.context['page_obj']), PAGE_NUM)
+
+    def test_crafted_cursor_shows_first_page(self):
+        """Курсор с чужими типами, пустыми или огромными значениями
+        открывает первую страницу, а не падает."""
+        payloads = [
+            ['n', {}, 1],
+            ['n', [1], 1],
+            ['n', True, 1],
+            ['n', None, None],
+            ['n', '2020-01-01T00:00:00', 10 ** 30],
+            ['n', '2020-01-01T00:00:00', str(10 ** 30)],
+        ]
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:post_detail', args=[self.post.pk]),
+            reverse('posts:comment_list', args=[self.post.pk]),
+            reverse('api:posts'),
+        ]
+        for payload in payloads:
+            cursor = base64.urlsafe_b64encode(
+                json.dumps(payload).encode()
+            ).decode()
+            for url in urls:
+                with self.subTest(payload=payload, url=url):
+                    response = self.guest_client.get(url, {'cursor': cursor})
+                    self.assertEqual(response.status_code, 200)
+        cache.clear()
+        response = self.guest_client.get(
+            reverse('posts:index'), {'cursor': cursor}
+        )
+        self.assertEqual(len(response.context['page_obj']), PAGE_NUM)
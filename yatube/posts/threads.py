@@ -0,0 +1,86 @@
+from django.db.models import F
+
+from . import counters
+from .models import Comment
+
+MAX_DEPTH = 4
+REPLIES_SHOWN = 3
+SEGMENT_WIDTH = 10
+
+
+def segment(comment_id):
+    return f'{comment_id:0{SEGMENT_WIDTH}d}'
+
+
+def place(comment):
+    """Глубина, ветка и номер нового комментария до вставки.
+
+    Ответ глубже MAX_DEPTH становится соседом своего родителя.
+    """
+    parent = comment.parent
+    if parent is None:
+        comment.depth = comment.position = 0
+        return
+    if parent.depth >= MAX_DEPTH - 1:
+        parent = comment.parent = parent.parent
+    comment.depth = parent.depth + 1
+    comment.thread_id = parent.thread_id
+    root = Comment.objects.filter(pk=parent.thread_id)
+    root.update(
+        last_position=F('last_position') + 1,
+        thread_replies_count=F('thread_replies_count') + 1,
+    )
+    comment.position = root.values_list('last_position', flat=True).get()
+
+
+def attach(comment):
+    """Путь нового комментария: путь родителя и собственный id"""
+    parent = comment.parent
+    comment.path = (parent.path if parent else '') + segment(comment.pk)
+    if parent is None:
+        comment.thread_id = comment.pk
+    Comment.objects.filter(pk=comment.pk).update(
+        path=comment.path, thread_id=comment.thread_id
+    )
+    if parent is not None:
+        Comment.objects.filter(pk=parent.pk).update(
+            replies_count=F('replies_count') + 1
+        )
+
+
+def detach(comment):
+    """Поправить счетчики ответов после удаления комментария"""
+    if comment.parent_id is None:
+        return
+    counters.change_comment(comment.parent_id, 'replies_count', -1)
+    counters.change_comment(comment.thread_id, 'thread_replies_count', -1)
+
+
+def with_replies(roots):
+    """Подставить корням страницы первые REPLIES_SHOWN ответов их веток;
+    ответы всех веток читаются одним запросом по индексу"""
+    roots = list(roots)
+    replies = {}
+    if roots:
+        rows = Comment.objects.filter(
+            thread__in=[root.pk for root in roots],
+            position__gt=0,
+            position__lte=REPLIES_SHOWN,
+        ).select_related('author').order_by('thread', 'position')
+        for reply in sorted(rows, key=lambda reply: reply.path):
+            replies.setdefault(reply.thread_id, []).append(reply)
+    for root in roots:
+        root.shown_replies = replies.get(root.pk, [])
+        root.hidden_replies = (
+            root.thread_replies_count - len(root.shown_replies)
+        )
+    return roots
+
+
+def subtree(comment):
+    """Комментарий со всеми ответами в порядке обхода дерева"""
+    return Comment.objects.filter(
+        path__gte=comment.path,
+        # ':' следует за цифрами, так что это диапазон по индексу пути.
+        path__lt=comment.path + ':',
+    ).select_related('author').order_by('path')
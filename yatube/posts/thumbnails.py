@@ -0,0 +1,107 @@
+from django.conf import settings
+from django.utils import timezone
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from core.page_cache import purge
+
+from . import caching, variants
+from .models import Post
+
+
+def publish(post):
+    """Снять отметку ожидания и сбросить страницы с картинкой поста"""
+    # Картинку могли заменить, пока шла работа: тогда отметка остается
+    # до следующего прохода воркера.
+    done = Post.objects.filter(pk=post.pk, image=post.image.name).update(
+        thumbnails_pending=False, updated_at=timezone.now()
+    )
+    if done:
+        caching.bump_feed_generation()
+        tags = [
+            caching.INDEX_TAG,
+            caching.post_tag(post.pk),
+            caching.author_tag(post.author.username),
+        ]
+        if post.group_id is not None:
+            tags.append(caching.group_tag(post.group.slug))
+        purge(*tags)
+    return bool(done)
+
+
+def generate(post_id):
+    """Подготовить варианты и миниатюры картинки поста и снять
+    отметку ожидания"""
+    post = (
+        Post.objects.select_related('author', 'group')
+        .filter(pk=post_id, thumbnails_pending=True)
+        .first()
+    )
+    if post is None or not post.image:
+        return False
+    variants.build(post)
+    for geometry, options in settings.POST_THUMBNAILS:
+        get_thumbnail(post.image, geometry, **options)
+    return publish(post)
+
+
+def _thumbnail_key(image, geometry, options):
+    """Ключ миниатюры в хранилище sorl; правила те же, что
+    в backend.get_thumbnail"""
+    backend = default.backend
+    source = ImageFile(image)
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return add_prefix(ImageFile(name, default.storage).key, 'image')
+
+
+def _get_many_raw(keys):
+    kvstore = default.kvstore
+    empty = cached_db_kvstore.EMPTY_VALUE
+    if not isinstance(kvstore, cached_db_kvstore.KVStore):
+        values = {key: kvstore._get_raw(key) for key in keys}
+        return {key: value for key, value in values.items() if value}
+    values = kvstore.cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        found = dict(
+            KVStoreModel.objects.filter(key__in=missing)
+            .values_list('key', 'value')
+        )
+        # Отсутствие тоже кэшируется, как это делает сам sorl.
+        fetched = {key: found.get(key, empty) for key in missing}
+        kvstore.cache.set_many(
+            fetched, sorl_settings.THUMBNAIL_CACHE_TIMEOUT
+        )
+        values.update(fetched)
+    return {key: value for key, value in values.items() if value != empty}
+
+
+def prefetch_thumbnails(posts):
+    """Найти миниатюры sorl для всей страницы одним обращением
+    к хранилищу вместо обращения на каждый пост"""
+    geometry, options = settings.POST_THUMBNAILS[0]
+    keys = {}
+    for post in posts:
+        if post.image and not post.thumbnails_pending:
+            if not post.variants.all():
+                keys[post] = _thumbnail_key(post.image, geometry, options)
+    if not keys:
+        return
+    values = _get_many_raw(list(keys.values()))
+    for post, key in keys.items():
+        if key in values:
+            post.prefetched_thumbnail = deserialize_image_file(values[key])
@@ -0,0 +1,148 @@
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery
+
+from .models import Follow, Post, PullAuthor, TimelineEntry
+
+TIMELINE_ORDERING = ('-pub_date', '-post_id')
+BATCH_SIZE = 500
+
+
+def _entries(user_id, posts):
+    return [
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            pub_date=pub_date,
+        )
+        for post_id, author_id, pub_date in posts
+    ]
+
+
+def _insert(user_id, posts):
+    """Записать посты в ленту пачками, пропуская уже разложенные"""
+    posts = iter(posts)
+    chunk = list(islice(posts, BATCH_SIZE))
+    while chunk:
+        TimelineEntry.objects.bulk_create(
+            _entries(user_id, chunk), ignore_conflicts=True
+        )
+        chunk = list(islice(posts, BATCH_SIZE))
+
+
+def fan_out(post):
+    """Разложить новый пост по лентам подписчиков автора"""
+    if PullAuthor.objects.filter(author_id=post.author_id).exists():
+        return
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    followers = list(
+        Follow.objects.filter(author_id=post.author_id)
+        .values_list('user_id', flat=True)[:limit + 1]
+    )
+    if len(followers) > limit:
+        PullAuthor.objects.get_or_create(author_id=post.author_id)
+        return
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post.pk,
+                author_id=post.author_id,
+                pub_date=post.pub_date,
+            )
+            for user_id in followers
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def refan(post):
+    """Разложить пост заново после смены автора"""
+    TimelineEntry.objects.filter(post_id=post.pk).delete()
+    fan_out(post)
+
+
+def backfill(user_id, *author_ids):
+    """Добавить в ленту все посты авторов после подписки"""
+    posts = Post.objects.filter(author_id__in=author_ids).values_list(
+        'id', 'author_id', 'pub_date'
+    )
+    _insert(user_id, posts.iterator(chunk_size=BATCH_SIZE))
+
+
+def trim(user_id, *author_ids):
+    """Убрать посты авторов из ленты после отписки"""
+    TimelineEntry.objects.filter(
+        user_id=user_id, author_id__in=author_ids
+    ).delete()
+
+
+def pull(user_id):
+    """Подтянуть в ленту свежие посты авторов, работающих на чтение"""
+    authors = Follow.objects.filter(
+        user_id=user_id,
+        author__pull_author__isnull=False,
+    ).values_list('author_id', flat=True)
+    authors = list(authors)
+    if not authors:
+        return
+    # Граница по тому же ключу (pub_date, id), что и у пагинатора:
+    # посты с той же датой, что и последний в ленте, не теряются.
+    newest = TimelineEntry.objects.filter(
+        user_id=user_id, author_id=OuterRef('author_id')
+    ).order_by('-pub_date', '-post_id')
+    latest = {
+        author_id: (pub_date, post_id)
+        for author_id, pub_date, post_id in TimelineEntry.objects.filter(
+            user_id=user_id,
+            author_id__in=authors,
+            post_id=Subquery(newest.values('post_id')[:1]),
+        ).values_list('author_id', 'pub_date', 'post_id')
+    }
+    condition = Q()
+    for author_id in authors:
+        since = Q(author_id=author_id)
+        if author_id in latest:
+            pub_date, post_id = latest[author_id]
+            since &= Q(pub_date__gt=pub_date) | Q(
+                pub_date=pub_date, id__gt=post_id
+            )
+        condition |= since
+    _insert(
+        user_id,
+        Post.objects.filter(condition).values_list(
+            'id', 'author_id', 'pub_date'
+        ).iterator(chunk_size=BATCH_SIZE),
+    )
+
+
+def follow_feed(user):
+    """Лента подписок: диапазон по индексу материализованной таблицы"""
+    pull(user.pk)
+    return TimelineEntry.objects.filter(user=user).select_related(
+        'post__author', 'post__group'
+    ).prefetch_related('post__variants')
+
+
+@transaction.atomic
+def rebuild():
+    """Пересобрать все ленты по текущим подпискам"""
+    TimelineEntry.objects.all().delete()
+    PullAuthor.objects.all().delete()
+    heavy = (
+        Follow.objects.values('author_id')
+        .annotate(followers=Count('id'))
+        .filter(followers__gt=settings.TIMELINE_FANOUT_LIMIT)
+        .values_list('author_id', flat=True)
+    )
+    PullAuthor.objects.bulk_create(
+        [PullAuthor(author_id=author_id) for author_id in heavy]
+    )
+    follows = Follow.objects.values_list('user_id', 'author_id')
+    for user_id, author_id in follows.iterator():
+        backfill(user_id, author_id)
+    return TimelineEntry.objects.count()
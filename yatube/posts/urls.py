@@ -1,14 +1,25 @@
 from django.urls import path
 
-from . import views
+from . import feeds, views
 
 app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('rss/', feeds.PostsFeed(), name='index_rss'),
+    path('atom/', feeds.AtomPostsFeed(), name='index_atom'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
+    path('search/', views.post_search, name='search'),
+    path('tag/<str:name>/', views.tag_posts, name='tag_posts'),
+    path(
+        'autocomplete/<str:kind>/',
+        views.complete,
+        name='autocomplete'
+    ),
     path('follow/', views.follow_index, name='follow_index'),
+    path('follow/bulk/', views.follow_bulk, name='follow_bulk'),
+    path('follow/events/', views.follow_events, name='follow_events'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path(
@@ -16,11 +27,27 @@ urlpatterns = [
         views.add_comment,
         name='add_comment'
     ),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.comment_list,
+        name='comment_list'
+    ),
+    path(
+        'posts/<int:post_id>/comments/<int:comment_id>/',
+        views.comment_thread,
+        name='comment_thread'
+    ),
     path(
         'group/<slug:slug>/',
         views.group_posts,
         name='group_list'
     ),
+    path('group/<slug:slug>/rss/', feeds.GroupFeed(), name='group_rss'),
+    path(
+        'group/<slug:slug>/atom/',
+        feeds.AtomGroupFeed(),
+        name='group_atom'
+    ),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -31,4 +58,24 @@ urlpatterns = [
         views.profile_unfollow,
         name='profile_unfollow'
     ),
+    path(
+        'profile/<str:username>/rss/',
+        feeds.ProfileFeed(),
+        name='profile_rss'
+    ),
+    path(
+        'profile/<str:username>/atom/',
+        feeds.AtomProfileFeed(),
+        name='profile_atom'
+    ),
+    path(
+        'profile/<str:username>/export/',
+        views.export_content,
+        name='profile_export'
+    ),
+    path(
+        'group/<slug:slug>/export/',
+        views.export_content,
+        name='group_export'
+    ),
 ]
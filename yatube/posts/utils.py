@@ -1,10 +1,167 @@
-from django.core.paginator import Paginator
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
 
 PAGE_NUM = 10
+FEED_ORDERING = ('-pub_date', '-id')
+COMMENTS_PAGE_NUM = 20
+COMMENT_ORDERINGS = {
+    'old': ('created', 'id'),
+    'new': ('-created', '-id'),
+}
+NEXT = 'n'
+PREVIOUS = 'p'
+# Целое из курсора должно поместиться в 64-битное целое базы.
+KEY_MIN, KEY_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+def encode_cursor(values, direction=NEXT):
+    """Непрозрачный токен из значений ключа сортировки"""
+    payload = [direction] + [
+        value.isoformat() if isinstance(value, datetime) else value
+        for value in values
+    ]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Направление и сырые значения ключа из токена курсора"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        direction, *values = json.loads(raw.decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise ValueError('Некорректный курсор')
+    if direction not in (NEXT, PREVIOUS) or not values:
+        raise ValueError('Некорректный курсор')
+    return direction, values
+
+
+class CursorPage(Page):
+    """Страница курсорной пагинации: без номера и общего количества"""
+
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        super().__init__(object_list, None, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<CursorPage>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
 
 
-def block_paginator(object, request):
-    """Унифирсальная часть кода для пагинатора"""
+class CursorPaginator(Paginator):
+    """Пагинатор с поиском по ключу сортировки вместо COUNT и OFFSET"""
+
+    def __init__(self, object_list, per_page, ordering=FEED_ORDERING):
+        super().__init__(object_list.order_by(*ordering), per_page)
+        self.ordering = ordering
+        self.fields = [field.lstrip('-') for field in ordering]
+        self.descending = ordering[0].startswith('-')
+
+    def cursor_for(self, obj, direction=NEXT):
+        return encode_cursor(
+            [getattr(obj, field) for field in self.fields], direction
+        )
+
+    def _parse(self, token):
+        direction, values = decode_cursor(token)
+        if len(values) != len(self.fields):
+            raise ValueError('Некорректный курсор')
+        meta = self.object_list.model._meta
+        parsed = []
+        for field, value in zip(self.fields, values):
+            if not isinstance(value, (str, int)) or isinstance(value, bool):
+                raise ValueError('Некорректный курсор')
+            try:
+                value = meta.get_field(field).to_python(value)
+            except (ValidationError, TypeError, ValueError):
+                raise ValueError('Некорректный курсор')
+            if value is None or (
+                isinstance(value, int) and not KEY_MIN <= value <= KEY_MAX
+            ):
+                raise ValueError('Некорректный курсор')
+            parsed.append(value)
+        return direction, parsed
+
+    def _seek(self, values, forward):
+        lookup = 'lt' if self.descending == forward else 'gt'
+        condition = Q()
+        for index, field in enumerate(self.fields):
+            step = {f: v for f, v in zip(self.fields[:index], values)}
+            step[f'{field}__{lookup}'] = values[index]
+            condition |= Q(**step)
+        return condition
+
+    def get_page(self, cursor):
+        """Страница после или перед курсором; мусор ведет на первую"""
+        direction, values = NEXT, None
+        if cursor:
+            try:
+                direction, values = self._parse(cursor)
+            except ValueError:
+                pass
+        forward = direction == NEXT
+        queryset = self.object_list
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, forward))
+        if not forward:
+            queryset = queryset.reverse()
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+        has_next = has_more if forward else values is not None
+        has_previous = values is not None if forward else has_more
+        return CursorPage(
+            rows,
+            self,
+            self.cursor_for(rows[-1]) if rows and has_next else None,
+            self.cursor_for(rows[0], PREVIOUS)
+            if rows and has_previous else None,
+        )
+
+
+def block_paginator(object, request, ordering=FEED_ORDERING):
+    """Унифирсальная часть кода для пагинатора.
+
+    С параметром ?cursor= страница ищется по ключу сортировки,
+    иначе работает обычная пагинация по ?page=.
+    """
+    object = object.order_by(*ordering)
+    cursor = request.GET.get('cursor')
+    if cursor:
+        return CursorPaginator(object, PAGE_NUM, ordering).get_page(cursor)
     paginator = Paginator(object, PAGE_NUM)
-    page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    cursors = CursorPaginator(object, PAGE_NUM, ordering)
+    page_obj.next_cursor = page_obj.previous_cursor = None
+    if page_obj.has_next():
+        page_obj.next_cursor = cursors.cursor_for(page_obj[-1])
+    if page_obj.has_previous():
+        page_obj.previous_cursor = cursors.cursor_for(page_obj[0], PREVIOUS)
+    return page_obj
+
+
+def comments_page(comments, request):
+    """Порция комментариев по курсору: ?order=old или ?order=new"""
+    order = request.GET.get('order')
+    if order not in COMMENT_ORDERINGS:
+        order = 'old'
+    paginator = CursorPaginator(
+        comments, COMMENTS_PAGE_NUM, COMMENT_ORDERINGS[order]
+    )
+    page_obj = paginator.get_page(request.GET.get('cursor'))
+    page_obj.order = order
+    return page_obj
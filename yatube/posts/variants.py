@@ -0,0 +1,82 @@
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from .models import PostImageVariant
+
+SAVE_FORMATS = {
+    PostImageVariant.WEBP: ('WEBP', {'method': 4}),
+    PostImageVariant.JPEG: ('JPEG', {'optimize': True, 'progressive': True}),
+}
+
+
+def render(source, widths, ratio, quality):
+    """Размеры картинки во всех форматах: (ширина, высота, формат, байты).
+
+    Картинка обрезается по центру до пропорции ratio и не растягивается:
+    ширины больше исходной пропускаются.
+    """
+    ratio_width, ratio_height = ratio
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        width = min(
+            image.width, round(image.height * ratio_width / ratio_height)
+        )
+        height = max(1, round(width * ratio_height / ratio_width))
+        image = ImageOps.fit(image, (width, height), Image.LANCZOS)
+    targets = [target for target in widths if target <= width] or [width]
+    rendered = []
+    for target in sorted(targets):
+        size = (target, max(1, round(target * ratio_height / ratio_width)))
+        resized = image if size == image.size else image.resize(
+            size, Image.LANCZOS
+        )
+        for image_format, (name, options) in SAVE_FORMATS.items():
+            buffer = io.BytesIO()
+            resized.save(buffer, name, quality=quality, **options)
+            rendered.append((*size, image_format, buffer.getvalue()))
+    return rendered
+
+
+def render_file(name):
+    """Варианты файла из хранилища с размерами из настроек"""
+    with default_storage.open(name, 'rb') as source:
+        return render(
+            source,
+            settings.POST_IMAGE_WIDTHS,
+            settings.POST_IMAGE_RATIO,
+            settings.POST_IMAGE_QUALITY,
+        )
+
+
+def store(post, rendered):
+    """Сохранить готовые варианты картинки поста вместо прежних"""
+    stem = os.path.splitext(os.path.basename(post.image.name))[0]
+    variants = []
+    for width, height, image_format, data in rendered:
+        variant = PostImageVariant(
+            post=post,
+            format=image_format,
+            width=width,
+            height=height,
+            size=len(data),
+        )
+        variant.file.save(
+            f'{stem}-{width}.{image_format}', ContentFile(data), save=False
+        )
+        variants.append(variant)
+    with transaction.atomic():
+        for variant in post.variants.all():
+            variant.delete()
+        PostImageVariant.objects.bulk_create(variants)
+    return variants
+
+
+def build(post):
+    """Собрать варианты картинки поста и заменить ими прежние"""
+    return store(post, render_file(post.image.name))
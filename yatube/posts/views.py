@@ -1,48 +1,107 @@
+from django.conf import settings
+from django.core.paginator import Paginator
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import PermissionDenied
+from django.http import (Http404, HttpResponse, JsonResponse,
+                         StreamingHttpResponse)
+from django.urls import reverse
+from django.views.decorators.http import etag, require_POST
 
-from .models import Follow, Group, Post, User
-from .forms import PostForm, CommentForm
-from .utils import block_paginator
+from core.page_cache import tag_request
+
+from . import autocomplete, events, export, follows, search, tags
+from .models import Comment, Group, Post, Tag, User
+from .caching import (INDEX_TAG, author_tag, feed_cache_context,
+                      follow_cache_context, group_tag, hashtag_tag, post_tag,
+                      tag_page)
+from .conditions import group_etag, post_detail_etag, profile_etag
+from .forms import CommentForm, PostForm, SearchForm
+from .graph import get_graph
+from .suggestions import for_user
+from .threads import subtree, with_replies
+from .timeline import TIMELINE_ORDERING, follow_feed
+from .utils import PAGE_NUM, block_paginator, comments_page
 
 
 def index(request):
     """Общая страница"""
-    posts = Post.objects.select_related('group', 'author').all()
+    posts = Post.objects.select_related('group', 'author').prefetch_related(
+        'variants'
+    )
     page_obj = block_paginator(posts, request)
+    tag_page(request, page_obj, INDEX_TAG)
     context = {
         'page_obj': page_obj,
+        'trending': tags.trending(),
+        **feed_cache_context(request),
     }
     return render(request, 'posts/index.html', context)
 
 
+@etag(group_etag)
 def group_posts(request, slug):
     """Список постов группы"""
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.select_related('author')
+    posts = group.posts.select_related('author').prefetch_related(
+        'variants'
+    )
     page_obj = block_paginator(posts, request)
+    tag_page(request, page_obj, group_tag(group.slug))
     context = {
         'page_obj': page_obj,
         'group': group,
+        **feed_cache_context(request, group.pk),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+def tag_posts(request, name):
+    """Посты с хэштегом"""
+    tag = get_object_or_404(Tag, name=name.lower())
+    entries = tag.post_tags.select_related(
+        'post__author', 'post__group'
+    ).prefetch_related('post__variants')
+    page_obj = block_paginator(entries, request, tags.TAG_ORDERING)
+    page_obj.object_list = [entry.post for entry in page_obj]
+    tag_page(request, page_obj, hashtag_tag(tag.name))
+    context = {
+        'tag': tag,
+        'page_obj': page_obj,
+        'trending': tags.trending(),
+        **feed_cache_context(request, 'tag', tag.pk),
+    }
+    return render(request, 'posts/tag.html', context)
+
+
+@etag(profile_etag)
 def profile(request, username):
     """Посты принадлежащие автору"""
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.select_related('group', 'author').all()
+    author = get_object_or_404(
+        User.objects.select_related('counters'), username=username
+    )
+    posts = author.posts.select_related('group', 'author').prefetch_related(
+        'variants'
+    )
     page_obj = block_paginator(posts, request)
+    tag_page(request, page_obj, author_tag(author.username))
+    following = follows_back = False
+    known_followers = 0
     if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            author=author,
-            user=request.user).exists()
-    else:
-        following = False
+        follows = get_graph()
+        following = follows.is_following(request.user.pk, author.pk)
+        follows_back = follows.is_following(author.pk, request.user.pk)
+        known_followers = len(
+            follows.followed_by_following(request.user.pk, author.pk)
+        )
     context = {
         'author': author,
         'page_obj': page_obj,
         'following': following,
+        'follows_back': follows_back,
+        'known_followers': known_followers,
+        'suggestions': for_user(request.user),
+        **feed_cache_context(request, author.pk),
     }
     return render(request, 'posts/profile.html', context)
 
@@ -50,23 +109,95 @@ def profile(request, username):
 @login_required
 def follow_index(request):
     """Информация о подписках пользователя"""
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = block_paginator(posts, request)
+    entries = follow_feed(request.user)
+    page_obj = block_paginator(entries, request, TIMELINE_ORDERING)
+    page_obj.object_list = [entry.post for entry in page_obj]
     context = {
         'page_obj': page_obj,
+        'suggestions': for_user(request.user),
+        **follow_cache_context(request),
     }
     return render(request, 'posts/follow.html', context)
 
 
+def post_search(request):
+    """Поиск постов по тексту с фильтрами по группе и автору"""
+    form = SearchForm(request.GET or None)
+    page_obj = None
+    if form.is_valid():
+        posts = Post.objects.select_related('author', 'group')
+        if form.cleaned_data['group']:
+            posts = posts.filter(group=form.cleaned_data['group'])
+        if form.cleaned_data['author']:
+            posts = posts.filter(
+                author__username=form.cleaned_data['author']
+            )
+        posts = search.ranked(posts, form.cleaned_data['q'])
+        page_obj = Paginator(posts, PAGE_NUM).get_page(
+            request.GET.get('page')
+        )
+        for post in page_obj:
+            post.highlighted = search.highlight(post.snippet)
+    params = request.GET.copy()
+    params.pop('page', None)
+    context = {
+        'form': form,
+        'page_obj': page_obj,
+        'query_string': params.urlencode(),
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def complete(request, kind):
+    """Подсказки пользователей или групп по началу или части имени"""
+    if kind not in autocomplete.KINDS:
+        raise Http404
+    found = autocomplete.complete(kind, request.GET.get('q', ''))
+    if kind == 'users':
+        results = [
+            {
+                'id': user.pk,
+                'value': user.username,
+                'label': user.get_full_name() or user.username,
+                'url': reverse('posts:profile', args=[user.username]),
+            }
+            for user in found
+        ]
+    else:
+        results = [
+            {
+                'id': group.pk,
+                'value': group.slug,
+                'label': group.title,
+                'url': reverse('posts:group_list', args=[group.slug]),
+            }
+            for group in found
+        ]
+    return JsonResponse({'results': results})
+
+
+@login_required
+def follow_events(request):
+    """Поток SSE о новых постах авторов, на которых подписан
+    пользователь"""
+    listener = events.broker.listen(request.user.pk)
+    if listener is None:
+        response = HttpResponse(status=503)
+        response['Retry-After'] = settings.EVENTS_RETRY
+        return response
+    response = StreamingHttpResponse(
+        events.Stream(listener), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @login_required
 def profile_follow(request, username):
     """Подписаться на автора"""
     follow_author = get_object_or_404(User, username=username)
-    if request.user != follow_author:
-        Follow.objects.get_or_create(
-            author=follow_author,
-            user=request.user,
-        )
+    follows.follow(request.user, [follow_author])
     return redirect('posts:follow_index')
 
 
@@ -74,29 +205,101 @@ def profile_follow(request, username):
 def profile_unfollow(request, username):
     """Отписаться от автора"""
     follow_author = get_object_or_404(User, username=username)
-    follow = Follow.objects.get(
-        author=follow_author,
-        user=request.user,
-    )
-    if Follow.objects.filter(
-        author=follow_author,
-        user=request.user,
-    ).exists():
-        follow.delete()
+    follows.unfollow(request.user, [follow_author])
     return redirect('posts:follow_index')
 
 
+@require_POST
+@login_required
+def follow_bulk(request):
+    """Подписаться и отписаться от списков авторов за один запрос"""
+    to_follow = request.POST.getlist('follow')
+    to_unfollow = request.POST.getlist('unfollow')
+    if len(to_follow) + len(to_unfollow) > settings.FOLLOW_BULK_LIMIT:
+        return JsonResponse(
+            {'error': f'Не больше {settings.FOLLOW_BULK_LIMIT} авторов'},
+            status=400,
+        )
+    authors = {
+        author.username: author
+        for author in follows.resolve(to_follow + to_unfollow)
+    }
+    follows.unfollow(
+        request.user,
+        [authors[name] for name in set(to_unfollow) if name in authors],
+    )
+    follows.follow(
+        request.user,
+        [authors[name] for name in set(to_follow) if name in authors],
+    )
+    return JsonResponse({
+        'following': {
+            name: name in to_follow and author != request.user
+            for name, author in authors.items()
+        },
+        'unknown': sorted(set(to_follow + to_unfollow) - set(authors)),
+    })
+
+
+@login_required
+def export_content(request, username=None, slug=None):
+    """Выгрузка постов, комментариев и подписок автора или группы
+    потоком: своя для автора, любая для персонала"""
+    user = group = None
+    if username is not None:
+        user = get_object_or_404(User, username=username)
+        name = user.username
+    else:
+        group = get_object_or_404(Group, slug=slug)
+        name = group.slug
+    if request.user != user and not request.user.is_staff:
+        raise PermissionDenied
+    file_format = request.GET.get('format', 'jsonl')
+    table = request.GET.get('table', 'posts')
+    if file_format not in export.FORMATS:
+        raise Http404
+    if table not in export.sources(user, group):
+        raise Http404
+    response = StreamingHttpResponse(
+        export.export(file_format, table, user, group),
+        content_type=export.FORMATS[file_format],
+    )
+    filename = f'{name}-{table}' if file_format == 'csv' else name
+    response['Content-Disposition'] = (
+        f'attachment; filename="{filename}.{file_format}"'
+    )
+    return response
+
+
+@etag(post_detail_etag)
 def post_detail(request, post_id):
     """Деталировка поста"""
     post = get_object_or_404(
-        Post.objects.select_related('author'), pk=post_id
+        Post.objects.select_related(
+            'author__counters', 'group'
+        ).prefetch_related('variants'),
+        pk=post_id,
     )
-    comments = post.comments.all()
+    comments = comments_page(
+        post.comments.filter(depth=0).select_related('author'), request
+    )
+    with_replies(comments)
     form = CommentForm()
+    reply_to = None
+    reply = request.GET.get('reply', '')
+    if request.user.is_authenticated and reply.isdigit():
+        reply_to = post.comments.select_related('author').filter(
+            pk=reply
+        ).first()
+    tags = [author_tag(post.author.username)]
+    if post.group:
+        tags.append(group_tag(post.group.slug))
+    tag_page(request, [post], *tags)
     context = {
         'post': post,
         'form': form,
         'comments': comments,
+        'reply_to': reply_to,
     }
     return render(request, 'posts/post_detail.html', context)
 
@@ -104,7 +307,7 @@ def post_detail(request, post_id):
 @login_required
 def post_create(request):
     """Создать новый пост"""
-    form = PostForm(request.POST or None)
+    form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
@@ -141,5 +344,61 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
+        parent = request.POST.get('parent', '')
+        if parent.isdigit():
+            comment.parent = post.comments.filter(pk=parent).first()
         comment.save()
     return redirect('posts:post_detail', post_id=post_id)
+
+
+def _comment_json(comment):
+    return {
+        'id': comment.id,
+        'parent': comment.parent_id,
+        'depth': comment.depth,
+        'author': comment.author.username,
+        'author_url': reverse(
+            'posts:profile', args=[comment.author.username]
+        ),
+        'text': comment.text,
+        'created': comment.created.isoformat(),
+        'replies_count': comment.replies_count,
+    }
+
+
+def comment_list(request, post_id):
+    """Следующая порция веток комментариев поста для подгрузки"""
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    comments = comments_page(
+        Comment.objects.filter(post_id=post_id, depth=0).select_related(
+            'author'
+        ),
+        request,
+    )
+    tag_request(request, post_tag(post_id))
+    return JsonResponse({
+        'comments': [
+            {
+                **_comment_json(root),
+                'replies': [
+                    _comment_json(reply) for reply in root.shown_replies
+                ],
+                'hidden_replies': root.hidden_replies,
+                'thread_url': reverse(
+                    'posts:comment_thread', args=[post_id, root.id]
+                ),
+            }
+            for root in with_replies(comments)
+        ],
+        'next': comments.next_cursor,
+    })
+
+
+def comment_thread(request, post_id, comment_id):
+    """Комментарий со всеми ответами в порядке дерева"""
+    comment = get_object_or_404(Comment, pk=comment_id, post_id=post_id)
+    tag_request(request, post_tag(post_id))
+    return JsonResponse({
+        'comments': [_comment_json(reply) for reply in subtree(comment)],
+    })
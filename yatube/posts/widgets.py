@@ -0,0 +1,28 @@
+from django import forms
+from django.core.exceptions import ValidationError
+
+
+class AutocompleteSelect(forms.Select):
+    """Список, в котором выводится только выбранный вариант: остальные
+    подгружает static/js/autocomplete.js по мере ввода"""
+
+    def __init__(self, url, attrs=None):
+        super().__init__({'data-autocomplete': url, **(attrs or {})})
+
+    def optgroups(self, name, value, attrs=None):
+        iterator = self.choices
+        selected = [item for item in value if item]
+        field = iterator.field
+        lookup = f'{field.to_field_name or "pk"}__in'
+        try:
+            chosen = list(iterator.queryset.filter(**{lookup: selected}))
+        except (ValueError, ValidationError):
+            chosen = []
+        choices = [iterator.choice(obj) for obj in chosen]
+        if field.empty_label is not None:
+            choices.insert(0, ('', field.empty_label))
+        self.choices = choices
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = iterator
@@ -0,0 +1,51 @@
+// Поле поиска над списком с data-autocomplete: варианты списка
+// подгружаются с сервера по мере ввода.
+(function () {
+  var DELAY = 200;
+
+  function enhance(select) {
+    var input = document.createElement('input');
+    input.type = 'search';
+    input.className = 'form-control mb-2';
+    input.placeholder = 'Начните вводить название';
+    select.parentNode.insertBefore(input, select);
+    var timer = null;
+    var empty = select.querySelector('option[value=""]');
+
+    function fill(results) {
+      var selected = select.value;
+      Array.prototype.slice.call(select.options).forEach(function (option) {
+        if (option.value && option.value !== selected) {
+          select.removeChild(option);
+        }
+      });
+      results.forEach(function (result) {
+        if (String(result.id) === selected) {
+          return;
+        }
+        var option = document.createElement('option');
+        option.value = result.id;
+        option.textContent = result.label;
+        select.appendChild(option);
+      });
+      if (!selected && results.length && empty) {
+        empty.textContent = 'Найдено: ' + results.length;
+      }
+    }
+
+    input.addEventListener('input', function () {
+      clearTimeout(timer);
+      timer = setTimeout(function () {
+        var url = select.dataset.autocomplete +
+          '?q=' + encodeURIComponent(input.value);
+        fetch(url, {headers: {Accept: 'application/json'}})
+          .then(function (response) { return response.json(); })
+          .then(function (data) { fill(data.results); });
+      }, DELAY);
+    });
+  }
+
+  Array.prototype.forEach.call(
+    document.querySelectorAll('select[data-autocomplete]'), enhance
+  );
+})();
@@ -0,0 +1,86 @@
+// Подгрузка веток комментариев поста без перезагрузки страницы.
+(function () {
+  var list = document.getElementById('comments');
+  var more = document.getElementById('comments-more');
+  if (!list) {
+    return;
+  }
+
+  function load(url) {
+    return fetch(url, {headers: {Accept: 'application/json'}})
+      .then(function (response) { return response.json(); });
+  }
+
+  function render(comment) {
+    var item = document.createElement('div');
+    item.className = 'media mb-4';
+    item.id = 'comment-' + comment.id;
+    item.style.marginLeft = comment.depth + 'rem';
+    var body = document.createElement('div');
+    body.className = 'media-body';
+    var title = document.createElement('h5');
+    title.className = 'mt-0';
+    var link = document.createElement('a');
+    link.href = comment.author_url;
+    link.textContent = comment.author;
+    var text = document.createElement('p');
+    text.style.whiteSpace = 'pre-line';
+    text.textContent = comment.text;
+    title.appendChild(link);
+    body.appendChild(title);
+    body.appendChild(text);
+    item.appendChild(body);
+    return item;
+  }
+
+  function renderThread(root) {
+    var thread = document.createElement('div');
+    thread.className = 'comment-thread';
+    thread.appendChild(render(root));
+    root.replies.forEach(function (reply) {
+      thread.appendChild(render(reply));
+    });
+    if (root.hidden_replies) {
+      var link = document.createElement('a');
+      link.className = 'comment-thread-more small mb-4 d-block';
+      link.href = root.thread_url;
+      link.textContent = 'Показать все ответы (' +
+        (root.replies.length + root.hidden_replies) + ')';
+      thread.appendChild(link);
+    }
+    return thread;
+  }
+
+  list.addEventListener('click', function (event) {
+    var link = event.target.closest('.comment-thread-more');
+    if (!link) {
+      return;
+    }
+    event.preventDefault();
+    load(link.href).then(function (data) {
+      var thread = link.parentNode;
+      thread.textContent = '';
+      data.comments.forEach(function (comment) {
+        thread.appendChild(render(comment));
+      });
+    });
+  });
+
+  if (more) {
+    more.addEventListener('click', function (event) {
+      event.preventDefault();
+      var url = more.dataset.url + '&cursor=' +
+        encodeURIComponent(more.dataset.cursor);
+      load(url).then(function (data) {
+        data.comments.forEach(function (root) {
+          list.appendChild(renderThread(root));
+        });
+        if (data.next) {
+          more.dataset.cursor = data.next;
+        } else {
+          more.remove();
+        }
+      });
+    });
+  }
+})();
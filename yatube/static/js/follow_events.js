@@ -0,0 +1,16 @@
+// Плашка над лентой подписок: поток SSE сообщает о новых постах
+// авторов, и плашка предлагает обновить ленту.
+(function () {
+  var banner = document.querySelector('[data-follow-events]');
+  if (!banner || !window.EventSource) {
+    return;
+  }
+  var counter = banner.querySelector('span');
+  var count = 0;
+  var source = new EventSource(banner.getAttribute('data-follow-events'));
+  source.addEventListener('post', function () {
+    count += 1;
+    counter.textContent = count;
+    banner.hidden = false;
+  });
+})();
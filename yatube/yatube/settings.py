@@ -17,6 +17,7 @@ ALLOWED_HOSTS = [
 
 INSTALLED_APPS = [
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'core.apps.CoreConfig',
     'posts.apps.PostsConfig',
     'users.apps.UsersConfig',
@@ -39,6 +40,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'core.page_cache.AnonymousPageCacheMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -130,3 +132,70 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
+
+# Авторы с большим числом подписчиков не раскладывают посты по лентам
+# при публикации: читатели подтягивают их сами.
+TIMELINE_FANOUT_LIMIT = 1000
+
+# Фрагменты лент сбрасываются по поколению, поэтому живут долго.
+FEED_CACHE_TIMEOUT = 60 * 60
+
+# Страницы анонимных читателей сбрасываются по тегам при записи.
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+# Миниатюры sorl для постов, у которых еще нет готовых вариантов
+# картинки; шаблоны запрашивают ровно эти размеры. Фоновый воркер
+# (manage.py process_thumbnails --watch) готовит их вместе
+# с вариантами.
+POST_THUMBNAILS = (
+    ('1260x839', {'crop': 'center', 'upscale': True}),
+)
+
+# Варианты картинок постов для srcset: ширины, пропорция карточки и
+# качество сжатия WebP и JPEG.
+POST_IMAGE_WIDTHS = (320, 640, 960, 1260)
+POST_IMAGE_RATIO = (1260, 839)
+POST_IMAGE_QUALITY = 80
+
+# Снимок графа подписок: воркеры читают его при старте вместо
+# полной выборки таблицы Follow.
+FOLLOW_GRAPH_SNAPSHOT = os.path.join(BASE_DIR, 'follow_graph.snapshot')
+# Изменения графа другие процессы применяют из кэша; отставший больше
+# чем на FOLLOW_GRAPH_DELTAS изменений перестраивает граф целиком.
+FOLLOW_GRAPH_DELTAS = 1000
+FOLLOW_GRAPH_DELTA_TIMEOUT = 60 * 60
+
+# Рекомендации авторов: сколько хранить на пользователя, сколько
+# показывать и вес совместных комментариев рядом с подписками.
+SUGGESTIONS_PER_USER = 20
+SUGGESTIONS_SHOWN = 5
+SUGGESTIONS_COMMENT_WEIGHT = 0.5
+
+# Сколько авторов можно подписать или отписать одним запросом.
+FOLLOW_BULK_LIMIT = 100
+
+# Популярные хэштеги: сколько показывать и за сколько дней считать.
+TRENDING_TAGS = 10
+TRENDING_TAGS_DAYS = 7
+
+# Сколько подсказок возвращает автодополнение.
+AUTOCOMPLETE_LIMIT = 10
+
+# Сколько секунд админка помнит число строк списка объектов.
+ADMIN_COUNT_TIMEOUT = 60
+
+# Сколько последних постов отдают RSS и Atom.
+FEED_ITEMS = 20
+
+# Поток новых постов ленты подписок (SSE): сколько живет соединение,
+# как часто слать пинг, через сколько секунд переподключаться и сколько
+# соединений держит процесс. EVENTS_SPOOL - путь к общему файлу для
+# доставки событий между процессами одной машины; без него события
+# ходят только внутри процесса.
+EVENTS_TIMEOUT = 300
+EVENTS_HEARTBEAT = 15
+EVENTS_RETRY = 5
+EVENTS_MAX_LISTENERS = 1000
+EVENTS_SPOOL = None
+EVENTS_SPOOL_SIZE = 1024 * 1024
+EVENTS_POLL_INTERVAL = 1